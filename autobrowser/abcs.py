@@ -1,11 +1,22 @@
 from abc import ABCMeta, abstractmethod
 from asyncio import AbstractEventLoop, Task
-from typing import Any, Awaitable, Dict, List, Optional, TYPE_CHECKING, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    List,
+    Optional,
+    TYPE_CHECKING,
+    Tuple,
+    Union,
+)
 
 from pyee2 import EventEmitterS
 
 if TYPE_CHECKING:
     from autobrowser.automation import AutomationConfig, BrowserExitInfo, TabClosedInfo
+    from autobrowser.util import RequestTracker
 
 __all__ = ["Behavior", "BehaviorManager", "Browser", "Driver", "Tab"]
 
@@ -367,6 +378,11 @@ class Tab(EventEmitterS, metaclass=ABCMeta):
     def reconnecting(self) -> bool:
         """Is this tab attempting to reconnect to the tab"""
 
+    @property
+    @abstractmethod
+    def request_tracker(self) -> Optional["RequestTracker"]:
+        """Returns the tracker of the tab's in-flight network requests"""
+
     @abstractmethod
     def set_running_behavior(self, behavior: Behavior) -> None:
         """Set the tabs running behavior (done automatically by
@@ -389,8 +405,8 @@ class Tab(EventEmitterS, metaclass=ABCMeta):
     ) -> None:
         """Returns a future that  resolves once network idle occurs.
 
-        See the options of autobrowser.util.netidle.monitor for a complete
-        description of the available arguments
+        See the options of autobrowser.util.netidle.RequestTracker.wait_for_idle
+        for a complete description of the available arguments
         """
 
     @abstractmethod
@@ -453,14 +469,21 @@ class Tab(EventEmitterS, metaclass=ABCMeta):
         """Initiates the graceful shutdown of the tab"""
 
     @abstractmethod
-    async def capture_screenshot(self) -> bytes:
-        """Capture a screenshot (in png format) of the current page.
-        :return: The captured screenshot as bytes
+    def capture_screenshot(self) -> AsyncIterator[Tuple[int, int, bytes]]:
+        """Capture a screenshot (in the configured format) of the current page.
+        :return: An async iterator yielding the index of the tile, the number
+        of tiles and the tile as bytes
+        """
+
+    @abstractmethod
+    async def capture_thumbnail(self) -> bytes:
+        """Capture a thumbnail (in the configured format) of the first screen of the current page.
+        :return: The captured thumbnail as bytes
         """
 
     @abstractmethod
     async def capture_and_upload_screenshot(self) -> None:
-        """Capture a screenshot (in png format) of the current page
+        """Capture a screenshot (in the configured format) of the current page
         and sends the captured screenshot to the configured endpoint
         """
 
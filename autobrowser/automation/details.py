@@ -15,6 +15,7 @@ from typing import (
     Union,
     TYPE_CHECKING,
 )
+from zlib import crc32
 
 import attr
 import ujson
@@ -133,6 +134,41 @@ def convert_screenshot_dims(
     return dimensions
 
 
+def convert_screenshot_format(value: Optional[str]) -> str:
+    """Converts the supplied env string to the format screen shots are to be taken in,
+    one of png, jpeg or webp.
+
+    If the supplied value is not one of the supported formats png is used.
+
+    :return: The screen shot format
+    """
+    if value is None:
+        return "png"
+    value = value.strip().lower()
+    if value == "jpg":
+        return "jpeg"
+    if value not in ("png", "jpeg", "webp"):
+        logger.exception(
+            f"The supplied value ({value}) for the screen shot format is invalid, falling back to png"
+        )
+        return "png"
+    return value
+
+
+def convert_progress_signals(
+    value: Optional[Union[str, List[str]]]
+) -> Optional[List[str]]:
+    """Converts the supplied env string, a space or comma separated list of signal names,
+    to the list of signals used to determine if a behavior is making progress.
+
+    :return: The list of progress signal names or None to use all signals
+    """
+    if value is None or not isinstance(value, str):
+        return value
+    names = value.replace(",", " ").split()
+    return names if names else None
+
+
 @attr.dataclass(slots=True)
 class AutomationConfig:
     """The AutomationConfig class is the single source of truth for details
@@ -146,11 +182,54 @@ class AutomationConfig:
     browser_id: str = attr.ib(default=None)
     num_tabs: int = attr.ib(default=None)
     tab_type: str = attr.ib(default=None)
+    tab_concurrency: int = attr.ib(default=4)
+    browser_command_concurrency: int = attr.ib(default=4)
+    shepherd_wait_initial: float = attr.ib(default=0.05)
+    shepherd_wait_max: float = attr.ib(default=2)
+    shepherd_wait_deadline: float = attr.ib(default=120)
+    shepherd_ready_channel: str = attr.ib(default="")
+    autoscale: bool = attr.ib(default=False)
+    autoscale_min_browsers: int = attr.ib(default=1)
+    autoscale_max_browsers: int = attr.ib(default=10)
+    autoscale_interval: float = attr.ib(default=15)
+    autoscale_cooldown: float = attr.ib(default=60)
+    autoscale_target_drain_time: float = attr.ib(default=600)
+    autoscale_idle_time: float = attr.ib(default=60)
+    cdp_multiplex: bool = attr.ib(default=False)
+    browser_context_policy: str = attr.ib(default="none")
+    browser_context_pages: int = attr.ib(default=50)
     max_behavior_time: Union[int, float] = attr.ib(default=60)
+    learn_behavior_time: bool = attr.ib(default=False)
+    min_behavior_time: Union[int, float] = attr.ib(default=2)
+    max_learned_behavior_time: Union[int, float] = attr.ib(default=180)
+    behavior_time_min_samples: int = attr.ib(default=3)
+    behavior_time_budget: Union[int, float] = attr.ib(default=-1)
+    behavior_early_end: bool = attr.ib(default=False)
+    virtual_time_budget: Union[int, float] = attr.ib(default=0)
+    virtual_time_behaviors: Optional[Dict] = attr.ib(default=None)
+    behavior_progress_batch_size: int = attr.ib(default=5)
+    behavior_no_progress_limit: int = attr.ib(default=3)
+    behavior_progress_signals: Optional[List[str]] = attr.ib(
+        default=None, converter=convert_progress_signals
+    )
     navigation_timeout: Union[int, float] = attr.ib(default=30)
+    inner_page_links_max: int = attr.ib(default=100)
+    tab_max_js_heap: int = attr.ib(default=0)
+    tab_max_dom_nodes: int = attr.ib(default=0)
+    tab_max_documents: int = attr.ib(default=0)
+    inner_page_links_settle_time: Union[int, float] = attr.ib(default=0.5)
+    inner_page_links_max_wait: Union[int, float] = attr.ib(default=5)
+    http_proxy_url: Optional[str] = attr.ib(default=None)
+    content_probe: bool = attr.ib(default=False)
+    content_probe_timeout: Union[int, float] = attr.ib(default=5)
+    content_probe_cache_size: int = attr.ib(default=10000)
+    fetch_max_parse_bytes: int = attr.ib(default=5 * 1024 * 1024)
+    fetch_escalate_min_text: int = attr.ib(default=256)
     wait_for_q: Optional[Union[int, float]] = attr.ib(default=-1)
     wait_for_q_poll_rate: Optional[Union[int, float]] = attr.ib(default=-1)
     net_cache_disabled: bool = attr.ib(default=True)
+    net_idle_min_time: Union[int, float] = attr.ib(default=0.5)
+    net_idle_long_lived_time: Union[int, float] = attr.ib(default=10)
     browser_overrides: Optional[Dict] = attr.ib(default=None)
 
     # configuration details concerning redis
@@ -169,6 +248,11 @@ class AutomationConfig:
     outlinks_expression: str = attr.ib(default=None)
     clear_outlinks_expression: str = attr.ib(default=None)
     no_out_links_express: str = attr.ib(default=None)
+    progress_signals_expression: str = attr.ib(default=None)
+    pending_outlinks_expression: str = attr.ib(default=None)
+    outlinks_collect_count: int = attr.ib(default=250)
+    outlinks_collect_bytes: int = attr.ib(default=65536)
+    outlinks_collect_interval: Union[int, float] = attr.ib(default=10)
 
     # configuration details concerning shepherd
     shepherd_host: str = attr.ib(default=None)
@@ -182,15 +266,49 @@ class AutomationConfig:
     # configuration details concerning where to send data
     # during the crawl to if we are to send something
     screenshot_api_url: Optional[str] = attr.ib(default=None)
-    screenshot_format: Optional[str] = attr.ib(default=None)
+    screenshot_format: str = attr.ib(
+        default="png", converter=convert_screenshot_format
+    )
+    screenshot_quality: int = attr.ib(default=80)
     screenshot_dimensions: Optional[Tuple[float, float]] = attr.ib(
         default=None, converter=convert_screenshot_dims
     )
+    screenshot_tile_height: int = attr.ib(default=8192)
+    screenshot_thumbnail_width: int = attr.ib(default=0)
+    screenshot_dedup: bool = attr.ib(default=False)
+    screenshot_dedup_distance: int = attr.ib(default=4)
+    screenshot_dedup_index_size: int = attr.ib(default=1000)
     extracted_mhtml_api_url: Optional[str] = attr.ib(default=None)
     extracted_raw_dom_api_url: Optional[str] = attr.ib(default=None)
+    raw_dom_format: str = attr.ib(default="tree")
+    raw_dom_gzip: bool = attr.ib(default=False)
+    upload_concurrency: int = attr.ib(default=2)
+    upload_max_memory: int = attr.ib(default=64 * 1024 * 1024)
+    upload_max_spill: int = attr.ib(default=1024 * 1024 * 1024)
+    upload_max_retries: int = attr.ib(default=3)
+    upload_retry_backoff: Union[int, float] = attr.ib(default=1)
+    upload_spill_dir: Optional[str] = attr.ib(default=None)
 
     # other configuration details
     chrome_opts: Optional[Dict] = attr.ib(default=None, repr=False)
+    local_browsers: int = attr.ib(default=0)
+    local_browser_base_port: int = attr.ib(default=9222)
+    local_browser_max_restarts: int = attr.ib(default=5)
+    worker_index: int = attr.ib(default=0)
+    num_workers: int = attr.ib(default=1)
+    outlink_batch_threshold: int = attr.ib(default=1000)
+    outlink_workers: int = attr.ib(default=2)
+    outlink_pool: str = attr.ib(default="process")
+    loop_lag_monitor: bool = attr.ib(default=True)
+    loop_lag_interval: float = attr.ib(default=0.25)
+    loop_lag_threshold: float = attr.ib(default=0.1)
+    loop_lag_report_interval: float = attr.ib(default=60)
+    profile_duration: float = attr.ib(default=30)
+    profile_interval: float = attr.ib(default=0.005)
+    profile_dir: Optional[str] = attr.ib(default=None)
+    profile_upload_url: Optional[str] = attr.ib(default=None)
+    cdp_metrics: bool = attr.ib(default=False)
+    cdp_metrics_export: bool = attr.ib(default=False)
     additional_configuration: Optional[Dict] = attr.ib(default=None)
 
     @property
@@ -201,6 +319,11 @@ class AutomationConfig:
         """
         return self.screenshot_api_url is not None
 
+    @property
+    def screenshot_content_type(self) -> str:
+        """Returns the content-type of the screenshots taken"""
+        return f"image/{self.screenshot_format}"
+
     @property
     def should_retrieve_raw_dom(self) -> bool:
         return self.extracted_raw_dom_api_url is not None
@@ -219,10 +342,39 @@ class AutomationConfig:
             )
         )
 
+    @property
+    def requires_behavior_name(self) -> bool:
+        """Returns T/F indicating if the name of the behavior to be run for a page
+        must be known before running it (learned run times or per behavior virtual time)
+        """
+        return self.learn_behavior_time or bool(self.virtual_time_behaviors)
+
+    def virtual_time_budget_for(self, behavior_name: Optional[str] = None) -> float:
+        """Returns the amount of virtual time (in seconds) to fast-forward
+        while the named behavior runs, zero meaning virtual time is not used
+
+        :param behavior_name: The name of the behavior to be run
+        :return: The virtual time budget for the behavior
+        """
+        if self.virtual_time_behaviors and behavior_name in self.virtual_time_behaviors:
+            return self.virtual_time_behaviors[behavior_name]
+        return self.virtual_time_budget
+
     @property
     def has_browser_overrides(self) -> bool:
         return self.browser_overrides is not None
 
+    def handles_reqid(self, reqid: str) -> bool:
+        """Returns T/F indicating if the browser signified by the supplied request id
+        is handled by this worker, when running multiple worker processes
+
+        :param reqid: The request id of a browser
+        :return: T/F indicating if the browser is handled by this worker
+        """
+        if self.num_workers <= 1:
+            return True
+        return crc32(reqid.encode("utf-8")) % self.num_workers == self.worker_index
+
     def make_shepherd_url(self, shepherd_endpoint: str = "") -> str:
         """Creates a full shepherd end point URL using the supplied
         endpoint URL
@@ -341,6 +493,38 @@ class AutomationConfig:
         """Creates and returns the value for the redis_config property"""
         return RedisKeys(self)
 
+    @browser_context_policy.validator
+    def check_browser_context_policy(self, attribute: Any, value: str) -> None:
+        """Ensures the browser context policy is known and, if not none, that the tabs
+        have the browser level connection creating and disposing of contexts requires"""
+        if value not in ("none", "automation", "pages", "host"):
+            raise ValueError(f"Invalid browser context policy: '{value}'")
+        if value != "none" and not self.cdp_multiplex:
+            raise ValueError(
+                f"The browser context policy '{value}' requires CDP_MULTIPLEX, browser "
+                "contexts can only be created over the browser level connection"
+            )
+
+    @content_probe.validator
+    def check_content_probe(self, attribute: Any, value: bool) -> None:
+        """Ensures the URLs the content probe captures without a browser are
+        fetched through the recording proxy, otherwise they would not be archived"""
+        if value and not self.http_proxy_url:
+            raise ValueError(
+                "CONTENT_PROBE requires HTTP_PROXY_URL, the non-HTML URLs it captures "
+                "are only archived when fetched through the recording proxy"
+            )
+
+    @tab_type.validator
+    def check_tab_type(self, attribute: Any, value: Optional[str]) -> None:
+        """Ensures fetch tabs have the recording proxy their requests are made through,
+        otherwise the pages they crawl would not be archived"""
+        if value == "FetchTab" and not self.http_proxy_url:
+            raise ValueError(
+                "The FetchTab tab type requires HTTP_PROXY_URL, the pages it fetches "
+                "are only archived when fetched through the recording proxy"
+            )
+
 
 def build_automation_config(
     options: Optional[Dict] = None, **kwargs: Any
@@ -356,6 +540,26 @@ def build_automation_config(
     conf = dict(
         redis_url=env("REDIS_URL", default="redis://localhost"),
         tab_type=env("TAB_TYPE", default="BehaviorTab"),
+        tab_concurrency=env("TAB_CONCURRENCY", type_=int, default=4),
+        browser_command_concurrency=env(
+            "BROWSER_COMMAND_CONCURRENCY", type_=int, default=4
+        ),
+        shepherd_wait_initial=env("SHEPHERD_WAIT_INITIAL", type_=float, default=0.05),
+        shepherd_wait_max=env("SHEPHERD_WAIT_MAX", type_=float, default=2),
+        shepherd_wait_deadline=env("SHEPHERD_WAIT_DEADLINE", type_=float, default=120),
+        shepherd_ready_channel=env("SHEPHERD_READY_CHANNEL", default=""),
+        autoscale=env("AUTOSCALE", type_=bool, default=False),
+        autoscale_min_browsers=env("AUTOSCALE_MIN_BROWSERS", type_=int, default=1),
+        autoscale_max_browsers=env("AUTOSCALE_MAX_BROWSERS", type_=int, default=10),
+        autoscale_interval=env("AUTOSCALE_INTERVAL", type_=float, default=15),
+        autoscale_cooldown=env("AUTOSCALE_COOLDOWN", type_=float, default=60),
+        autoscale_target_drain_time=env(
+            "AUTOSCALE_TARGET_DRAIN_TIME", type_=float, default=600
+        ),
+        autoscale_idle_time=env("AUTOSCALE_IDLE_TIME", type_=float, default=60),
+        cdp_multiplex=env("CDP_MULTIPLEX", type_=bool, default=False),
+        browser_context_policy=env("BROWSER_CONTEXT_POLICY", default="none"),
+        browser_context_pages=env("BROWSER_CONTEXT_PAGES", type_=int, default=50),
         browser_id=env("BROWSER_ID", default="chrome:67"),
         browser_host=browser_host,
         browser_host_ip=get_browser_host_ip(browser_host),
@@ -364,11 +568,80 @@ def build_automation_config(
         autoid=env("AUTO_ID", default=""),
         reqid=env("REQ_ID", default=""),
         chrome_opts=env("CHROME_OPTS", type_=dict),
+        local_browsers=env("LOCAL_BROWSERS", type_=int, default=0),
+        local_browser_base_port=env(
+            "LOCAL_BROWSER_BASE_PORT", type_=int, default=9222
+        ),
+        local_browser_max_restarts=env(
+            "LOCAL_BROWSER_MAX_RESTARTS", type_=int, default=5
+        ),
+        worker_index=env("WORKER_INDEX", type_=int, default=0),
+        num_workers=env("NUM_WORKERS", type_=int, default=1),
+        outlink_batch_threshold=env(
+            "OUTLINK_BATCH_THRESHOLD", type_=int, default=1000
+        ),
+        outlink_workers=env("OUTLINK_WORKERS", type_=int, default=2),
+        outlink_pool=env("OUTLINK_POOL", default="process"),
+        loop_lag_monitor=env("LOOP_LAG_MONITOR", type_=bool, default=True),
+        loop_lag_interval=env("LOOP_LAG_INTERVAL", type_=float, default=0.25),
+        loop_lag_threshold=env("LOOP_LAG_THRESHOLD", type_=float, default=0.1),
+        loop_lag_report_interval=env(
+            "LOOP_LAG_REPORT_INTERVAL", type_=float, default=60
+        ),
+        profile_duration=env("PROFILE_DURATION", type_=float, default=30),
+        profile_interval=env("PROFILE_INTERVAL", type_=float, default=0.005),
+        profile_dir=env("PROFILE_DIR"),
+        profile_upload_url=env("PROFILE_UPLOAD_URL"),
+        cdp_metrics=env("CDP_METRICS", type_=bool, default=False),
+        cdp_metrics_export=env("CDP_METRICS_EXPORT", type_=bool, default=False),
         max_behavior_time=env("BEHAVIOR_RUN_TIME", type_=float, default=60),
+        learn_behavior_time=env("LEARN_BEHAVIOR_TIME", type_=bool, default=False),
+        min_behavior_time=env("BEHAVIOR_MIN_RUN_TIME", type_=float, default=2),
+        max_learned_behavior_time=env(
+            "BEHAVIOR_MAX_RUN_TIME", type_=float, default=180
+        ),
+        behavior_time_min_samples=env(
+            "BEHAVIOR_TIME_MIN_SAMPLES", type_=int, default=3
+        ),
+        behavior_time_budget=env("BEHAVIOR_TIME_BUDGET", type_=float, default=-1),
+        behavior_early_end=env("BEHAVIOR_EARLY_END", type_=bool, default=False),
+        virtual_time_budget=env("VIRTUAL_TIME_BUDGET", type_=float, default=0),
+        virtual_time_behaviors=env("VIRTUAL_TIME_BEHAVIORS", type_=dict),
+        behavior_progress_batch_size=env(
+            "BEHAVIOR_PROGRESS_BATCH", type_=int, default=5
+        ),
+        behavior_no_progress_limit=env(
+            "BEHAVIOR_NO_PROGRESS_LIMIT", type_=int, default=3
+        ),
+        behavior_progress_signals=env("BEHAVIOR_PROGRESS_SIGNALS"),
         navigation_timeout=env("NAV_TO", type_=float, default=30),
+        inner_page_links_max=env("INNER_PAGE_LINKS_MAX", type_=int, default=100),
+        tab_max_js_heap=env("TAB_MAX_JS_HEAP", type_=int, default=0),
+        tab_max_dom_nodes=env("TAB_MAX_DOM_NODES", type_=int, default=0),
+        tab_max_documents=env("TAB_MAX_DOCUMENTS", type_=int, default=0),
+        inner_page_links_settle_time=env(
+            "INNER_PAGE_LINKS_SETTLE_TIME", type_=float, default=0.5
+        ),
+        inner_page_links_max_wait=env(
+            "INNER_PAGE_LINKS_MAX_WAIT", type_=float, default=5
+        ),
+        http_proxy_url=env("HTTP_PROXY_URL"),
+        content_probe=env("CONTENT_PROBE", type_=bool, default=False),
+        content_probe_timeout=env("CONTENT_PROBE_TIMEOUT", type_=float, default=5),
+        content_probe_cache_size=env(
+            "CONTENT_PROBE_CACHE_SIZE", type_=int, default=10000
+        ),
+        fetch_max_parse_bytes=env(
+            "FETCH_MAX_PARSE_BYTES", type_=int, default=5 * 1024 * 1024
+        ),
+        fetch_escalate_min_text=env("FETCH_ESCALATE_MIN_TEXT", type_=int, default=256),
         wait_for_q=env("WAIT_FOR_Q", type_=int, default=-1),
         wait_for_q_poll_rate=env("WAIT_FOR_Q_POLL_RATE", type_=int, default=5),
         net_cache_disabled=env("CRAWL_NO_NETCACHE", type_=bool, default=True),
+        net_idle_min_time=env("NET_IDLE_MIN_TIME", type_=float, default=0.5),
+        net_idle_long_lived_time=env(
+            "NET_IDLE_LONG_LIVED_TIME", type_=float, default=10
+        ),
         behavior_api_url=behavior_api_url,
         fetch_behavior_endpoint=env(
             "FETCH_BEHAVIOR_ENDPOINT", default=f"{behavior_api_url}/behavior?url="
@@ -378,9 +651,33 @@ def build_automation_config(
         ),
         screenshot_api_url=env("SCREENSHOT_API_URL"),
         screenshot_format=env("SCREENSHOT_FORMAT", default="png"),
+        screenshot_quality=env("SCREENSHOT_QUALITY", type_=int, default=80),
         screenshot_dimensions=env("SCREENSHOT_DIMENSIONS"),
+        screenshot_tile_height=env("SCREENSHOT_TILE_HEIGHT", type_=int, default=8192),
+        screenshot_thumbnail_width=env(
+            "SCREENSHOT_THUMBNAIL_WIDTH", type_=int, default=0
+        ),
+        screenshot_dedup=env("SCREENSHOT_DEDUP", type_=bool, default=False),
+        screenshot_dedup_distance=env(
+            "SCREENSHOT_DEDUP_DISTANCE", type_=int, default=4
+        ),
+        screenshot_dedup_index_size=env(
+            "SCREENSHOT_DEDUP_INDEX_SIZE", type_=int, default=1000
+        ),
         extracted_mhtml_api_url=env("EXTRACTED_MHTML_API_URL"),
         extracted_raw_dom_api_url=env("EXTRACTED_RAW_DOM_API_URL"),
+        raw_dom_format=env("RAW_DOM_FORMAT", default="tree"),
+        raw_dom_gzip=env("RAW_DOM_GZIP", type_=bool, default=False),
+        upload_concurrency=env("UPLOAD_CONCURRENCY", type_=int, default=2),
+        upload_max_memory=env(
+            "UPLOAD_MAX_MEMORY", type_=int, default=64 * 1024 * 1024
+        ),
+        upload_max_spill=env(
+            "UPLOAD_MAX_SPILL", type_=int, default=1024 * 1024 * 1024
+        ),
+        upload_max_retries=env("UPLOAD_MAX_RETRIES", type_=int, default=3),
+        upload_retry_backoff=env("UPLOAD_RETRY_BACKOFF", type_=float, default=1),
+        upload_spill_dir=env("UPLOAD_SPILL_DIR"),
         cdp_port=env("CDP_PORT", default="9222"),
         req_browser_path=env("REQ_BROWSER_PATH", default="/request_browser/"),
         init_browser_pathq=env("INIT_BROWSER_PATH", default="/init_browser?reqid="),
@@ -405,6 +702,35 @@ def build_automation_config(
         no_out_links_express=env(
             "NO_OUT_LINKS_EXPRESS", default="window.$WBNOOUTLINKS = true;"
         ),
+        outlinks_collect_count=env("OUTLINKS_COLLECT_COUNT", type_=int, default=250),
+        outlinks_collect_bytes=env(
+            "OUTLINKS_COLLECT_BYTES", type_=int, default=65536
+        ),
+        outlinks_collect_interval=env(
+            "OUTLINKS_COLLECT_INTERVAL", type_=float, default=10
+        ),
+        pending_outlinks_expression=env(
+            "PENDING_OUTLINKS_EXPRESSION",
+            default=(
+                "(() => { const s = window.$wbOutlinkSet$; if (!s) return [0, 0]; "
+                "let p = s.$wbPending$; if (!p) { p = s.$wbPending$ = [s.size, 0]; "
+                "for (const u of s) p[1] += String(u).length; "
+                "const add = s.add, del = s.delete, clear = s.clear; "
+                "s.add = function (u) { if (!this.has(u)) { p[0] += 1; p[1] += String(u).length; } "
+                "return add.call(this, u); }; "
+                "s.delete = function (u) { if (this.has(u)) { p[0] -= 1; p[1] -= String(u).length; } "
+                "return del.call(this, u); }; "
+                "s.clear = function () { p[0] = 0; p[1] = 0; return clear.call(this); }; } "
+                "return [p[0], p[1]]; })()"
+            ),
+        ),
+        progress_signals_expression=env(
+            "PROGRESS_SIGNALS_EXPRESSION",
+            default=(
+                "({nodes: document.getElementsByTagName('*').length, "
+                "outlinks: window.$wbOutlinkSet$ ? window.$wbOutlinkSet$.size : 0})"
+            ),
+        ),
     )
     user_conf = {}
     if options is not None:
@@ -442,11 +768,15 @@ class RedisKeys:
         "__weakref__",
         "auto_done",
         "autoid",
+        "behavior_times",
+        "cdp_metrics",
+        "escalated",
         "inner_page_links",
         "info",
         "pending",
         "queue",
         "scope",
+        "screenshot_hashes",
         "seen",
     ]
 
@@ -462,6 +792,10 @@ class RedisKeys:
         self.seen: str = f"{self.autoid}:seen"
         self.scope: str = f"{self.autoid}:scope"
         self.auto_done: str = f"{self.autoid}:br:done"
+        self.behavior_times: str = f"{self.autoid}:btimes"
+        self.escalated: str = f"{self.autoid}:escq"
+        self.screenshot_hashes: str = f"{self.autoid}:shashes"
+        self.cdp_metrics: str = f"{self.autoid}:cdpmetrics"
         self.inner_page_links: str = f"{self.autoid}:{config.reqid}:ipls"
 
 
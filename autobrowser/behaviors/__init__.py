@@ -1,4 +1,11 @@
+from .budgets import BehaviorTimeBudgets
 from .managers import RemoteBehaviorManager
+from .progress import BehaviorProgressMonitor
 from .runners import WRBehaviorRunner
 
-__all__ = ["RemoteBehaviorManager", "WRBehaviorRunner"]
+__all__ = [
+    "BehaviorProgressMonitor",
+    "BehaviorTimeBudgets",
+    "RemoteBehaviorManager",
+    "WRBehaviorRunner",
+]
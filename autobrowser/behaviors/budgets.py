@@ -0,0 +1,198 @@
+from math import sqrt
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+from aioredis import Redis
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.util import AutoLogger, Helper, create_autologger
+
+__all__ = ["BehaviorTimeBudgets"]
+
+AnyHost: str = "*"
+SpentField: str = "spent"
+StatFields: List[str] = ["n", "fin", "sum", "sq"]
+
+
+class BehaviorTimeBudgets:
+    """Learns how long behaviors need to run for from how long they previously ran,
+    keyed by behavior name and host, and uses the learned run times to determine
+    the maximum amount of time a behavior is allowed to run for on a page.
+
+    The aggregates kept per behavior name and host (and per behavior name for any host)
+    are the number of runs, the number of runs that finished before timing out, and
+    the sum and sum of squares of the finished runs durations. If a redis instance is
+    supplied the aggregates are stored in the automation's behavior times hash, shared
+    by every tab of the automation, otherwise they are kept locally.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "config",
+        "key",
+        "local",
+        "logger",
+        "max_time",
+        "min_samples",
+        "min_time",
+        "redis",
+        "total_budget",
+    ]
+
+    def __init__(self, config: AutomationConfig, redis: Optional[Redis] = None) -> None:
+        """Initialize the new BehaviorTimeBudgets instance
+
+        :param config: The automation config
+        :param redis: Optional redis instance used to share the aggregates
+        """
+        self.config: AutomationConfig = config
+        self.redis: Optional[Redis] = redis
+        self.key: str = config.redis_keys.behavior_times
+        self.min_time: Union[int, float] = config.min_behavior_time
+        self.max_time: Union[int, float] = config.max_learned_behavior_time
+        self.min_samples: int = config.behavior_time_min_samples
+        self.total_budget: Union[int, float] = config.behavior_time_budget
+        self.local: Dict[str, float] = {}
+        self.logger: AutoLogger = create_autologger(
+            "behaviorBudgets", "BehaviorTimeBudgets"
+        )
+
+    async def budget_for(self, behavior_name: str, url: str) -> Union[int, float]:
+        """Returns the maximum amount of time the named behavior is allowed to run for
+        on the page the supplied URL is for.
+
+        If there are not enough runs of the behavior on the page's host the runs of the
+        behavior on any host are used, and if there are not enough of those the configured
+        maximum behavior run time is used.
+
+        :param behavior_name: The name of the behavior to be run
+        :param url: The URL of the page the behavior is to be run on
+        :return: The maximum amount of time the behavior is allowed to run for
+        """
+        host = urlsplit(url).netloc
+        fields = self._stat_fields(behavior_name, host)
+        fields.extend(self._stat_fields(behavior_name, AnyHost))
+        fields.append(SpentField)
+        values = await self._get(fields)
+        host_stats = values[0:4]
+        any_host_stats = values[4:8]
+        spent = values[8]
+        source = "host"
+        budget = self._estimate(*host_stats)
+        if budget is None:
+            source = "behavior"
+            budget = self._estimate(*any_host_stats)
+        if budget is None:
+            source = "default"
+            budget = self.config.max_behavior_time
+        if self.total_budget != -1:
+            remaining = self.total_budget - spent
+            if remaining < budget:
+                source = "automation"
+                budget = max(remaining, self.min_time)
+        self.logger.info(
+            "budget_for",
+            Helper.json_string(
+                behavior=behavior_name,
+                host=host,
+                budget=round(budget, 3),
+                source=source,
+                runs=host_stats[0],
+                spent=round(spent, 3),
+            ),
+        )
+        return budget
+
+    async def record(
+        self,
+        behavior_name: str,
+        url: str,
+        duration: Union[int, float],
+        finished: bool,
+    ) -> None:
+        """Records a run of the named behavior on the page the supplied URL is for
+
+        :param behavior_name: The name of the behavior that was run
+        :param url: The URL of the page the behavior was run on
+        :param duration: How long the behavior ran for
+        :param finished: T/F indicating if the behavior finished or timed out
+        """
+        host = urlsplit(url).netloc
+        increments: Dict[str, float] = {SpentField: duration}
+        for key_host in (host, AnyHost):
+            n, fin, sum_, sq = self._stat_fields(behavior_name, key_host)
+            increments[n] = 1
+            if finished:
+                increments[fin] = 1
+                increments[sum_] = duration
+                increments[sq] = duration * duration
+        try:
+            await self._increment(increments)
+        except Exception as e:
+            self.logger.exception(
+                "record", "recording the behavior run time failed", exc_info=e
+            )
+            return
+        self.logger.debug(
+            "record",
+            Helper.json_string(
+                behavior=behavior_name,
+                host=host,
+                duration=round(duration, 3),
+                finished=finished,
+            ),
+        )
+
+    def _estimate(
+        self, n: float, fin: float, sum_: float, sq: float
+    ) -> Optional[Union[int, float]]:
+        """Estimates the time the behavior needs from the aggregates of its previous runs
+
+        :return: The estimated time bounded by the configured min and max times or None
+        if there are not enough runs to estimate from
+        """
+        if n < self.min_samples:
+            return None
+        # the behavior timed out more often than not, give it all the time we can
+        if fin * 2 < n:
+            return self.max_time
+        mean = sum_ / fin
+        std_dev = sqrt(max(sq / fin - mean * mean, 0))
+        estimate = (mean + 2 * std_dev) * 1.25
+        return min(max(estimate, self.min_time), self.max_time)
+
+    async def _get(self, fields: List[str]) -> List[float]:
+        if self.redis is None:
+            local = self.local
+            return [local.get(field, 0.0) for field in fields]
+        try:
+            values = await self.redis.hmget(self.key, *fields)
+        except Exception as e:
+            self.logger.exception(
+                "_get", "retrieving the behavior run times failed", exc_info=e
+            )
+            return [0.0] * len(fields)
+        return [float(value) if value is not None else 0.0 for value in values]
+
+    async def _increment(self, increments: Dict[str, float]) -> None:
+        if self.redis is None:
+            local = self.local
+            for field, amount in increments.items():
+                local[field] = local.get(field, 0.0) + amount
+            return
+        transaction = self.redis.multi_exec()
+        for field, amount in increments.items():
+            transaction.hincrbyfloat(self.key, field, amount)
+        await transaction.execute()
+
+    @staticmethod
+    def _stat_fields(behavior_name: str, host: str) -> List[str]:
+        prefix = f"{behavior_name}|{host}"
+        return [f"{prefix}|{stat}" for stat in StatFields]
+
+    def __str__(self) -> str:
+        info = f"min_time={self.min_time}, max_time={self.max_time}, total_budget={self.total_budget}"
+        return f"BehaviorTimeBudgets({info}, shared={self.redis is not None})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
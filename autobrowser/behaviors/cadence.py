@@ -0,0 +1,130 @@
+from asyncio import AbstractEventLoop
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from autobrowser.util import AutoLogger, Helper, create_autologger
+
+__all__ = ["OutlinkCollectionCadence"]
+
+#: How many actions are performed between collections when the pending
+#: out links can not be determined (the previous fixed cadence)
+FALLBACK_ACTIONS: int = 10
+
+
+class OutlinkCollectionCadence:
+    """Determines when the out links collected by a running behavior should be
+    collected by the tab, adapting to how quickly the page produces new out links.
+
+    After every action the page side counter of pending (not yet collected) out links
+    is checked and collection is triggered once one of the following is true:
+      - count: the number of pending out links reached the configured count
+      - bytes: the combined length of the pending out links reached the configured size
+      - time: there are pending out links and the configured interval elapsed
+        since the last collection
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_actions_since",
+        "_last_collection",
+        "evaluate",
+        "logger",
+        "loop",
+        "max_bytes",
+        "max_count",
+        "max_interval",
+        "num_collections",
+        "pending_expression",
+    ]
+
+    def __init__(
+        self,
+        evaluate: Callable[[str], Awaitable[Any]],
+        pending_expression: str,
+        max_count: int = 250,
+        max_bytes: int = 65536,
+        max_interval: Union[int, float] = 10,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> None:
+        """Initialize the new OutlinkCollectionCadence instance
+
+        :param evaluate: The function used to evaluate JS in the page (or frame) the behavior runs in
+        :param pending_expression: The JS expression returning the number of pending out links
+        and their combined length as a two element array
+        :param max_count: The number of pending out links that triggers collection
+        :param max_bytes: The combined length of the pending out links that triggers collection
+        :param max_interval: The maximum time (in seconds) pending out links wait to be collected
+        :param loop: The event loop used by the automation
+        """
+        self.evaluate: Callable[[str], Awaitable[Any]] = evaluate
+        self.pending_expression: str = pending_expression
+        self.max_count: int = max_count
+        self.max_bytes: int = max_bytes
+        self.max_interval: Union[int, float] = max_interval
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.num_collections: int = 0
+        self.logger: AutoLogger = create_autologger(
+            "outlinkCadence", "OutlinkCollectionCadence"
+        )
+        self._actions_since: int = 0
+        self._last_collection: float = self.loop.time()
+
+    async def should_collect(self) -> Optional[str]:
+        """Informs the cadence that an action was performed and determines if
+        the out links should be collected
+
+        :return: The reason for collecting the out links (count, bytes, time, fallback)
+        or None if they should not be collected yet
+        """
+        self._actions_since += 1
+        try:
+            pending = await self.evaluate(self.pending_expression)
+        except Exception as e:
+            self.logger.exception(
+                "should_collect", "evaluating the pending expression failed", exc_info=e
+            )
+            pending = None
+        if not isinstance(pending, list) or len(pending) != 2:
+            # the page did not tell us, use the fixed cadence
+            reason = "fallback" if self._actions_since >= FALLBACK_ACTIONS else None
+            return self._maybe_collect(reason, -1, -1)
+        count, size = pending
+        reason = None
+        if count >= self.max_count:
+            reason = "count"
+        elif size >= self.max_bytes:
+            reason = "bytes"
+        elif (
+            count > 0
+            and self.loop.time() - self._last_collection >= self.max_interval
+        ):
+            reason = "time"
+        return self._maybe_collect(reason, count, size)
+
+    def _maybe_collect(
+        self, reason: Optional[str], count: int, size: int
+    ) -> Optional[str]:
+        if reason is None:
+            return None
+        now = self.loop.time()
+        self.num_collections += 1
+        self.logger.info(
+            "should_collect",
+            Helper.json_string(
+                reason=reason,
+                pending=count,
+                bytes=size,
+                actions=self._actions_since,
+                elapsed=round(now - self._last_collection, 3),
+                collections=self.num_collections,
+            ),
+        )
+        self._actions_since = 0
+        self._last_collection = now
+        return reason
+
+    def __str__(self) -> str:
+        info = f"max_count={self.max_count}, max_bytes={self.max_bytes}, max_interval={self.max_interval}"
+        return f"OutlinkCollectionCadence({info}, collections={self.num_collections})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,163 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from autobrowser.abcs import Tab
+from autobrowser.util import AutoLogger, Helper, create_autologger
+
+__all__ = ["PROGRESS_SIGNALS", "BehaviorProgressMonitor"]
+
+#: The names of the signals the progress monitor knows how to track
+PROGRESS_SIGNALS: Set[str] = {"outlinks", "nodes", "responses"}
+
+
+class BehaviorProgressMonitor:
+    """Monitors if a running behavior is making progress by sampling cheap
+    signals after every batch of actions and indicates when the behavior should
+    be ended early because it has not made progress for N consecutive batches.
+
+    Signals:
+      - outlinks: the behavior collected new outlinks
+      - nodes: the page's DOM node count grew past its previous maximum
+      - responses: the page received new network responses
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_last_outlinks",
+        "_last_responses",
+        "_max_nodes",
+        "_num_actions",
+        "batch_size",
+        "evaluate",
+        "fired_rule",
+        "logger",
+        "max_no_progress",
+        "no_progress_batches",
+        "signals",
+        "signals_expression",
+        "tab",
+    ]
+
+    def __init__(
+        self,
+        tab: Tab,
+        evaluate: Callable[[str], Awaitable[Any]],
+        signals_expression: str,
+        batch_size: int = 5,
+        max_no_progress: int = 3,
+        signals: Optional[Iterable[str]] = None,
+    ) -> None:
+        """Initialize the new BehaviorProgressMonitor instance
+
+        :param tab: The tab the behavior is running in
+        :param evaluate: The function used to evaluate JS in the page (or frame) the behavior runs in
+        :param signals_expression: The JS expression returning the page's outlink and node counts
+        :param batch_size: How many actions make up a batch
+        :param max_no_progress: How many consecutive no progress batches end the behavior
+        :param signals: The signals that count as progress, defaults to all of them
+        """
+        self.tab: Tab = tab
+        self.evaluate: Callable[[str], Awaitable[Any]] = evaluate
+        self.signals_expression: str = signals_expression
+        self.batch_size: int = max(batch_size, 1)
+        self.max_no_progress: int = max(max_no_progress, 1)
+        self.signals: Set[str] = (
+            PROGRESS_SIGNALS.intersection(signals)
+            if signals is not None
+            else set(PROGRESS_SIGNALS)
+        )
+        self.no_progress_batches: int = 0
+        self.fired_rule: Optional[str] = None
+        self.logger: AutoLogger = create_autologger(
+            "behaviorProgress", "BehaviorProgressMonitor"
+        )
+        self._num_actions: int = 0
+        self._last_outlinks: int = 0
+        self._last_responses: int = self._num_responses()
+        self._max_nodes: int = 0
+
+    @property
+    def should_end(self) -> bool:
+        """Returns T/F indicating if the behavior should be ended early"""
+        return self.fired_rule is not None
+
+    async def action_performed(self) -> bool:
+        """Informs the monitor that the behavior performed an action.
+        Once a batch of actions has been performed the signals are sampled.
+
+        :return: T/F indicating if the behavior should be ended early
+        """
+        self._num_actions += 1
+        if self._num_actions % self.batch_size != 0:
+            return False
+        deltas = await self._sample()
+        if deltas is None:
+            return False
+        progressed = [name for name in self.signals if deltas[name] > 0]
+        if progressed:
+            self.no_progress_batches = 0
+            return False
+        self.no_progress_batches += 1
+        self.logger.debug(
+            "action_performed",
+            Helper.json_string(
+                url=self.tab.tab_url,
+                no_progress_batches=self.no_progress_batches,
+                **deltas,
+            ),
+        )
+        if self.no_progress_batches < self.max_no_progress:
+            return False
+        signals = "+".join(sorted(self.signals))
+        self.fired_rule = f"no_{signals}_progress(batches={self.no_progress_batches}, batch_size={self.batch_size})"
+        self.logger.info(
+            "action_performed",
+            f"early end rule fired - {Helper.json_string(url=self.tab.tab_url, rule=self.fired_rule, actions=self._num_actions)}",
+        )
+        return True
+
+    async def _sample(self) -> Optional[Dict[str, int]]:
+        """Samples the signals returning how much each one changed since the last sample
+
+        :return: The change of each signal or None if sampling failed
+        """
+        try:
+            page_signals = await self.evaluate(self.signals_expression)
+        except Exception as e:
+            self.logger.exception(
+                "_sample", "evaluating the signals expression failed", exc_info=e
+            )
+            return None
+        if not isinstance(page_signals, dict):
+            return None
+        outlinks = page_signals.get("outlinks", 0)
+        nodes = page_signals.get("nodes", 0)
+        responses = self._num_responses()
+        # the outlinks collected by the behavior are cleared when the tab
+        # collects them, a smaller count means all current ones are new
+        new_outlinks = (
+            outlinks - self._last_outlinks
+            if outlinks >= self._last_outlinks
+            else outlinks
+        )
+        deltas = {
+            "outlinks": new_outlinks,
+            "nodes": max(nodes - self._max_nodes, 0),
+            "responses": responses - self._last_responses,
+        }
+        self._last_outlinks = outlinks
+        self._max_nodes = max(nodes, self._max_nodes)
+        self._last_responses = responses
+        return deltas
+
+    def _num_responses(self) -> int:
+        tracker = self.tab.request_tracker
+        if tracker is None:
+            return 0
+        return tracker.num_finished
+
+    def __str__(self) -> str:
+        info = f"batch_size={self.batch_size}, max_no_progress={self.max_no_progress}, signals={sorted(self.signals)}"
+        return f"BehaviorProgressMonitor({info}, fired_rule={self.fired_rule})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -6,6 +6,8 @@ from simplechrome.frame_manager import Frame
 
 from autobrowser.abcs import Behavior, Tab
 from autobrowser.util import AutoLogger, Helper, create_autologger
+from .cadence import OutlinkCollectionCadence
+from .progress import BehaviorProgressMonitor
 
 __all__ = ["WRBehaviorRunner"]
 
@@ -24,7 +26,9 @@ class WRBehaviorRunner(Behavior):
         "logger",
         "loop",
         "next_action_expression",
+        "outlink_cadence",
         "post_run_actions",
+        "progress_monitor",
         "tab",
     ]
 
@@ -64,6 +68,27 @@ class WRBehaviorRunner(Behavior):
         self._did_init: bool = False
         self._running_task: Optional[Task] = None
         self._num_actions_performed: int = 0
+        self.progress_monitor: Optional[BehaviorProgressMonitor] = None
+        self.outlink_cadence: Optional[OutlinkCollectionCadence] = None
+        config = tab.config
+        if collect_outlinks:
+            self.outlink_cadence = OutlinkCollectionCadence(
+                self.evaluate_in_page,
+                config.pending_outlinks_expression,
+                max_count=config.outlinks_collect_count,
+                max_bytes=config.outlinks_collect_bytes,
+                max_interval=config.outlinks_collect_interval,
+                loop=self.loop,
+            )
+        if config.behavior_early_end:
+            self.progress_monitor = BehaviorProgressMonitor(
+                tab,
+                self.evaluate_in_page,
+                config.progress_signals_expression,
+                batch_size=config.behavior_progress_batch_size,
+                max_no_progress=config.behavior_no_progress_limit,
+                signals=config.behavior_progress_signals,
+            )
 
     @property
     def done(self) -> bool:
@@ -192,12 +217,14 @@ class WRBehaviorRunner(Behavior):
           - perform behavior action
           - if not done perform the configured post behavior action action's
           - if done exit loop
+          - if configured to do so, end the behavior early when it is not making progress
           - sleep for one tick
         """
         perform_action = self.perform_action
         post_action = self._post_action
         behavior_done = self.__done
         helper_one_tick_sleep = Helper.one_tick_sleep
+        progress_monitor = self.progress_monitor
 
         while 1:
             await perform_action()
@@ -205,6 +232,16 @@ class WRBehaviorRunner(Behavior):
                 await post_action()
             else:
                 break
+            if (
+                progress_monitor is not None
+                and await progress_monitor.action_performed()
+            ):
+                self._done = True
+                self.logger.info(
+                    "_action_loop",
+                    f"ending early, {progress_monitor.fired_rule} - {self.tab.tab_url}",
+                )
+                break
             # we will wait 1 tick of the event loop before performing another action
             # in order to allow any other tasks to continue on
             await helper_one_tick_sleep()
@@ -220,13 +257,17 @@ class WRBehaviorRunner(Behavior):
             logged_method, Helper.json_string(action_count=self._num_actions_performed)
         )
         self._num_actions_performed += 1
-        # If the behavior runner is configured to collect out links, the collection occurs after every 10
-        # actions initiated. This is done in order to ensure that the performance of running an behavior does
-        # not degrade due to a page having lots of out links (10k+).
-        # Note: the previous handling of out links was to collect them after every action
-        if self.collect_outlinks and self._num_actions_performed % 10 == 0:
-            self.logger.debug(logged_method, f"collecting outlinks")
-            await self.tab.collect_outlinks()
+        # If the behavior runner is configured to collect out links, the collection occurs once the
+        # page has enough pending out links (count or bytes) or they have waited long enough.
+        # This keeps link dense pages from accumulating large numbers of out links (10k+) in the page
+        # while pages with few links are not collected from needlessly.
+        if self.collect_outlinks:
+            reason = await self.outlink_cadence.should_collect()
+            if reason is not None:
+                self.logger.debug(
+                    logged_method, f"collecting outlinks <reason={reason}>"
+                )
+                await self.tab.collect_outlinks()
 
     async def _post_run(self) -> None:
         """Executes the actions we are configured to do after the behavior has run.
@@ -1,4 +1,4 @@
-from asyncio import AbstractEventLoop
+from asyncio import AbstractEventLoop, Semaphore, gather
 from typing import Dict, List, Optional
 
 from aiohttp import ClientSession
@@ -13,7 +13,13 @@ from autobrowser.automation import (
 )
 from autobrowser.events import Events
 from autobrowser.tabs import create_tab
-from autobrowser.util import AutoLogger, Helper, create_autologger
+from autobrowser.uploads import UploadQueue
+from autobrowser.util import (
+    AutoLogger,
+    Helper,
+    MultiplexedConnection,
+    create_autologger,
+)
 
 __all__ = ["Chrome"]
 
@@ -27,20 +33,26 @@ class Chrome(Browser):
         behavior_manager: BehaviorManager,
         session: Optional[ClientSession] = None,
         redis: Optional[Redis] = None,
+        uploader: Optional[UploadQueue] = None,
         loop: Optional[AbstractEventLoop] = None,
     ) -> None:
         """
         :param config: The configuration of this automation
         :param loop: Optional reference to the running event loop
         :param redis: Optional instance of redis to use
+        :param uploader: Optional upload queue the tabs use to upload their artifacts
         """
         super().__init__(loop=Helper.ensure_loop(loop))
         self.tab_datas: List[Dict] = None
         self.redis: Optional[Redis] = redis
         self.session: Optional[ClientSession] = session
+        self.uploader: Optional[UploadQueue] = uploader
+        #: The single browser level connection the tabs share, if configured
+        self.connection: Optional[MultiplexedConnection] = None
         self.tabs: Dict[str, Tab] = {}
         self.tab_closed_reasons: Dict[str, TabClosedInfo] = {}
         self.running: bool = False
+        self._initializing_tabs: bool = False
         self.logger: AutoLogger = create_autologger("chrome_browser", "Chrome")
         self._config: AutomationConfig = config
         self._behavior_manager: BehaviorManager = behavior_manager
@@ -78,13 +90,33 @@ class Chrome(Browser):
         self.tab_closed_reasons.clear()
         if tab_datas is not None:
             self.tab_datas = tab_datas
-        for tab_data in self.tab_datas:
-            tab = await create_tab(
-                self, tab_data, redis=self.redis, session=self.session
+        if self._config.cdp_multiplex and self.tab_datas:
+            await self._connect_multiplexed()
+        logged_method = "init"
+        start = self.loop.time()
+        semaphore = self._tab_semaphore()
+        self._initializing_tabs = True
+        try:
+            await gather(
+                *[self._init_tab(tab_data, semaphore) for tab_data in self.tab_datas],
+                loop=self.loop,
             )
-            self.tabs[tab.tab_id] = tab
-            tab.on(Events.TabClosed, self._tab_closed)
+        finally:
+            self._initializing_tabs = False
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                tabs=len(self.tab_datas),
+                initialized=len(self.tabs),
+                failed=len(self.tab_datas) - len(self.tabs),
+                concurrency=self._config.tab_concurrency,
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
         await Helper.one_tick_sleep()
+        if self.running and len(self.tabs) == 0:
+            # every tab failed to initialize or finished while the others were initializing
+            await self.close()
 
     async def reinit(self, tab_data: Optional[List[Dict]] = None) -> None:
         """Re initialize the browser, if the browser was previously running
@@ -110,6 +142,9 @@ class Chrome(Browser):
         self.logger.info(logged_method, "initiating close")
         self.running = False
         await self._clear_tabs(gracefully)
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
         self.logger.info(logged_method, "closed")
         self.emit(
             Events.BrowserExiting,
@@ -123,6 +158,16 @@ class Chrome(Browser):
         self.logger.info("shutdown_gracefully", "shutting down")
         await self.close(gracefully=True)
 
+    async def _connect_multiplexed(self) -> None:
+        """Creates the single browser level connection the tabs share, if not connected"""
+        if self.connection is not None and self.connection.connected:
+            return
+        ws_url = await MultiplexedConnection.browser_ws_url(
+            self.session, self.tab_datas[0]["webSocketDebuggerUrl"]
+        )
+        self.connection = MultiplexedConnection(ws_url, self.session, loop=self.loop)
+        await self.connection.connect()
+
     async def _tab_closed(self, info: TabClosedInfo) -> None:
         """Listener registered to the Tab Closed event
 
@@ -139,9 +184,80 @@ class Chrome(Browser):
         self.logger.info(logged_method, f"removing Tab(tab_id={tab.tab_id})")
         self.tab_closed_reasons[tab.tab_id] = info
         tab.remove_listener(Events.TabClosed, self._tab_closed)
-        if len(self.tabs) == 0:
+        if len(self.tabs) == 0 and not self._initializing_tabs:
             await self.close()
 
+    def _tab_semaphore(self) -> Semaphore:
+        """Returns a new semaphore limiting the number of tabs initialized,
+        or shutdown, concurrently to the configured number"""
+        return Semaphore(max(self._config.tab_concurrency, 1), loop=self.loop)
+
+    async def _init_tab(self, tab_data: Dict, semaphore: Semaphore) -> None:
+        """Creates and initializes the tab for the supplied tab data.
+
+        If the tab fails to initialize the failure is recorded in the
+        `tab_closed_reasons` dictionary, rather than raised, so that
+        the failure does not prevent the other tabs from initializing.
+
+        :param tab_data: The data describing the actual browser tab
+        :param semaphore: The semaphore limiting the number of tabs initialized concurrently
+        """
+        logged_method = "_init_tab"
+        async with semaphore:
+            start = self.loop.time()
+            try:
+                tab = await create_tab(
+                    self,
+                    tab_data,
+                    redis=self.redis,
+                    session=self.session,
+                    uploader=self.uploader,
+                    connection=self.connection,
+                )
+            except Exception as e:
+                self.logger.exception(
+                    logged_method,
+                    f"initializing the tab for target {tab_data.get('id')} failed",
+                    exc_info=e,
+                )
+                self.tab_closed_reasons[tab_data.get("id")] = TabClosedInfo(
+                    tab_data.get("id"), CloseReason.CONNECTION_CLOSED
+                )
+                return
+            self.tabs[tab.tab_id] = tab
+            tab.on(Events.TabClosed, self._tab_closed)
+            self.logger.info(
+                logged_method,
+                Helper.json_string(
+                    tab_id=tab.tab_id, time=round(self.loop.time() - start, 3)
+                ),
+            )
+
+    async def _close_tab(
+        self, tab: Tab, close_gracefully: bool, semaphore: Semaphore
+    ) -> None:
+        """Shuts down the supplied tab and adds its exit info to the
+        `tab_closed_reasons` dictionary. If the tab fails to shutdown the
+        failure is logged rather than raised.
+
+        :param tab: The tab to be shutdown
+        :param close_gracefully: A boolean indicating if the
+        tab should be closed gracefully or forcefully
+        :param semaphore: The semaphore limiting the number of tabs shutdown concurrently
+        """
+        reason = CloseReason.GRACEFULLY if close_gracefully else CloseReason.CLOSED
+        async with semaphore:
+            try:
+                if close_gracefully:
+                    await tab.shutdown_gracefully()
+                else:
+                    await tab.close()
+            except Exception as e:
+                self.logger.exception(
+                    "_close_tab", f"shutting down {tab} failed", exc_info=e
+                )
+        self.tab_closed_reasons[tab.tab_id] = TabClosedInfo(tab.tab_id, reason)
+
     async def _clear_tabs(self, close_gracefully: bool = False) -> None:
         """Shuts down and remove all tabs for the browser and adds
         their exit info the the `tab_closed_reasons` dictionary.
@@ -149,19 +265,26 @@ class Chrome(Browser):
         :param close_gracefully: A boolean indicating if the the
         tabs should be closed gracefully or forcefully
         """
-        for tab in self.tabs.values():
-            tab.remove_listener(Events.TabClosed, self._tab_closed)
-            if close_gracefully:
-                await tab.shutdown_gracefully()
-                self.tab_closed_reasons[tab.tab_id] = TabClosedInfo(
-                    tab.tab_id, CloseReason.GRACEFULLY
-                )
-                continue
-            await tab.close()
-            self.tab_closed_reasons[tab.tab_id] = TabClosedInfo(
-                tab.tab_id, CloseReason.CLOSED
-            )
+        if not self.tabs:
+            return
+        start = self.loop.time()
+        tabs = list(self.tabs.values())
         self.tabs.clear()
+        for tab in tabs:
+            tab.remove_listener(Events.TabClosed, self._tab_closed)
+        semaphore = self._tab_semaphore()
+        await gather(
+            *[self._close_tab(tab, close_gracefully, semaphore) for tab in tabs],
+            loop=self.loop,
+        )
+        self.logger.info(
+            "_clear_tabs",
+            Helper.json_string(
+                tabs=len(tabs),
+                gracefully=close_gracefully,
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
 
     def __str__(self) -> str:
         return f"ChromeBrowser(config={self._config}, tabs={self.tabs}, running={self.running})"
@@ -1,11 +1,16 @@
+from .autoscaler import QueueAutoscaler
 from .basedriver import BaseDriver
-from .local import LocalBrowserDiver
+from .dispatcher import BrowserCommandDispatcher
+from .local import LocalBrowserDiver, LocalChromeProcess
 from .shepherd import MultiBrowserDriver, ShepherdDriver, SingleBrowserDriver
 
 __all__ = [
     "BaseDriver",
+    "BrowserCommandDispatcher",
     "LocalBrowserDiver",
+    "LocalChromeProcess",
     "MultiBrowserDriver",
+    "QueueAutoscaler",
     "ShepherdDriver",
     "SingleBrowserDriver",
 ]
@@ -0,0 +1,238 @@
+from asyncio import AbstractEventLoop, CancelledError, Task, sleep
+from math import ceil
+from typing import List, Optional, TYPE_CHECKING, Tuple
+
+from autobrowser.automation import AutomationConfig, RedisKeys
+from autobrowser.util import AutoLogger, Helper, create_autologger
+
+if TYPE_CHECKING:
+    from .shepherd import MultiBrowserDriver
+
+__all__ = ["QueueAutoscaler"]
+
+
+class QueueAutoscaler:
+    """Scales the number of browsers crawling an automation based on the depth of
+    the automation's queues and the measured crawl rate (pages per second).
+
+    Every interval the queues are sampled and:
+      - if, at the measured rate per browser, draining the queues would take longer than
+        the target drain time, browsers are added (staged and initialized using shepherd)
+        up to the number needed, bounded by the maximum
+      - if the queues have been empty for the idle time, a browser is gracefully
+        shutdown, bounded by the minimum
+
+    After each scaling action no further action is taken until the cooldown has passed.
+    Browsers still being added count towards the number of browsers and only the browsers
+    the autoscaler added are drained, never the browsers started by start commands.
+
+    The crawl rate is measured as the change of the number of completed URLs, the seen URLs
+    less the queued and pending URLs, between samples.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_last_completed",
+        "_last_sample",
+        "_last_scaled",
+        "_task",
+        "added",
+        "config",
+        "driver",
+        "empty_since",
+        "keys",
+        "logger",
+        "loop",
+        "num_added",
+        "num_drained",
+        "num_pending_adds",
+        "pages_per_second",
+    ]
+
+    def __init__(
+        self, driver: "MultiBrowserDriver", loop: Optional[AbstractEventLoop] = None
+    ) -> None:
+        """Initialize the new QueueAutoscaler instance
+
+        :param driver: The driver whose browsers are scaled
+        :param loop: The event loop used by the automation
+        """
+        self.driver: "MultiBrowserDriver" = driver
+        self.config: AutomationConfig = driver.conf
+        self.keys: RedisKeys = self.config.redis_keys
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.pages_per_second: float = 0.0
+        self.empty_since: Optional[float] = None
+        self.num_added: int = 0
+        self.num_drained: int = 0
+        #: The number of browsers being added
+        self.num_pending_adds: int = 0
+        #: The request ids of the browsers the autoscaler added, oldest first
+        self.added: List[str] = []
+        self.logger: AutoLogger = create_autologger("autoscaler", "QueueAutoscaler")
+        self._task: Optional[Task] = None
+        self._last_completed: Optional[int] = None
+        self._last_sample: float = 0.0
+        self._last_scaled: float = 0.0
+
+    @property
+    def num_browsers(self) -> int:
+        """Returns the number of browsers the driver is managing plus
+        the number of browsers being added"""
+        return len(self.driver.browsers) + self.num_pending_adds
+
+    def start(self) -> None:
+        """Starts scaling"""
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._scale_loop())
+
+    async def stop(self) -> None:
+        """Stops scaling"""
+        if self._task is None:
+            return
+        if not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except CancelledError:
+                pass
+        self._task = None
+
+    def desired_browsers(self, depth: int) -> int:
+        """Returns the number of browsers needed to drain the supplied queue depth within
+        the target drain time at the measured crawl rate, bounded by the configured
+        minimum and maximum
+
+        :param depth: The number of queued URLs
+        :return: The number of browsers needed
+        """
+        config = self.config
+        current = self.num_browsers
+        if depth == 0:
+            desired = current
+            if (
+                self.empty_since is not None
+                and self.loop.time() - self.empty_since >= config.autoscale_idle_time
+            ):
+                desired = current - 1
+        elif current == 0 or self.pages_per_second <= 0:
+            # no crawl rate has been measured yet, make sure something is crawling
+            desired = max(current, 1)
+        else:
+            per_browser = self.pages_per_second / current
+            desired = ceil(depth / (per_browser * config.autoscale_target_drain_time))
+            # never scale down while there is work queued
+            desired = max(desired, current)
+        return min(
+            max(desired, config.autoscale_min_browsers), config.autoscale_max_browsers
+        )
+
+    async def sample(self) -> Tuple[int, int]:
+        """Samples the automation's queues updating the measured crawl rate
+
+        :return: The number of queued URLs and the number of completed URLs
+        """
+        redis = self.driver.redis
+        keys = self.keys
+        transaction = redis.multi_exec()
+        transaction.llen(keys.queue)
+        transaction.llen(keys.escalated)
+        transaction.scard(keys.pending)
+        transaction.scard(keys.seen)
+        queued, escalated, pending, seen = await transaction.execute()
+        depth = queued + escalated
+        completed = max(seen - depth - pending, 0)
+        now = self.loop.time()
+        if self._last_completed is not None and now > self._last_sample:
+            self.pages_per_second = max(completed - self._last_completed, 0) / (
+                now - self._last_sample
+            )
+        self._last_completed = completed
+        self._last_sample = now
+        if depth == 0 and pending == 0:
+            if self.empty_since is None:
+                self.empty_since = now
+        else:
+            self.empty_since = None
+        return depth, completed
+
+    async def scale(self) -> None:
+        """Samples the automation's queues and adds or drains browsers if needed"""
+        logged_method = "scale"
+        depth, completed = await self.sample()
+        current = self.num_browsers
+        desired = self.desired_browsers(depth)
+        in_cooldown = (
+            self._last_scaled > 0
+            and self.loop.time() - self._last_scaled < self.config.autoscale_cooldown
+        )
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                depth=depth,
+                completed=completed,
+                pages_per_second=round(self.pages_per_second, 3),
+                browsers=current,
+                desired=desired,
+                cooldown=in_cooldown,
+            ),
+        )
+        if desired == current or in_cooldown:
+            return
+        self._last_scaled = self.loop.time()
+        if desired > current:
+            await self._add_browsers(desired - current)
+        else:
+            await self._drain_browser()
+
+    async def _scale_loop(self) -> None:
+        while 1:
+            await sleep(self.config.autoscale_interval, loop=self.loop)
+            try:
+                await self.scale()
+            except CancelledError:
+                raise
+            except Exception as e:
+                self.logger.exception("_scale_loop", "scaling failed", exc_info=e)
+
+    async def _add_browsers(self, count: int) -> None:
+        """Adds the supplied number of browsers, concurrently through the driver's dispatcher
+
+        :param count: The number of browsers to be added
+        """
+        self.logger.info("_add_browsers", f"adding {count} browsers")
+        for _ in range(count):
+            self.num_added += 1
+            self.num_pending_adds += 1
+            self.driver.dispatcher.dispatch(
+                f"autoscaler:{self.num_added}", "scale_up", self._add_browser
+            )
+
+    async def _add_browser(self) -> None:
+        """Adds a browser, remembering it as one the autoscaler may drain"""
+        try:
+            self.added.append(await self.driver.add_new_browser())
+        finally:
+            self.num_pending_adds -= 1
+
+    async def _drain_browser(self) -> None:
+        """Gracefully shuts down the most recently added browser the autoscaler added"""
+        browsers = self.driver.browsers
+        # forget the added browsers that exited on their own
+        self.added = [reqid for reqid in self.added if reqid in browsers]
+        if not self.added:
+            self.logger.info("_drain_browser", "no autoscaled browser to drain")
+            return
+        reqid = self.added.pop()
+        self.num_drained += 1
+        self.logger.info("_drain_browser", f"draining the browser reqid={reqid}")
+        self.driver.dispatcher.dispatch(
+            reqid, "scale_down", lambda: self.driver.remove_browser(reqid)
+        )
+
+    def __str__(self) -> str:
+        info = f"browsers={self.num_browsers}, pages_per_second={round(self.pages_per_second, 3)}"
+        return f"QueueAutoscaler({info}, added={self.num_added}, drained={self.num_drained})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
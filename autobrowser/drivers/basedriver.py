@@ -1,7 +1,11 @@
+import os
 from asyncio import AbstractEventLoop
 from collections import Counter
 from operator import itemgetter
-from typing import Counter as CounterT, List, Optional
+from signal import SIGUSR2
+from tempfile import gettempdir
+from time import strftime
+from typing import Counter as CounterT, List, Optional, Union
 
 from aiohttp import ClientSession
 from aioredis import Redis, create_redis_pool
@@ -11,7 +15,15 @@ from autobrowser.automation import AutomationConfig, BrowserExitInfo, ShutdownCo
 from autobrowser.behaviors import RemoteBehaviorManager
 from autobrowser.chrome_browser import Chrome
 from autobrowser.events import Events
-from autobrowser.util import AutoLogger, Helper, create_autologger
+from autobrowser.frontier.outlinks import shutdown_outlink_executor
+from autobrowser.uploads import UploadQueue
+from autobrowser.util import (
+    AutoLogger,
+    Helper,
+    LoopLagMonitor,
+    SamplingProfiler,
+    create_autologger,
+)
 
 __all__ = ["BaseDriver"]
 
@@ -35,9 +47,21 @@ class BaseDriver(Driver):
         self.behavior_manager: RemoteBehaviorManager = RemoteBehaviorManager(
             conf=self.conf, session=self.session, loop=self.loop
         )
+        self.uploader: UploadQueue = UploadQueue(self.session, self.conf, self.loop)
         self.redis: Redis = None
+        self.loop_lag_monitor: Optional[LoopLagMonitor] = (
+            LoopLagMonitor(
+                interval=conf.loop_lag_interval,
+                threshold=conf.loop_lag_threshold,
+                report_interval=conf.loop_lag_report_interval,
+                loop=self.loop,
+            )
+            if conf.loop_lag_monitor
+            else None
+        )
         self.logger: AutoLogger = create_autologger("drivers", self.__class__.__name__)
         self._browser_exit_infos: List[BrowserExitInfo] = []
+        self._profiling: bool = False
 
     async def init(self) -> None:
         """Initialize the driver."""
@@ -45,6 +69,11 @@ class BaseDriver(Driver):
         redis_url = self.conf.redis_url
         self.logger.info(logged_method, f"connecting to redis <url={redis_url}>")
         self.did_init = True
+        if self.loop_lag_monitor is not None:
+            self.loop_lag_monitor.start()
+        # kill -USR2 <pid> profiles the driver
+        self.loop.add_signal_handler(SIGUSR2, self._profile_on_signal)
+        self.uploader.start()
         self.redis = await create_redis_pool(
             redis_url, loop=self.loop, encoding="utf-8"
         )
@@ -67,6 +96,9 @@ class BaseDriver(Driver):
         """
         logged_method = "clean_up"
 
+        if self.uploader is not None:
+            await Helper.no_raise_await(self.uploader.close())
+
         if self.redis is not None:
             self.logger.info(logged_method, "closing redis connection")
             self.redis.close()
@@ -78,10 +110,17 @@ class BaseDriver(Driver):
             await Helper.no_raise_await(self.session.close())
             self.logger.info(logged_method, "closed HTTP session")
 
+        shutdown_outlink_executor()
+        self.loop.remove_signal_handler(SIGUSR2)
+
+        if self.loop_lag_monitor is not None:
+            await Helper.no_raise_await(self.loop_lag_monitor.stop())
+
         # ensure all underlying connections are closed
         await Helper.one_tick_sleep()
         self.redis = None
         self.behavior_manager = None
+        self.uploader = None
         self.session = None
 
     async def run(self) -> int:
@@ -152,6 +191,73 @@ class BaseDriver(Driver):
         exit_code, count = max(browser_exit_counter.items(), key=itemgetter(1))
         return exit_code
 
+    async def profile(
+        self, duration: Optional[Union[int, float]] = None
+    ) -> Optional[str]:
+        """Profiles the driver, using a sampling profiler, for the supplied number of seconds.
+        The sampled stacks are written, in the collapsed stack format flame graph tools read,
+        to a file in the configured profile directory and uploaded if a profile upload
+        endpoint is configured.
+
+        Only one profile is taken at a time.
+
+        :param duration: Optional number of seconds to profile for,
+        defaults to the configured duration
+        :return: The path to the profile or None if a profile is already being taken
+        """
+        logged_method = "profile"
+        if self._profiling:
+            self.logger.info(logged_method, "already profiling")
+            return None
+        self._profiling = True
+        conf = self.conf
+        duration = float(duration or conf.profile_duration)
+        profile_dir = conf.profile_dir or gettempdir()
+        path = os.path.join(
+            profile_dir,
+            f"autobrowser-{conf.reqid}-{os.getpid()}-{strftime('%Y%m%d%H%M%S')}.collapsed",
+        )
+        self.logger.info(logged_method, f"profiling for {duration} seconds")
+        profiler = SamplingProfiler(conf.profile_interval)
+        try:
+            num_samples = await self.loop.run_in_executor(None, profiler.run, duration)
+            os.makedirs(profile_dir, exist_ok=True)
+            await self.loop.run_in_executor(None, profiler.write, path)
+        except Exception as e:
+            self.logger.exception(logged_method, "profiling failed", exc_info=e)
+            return None
+        finally:
+            self._profiling = False
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                path=path,
+                duration=duration,
+                samples=num_samples,
+                stacks=len(profiler.counts),
+            ),
+        )
+        if conf.profile_upload_url and self.uploader is not None:
+            with open(path, "rb") as profile:
+                body = profile.read()
+            await self.uploader.put(
+                conf.profile_upload_url,
+                {
+                    "autoid": conf.autoid,
+                    "reqid": conf.reqid,
+                    "pid": str(os.getpid()),
+                    "format": "collapsed",
+                },
+                body,
+                "text/plain",
+            )
+        return path
+
+    def _profile_on_signal(self) -> None:
+        """Starts profiling the driver when the profile signal is received"""
+        self.logger.info("_profile_on_signal", "profile signal received")
+        self.loop.create_task(self.profile())
+
     def initiate_shutdown(self) -> None:
         """Initiate the complete shutdown of the driver (running automation).
 
@@ -0,0 +1,155 @@
+from asyncio import AbstractEventLoop, Semaphore, Task, wait
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from autobrowser.util import AutoLogger, Helper, create_autologger
+
+__all__ = ["BrowserCommandDispatcher"]
+
+#: A browser command, a function returning the awaitable performing the command
+BrowserCommand = Callable[[], Awaitable[None]]
+
+
+class BrowserCommandDispatcher:
+    """Runs the browser commands (adding or removing a browser) received by a driver
+    concurrently, up to the configured number at once, so that a slow browser startup
+    does not delay the commands for the other browsers.
+
+    The commands for the same browser (request id) are run in the order they were
+    dispatched, a command waits for the previous command for its browser to complete.
+
+    The optional idle callback is called whenever the last pending command completes.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_chains",
+        "_semaphore",
+        "_tasks",
+        "closed",
+        "logger",
+        "loop",
+        "max_concurrency",
+        "num_completed",
+        "num_failed",
+        "num_running",
+        "on_idle",
+    ]
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        loop: Optional[AbstractEventLoop] = None,
+        on_idle: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Initialize the new BrowserCommandDispatcher instance
+
+        :param max_concurrency: The maximum number of commands run at once
+        :param loop: The event loop used by the automation
+        :param on_idle: Optional function called when there are no more pending commands
+        """
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.on_idle: Optional[Callable[[], None]] = on_idle
+        self.max_concurrency: int = max(max_concurrency, 1)
+        self.closed: bool = False
+        self.num_running: int = 0
+        self.num_completed: int = 0
+        self.num_failed: int = 0
+        self.logger: AutoLogger = create_autologger(
+            "commandDispatcher", "BrowserCommandDispatcher"
+        )
+        self._semaphore: Semaphore = Semaphore(self.max_concurrency, loop=self.loop)
+        self._chains: Dict[str, Task] = {}
+        self._tasks: Set[Task] = set()
+
+    @property
+    def num_pending(self) -> int:
+        """Returns the number of dispatched commands that have not completed"""
+        return len(self._tasks)
+
+    def dispatch(
+        self, reqid: str, cmd: str, command: BrowserCommand
+    ) -> Optional[Task]:
+        """Dispatches the supplied command for the browser signified by the supplied request id.
+        If the dispatcher is closed the command is ignored.
+
+        :param reqid: The request id of the browser the command is for
+        :param cmd: The name of the command
+        :param command: A function returning the awaitable performing the command
+        :return: The task running the command or None if the dispatcher is closed
+        """
+        if self.closed:
+            self.logger.info(
+                "dispatch", f"closed, ignoring {cmd} command for reqid={reqid}"
+            )
+            return None
+        task = self.loop.create_task(
+            self._run(reqid, cmd, command, self._chains.get(reqid), self.loop.time())
+        )
+        self._chains[reqid] = task
+        self._tasks.add(task)
+        task.add_done_callback(lambda done: self._command_done(reqid, done))
+        return task
+
+    async def close(self) -> None:
+        """Stops accepting new commands and waits for the dispatched commands to complete"""
+        self.closed = True
+        if self._tasks:
+            self.logger.info(
+                "close", f"waiting for {len(self._tasks)} commands to complete"
+            )
+            await wait(list(self._tasks), loop=self.loop)
+
+    async def _run(
+        self,
+        reqid: str,
+        cmd: str,
+        command: BrowserCommand,
+        previous: Optional[Task],
+        dispatched_at: float,
+    ) -> None:
+        logged_method = "_run"
+        if previous is not None and not previous.done():
+            await wait([previous], loop=self.loop)
+        async with self._semaphore:
+            self.num_running += 1
+            start = self.loop.time()
+            ok = True
+            try:
+                await command()
+            except Exception as e:
+                ok = False
+                self.num_failed += 1
+                self.logger.exception(
+                    logged_method,
+                    f"the {cmd} command for reqid={reqid} failed",
+                    exc_info=e,
+                )
+            finally:
+                self.num_running -= 1
+            self.num_completed += 1
+            self.logger.info(
+                logged_method,
+                Helper.json_string(
+                    reqid=reqid,
+                    cmd=cmd,
+                    ok=ok,
+                    waited=round(start - dispatched_at, 3),
+                    time=round(self.loop.time() - start, 3),
+                    running=self.num_running,
+                    pending=len(self._tasks) - 1,
+                ),
+            )
+
+    def _command_done(self, reqid: str, task: Task) -> None:
+        self._tasks.discard(task)
+        if self._chains.get(reqid) is task:
+            del self._chains[reqid]
+        if not self._tasks and self.on_idle is not None:
+            self.on_idle()
+
+    def __str__(self) -> str:
+        info = f"max_concurrency={self.max_concurrency}, running={self.num_running}, pending={len(self._tasks)}"
+        return f"BrowserCommandDispatcher({info}, completed={self.num_completed}, failed={self.num_failed})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -1,18 +1,95 @@
-from asyncio import AbstractEventLoop, TimeoutError, create_subprocess_exec
+from asyncio import (
+    AbstractEventLoop,
+    CancelledError,
+    Future,
+    Task,
+    TimeoutError,
+    create_subprocess_exec,
+    gather,
+)
 from asyncio.subprocess import DEVNULL, Process as AIOProcess
+from shutil import rmtree
+from tempfile import mkdtemp
 from typing import Dict, List, Optional
 
 from async_timeout import timeout
 from cripy import CDP, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_URL
 
-from autobrowser.automation import AutomationConfig, BrowserExitInfo
+from autobrowser.abcs import Tab
+from autobrowser.automation import (
+    AutomationConfig,
+    BrowserExitInfo,
+    CloseReason,
+    TabClosedInfo,
+)
 from autobrowser.chrome_browser import Chrome
 from autobrowser.errors import DriverError
 from autobrowser.events import Events
 from autobrowser.util import Helper
 from .basedriver import BaseDriver
 
-__all__ = ["LocalBrowserDiver"]
+__all__ = ["LocalBrowserDiver", "LocalChromeProcess"]
+
+#: The args of the chrome command line each pooled chrome process has its own value for
+POOLED_CHROME_ARGS = ("--remote-debugging-port=", "--user-data-dir=")
+
+
+class LocalChromeProcess:
+    """A Chrome process, part of the LocalBrowserDiver's pool, with its own
+    debugging port, user data dir and tabs"""
+
+    __slots__ = [
+        "__weakref__",
+        "browser",
+        "exited",
+        "finished",
+        "index",
+        "monitor_task",
+        "port",
+        "process",
+        "restarts",
+        "tabs",
+        "user_data_dir",
+    ]
+
+    def __init__(self, index: int, port: int) -> None:
+        """Initialize the new LocalChromeProcess instance
+
+        :param index: The index of the process in the pool
+        :param port: The remote debugging port of the process
+        """
+        self.index: int = index
+        self.port: int = port
+        self.user_data_dir: str = mkdtemp(prefix=f"autobrowser-chrome-{index}-")
+        self.process: Optional[AIOProcess] = None
+        self.browser: Optional[Chrome] = None
+        #: Resolved once the process's current browser emits BrowserExiting
+        self.exited: Optional[Future] = None
+        self.monitor_task: Optional[Task] = None
+        #: The tabs of the process's browser, kept after they close for requeuing
+        self.tabs: List[Tab] = []
+        self.restarts: int = 0
+        self.finished: bool = False
+
+    @property
+    def running(self) -> bool:
+        """Is the chrome process running"""
+        return self.process is not None and self.process.returncode is None
+
+    def kill(self) -> None:
+        """Kills the chrome process if it is running"""
+        if self.running:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+    def __str__(self) -> str:
+        info = f"index={self.index}, port={self.port}, running={self.running}"
+        return f"LocalChromeProcess({info}, restarts={self.restarts}, finished={self.finished})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
 
 
 class LocalBrowserDiver(BaseDriver):
@@ -24,11 +101,15 @@ class LocalBrowserDiver(BaseDriver):
         super().__init__(conf, loop)
         self.chrome_process: Optional[AIOProcess] = None
         self.browser: Chrome = None
+        #: The supervised chrome processes when running a pool of browsers
+        self.pool: List[LocalChromeProcess] = []
+        self._shutting_down: bool = False
 
-    def _make_connect_opts(self) -> Dict:
+    def _make_connect_opts(self, port: Optional[int] = None) -> Dict:
         """Returns a dictionary to be used as the keyword args
         to for CDP methods
 
+        :param port: Optional port overriding the configured port
         :return: The dictionary to be used as keyword argument
         for CDP methods
         """
@@ -36,19 +117,20 @@ class LocalBrowserDiver(BaseDriver):
         return {
             "frontend_url": connect.get("url", DEFAULT_URL),
             "host": connect.get("host", DEFAULT_HOST),
-            "port": connect.get("port", DEFAULT_PORT),
+            "port": port or connect.get("port", DEFAULT_PORT),
             "secure": connect.get("secure", False),
         }
 
-    async def get_tabs(self) -> List[Dict[str, str]]:
+    async def get_tabs(self, port: Optional[int] = None) -> List[Dict[str, str]]:
         """Returns a list of tabs in the remote (locally remote) browser
 
+        :param port: Optional port of the browser overriding the configured port
         :return: The list of tabs in the browser
         """
         tabs: List[Dict[str, str]] = []
         tabs_append = tabs.append
         cdp_new_tab = CDP.New
-        connect_opts = self._make_connect_opts()
+        connect_opts = self._make_connect_opts(port)
         eloop = self.loop
 
         ws_url = "webSocketDebuggerUrl"
@@ -63,30 +145,44 @@ class LocalBrowserDiver(BaseDriver):
             tabs.append(tab)
         return tabs
 
-    async def launch_browser(self) -> None:
-        """Launches the local browser"""
+    async def launch_browser(
+        self, args: Optional[List[str]] = None, port: Optional[int] = None
+    ) -> AIOProcess:
+        """Launches the local browser
+
+        :param args: Optional chrome command line args overriding the configured args
+        :param port: Optional remote debugging port of the browser overriding the configured port
+        :return: The browser's process
+        """
         chrome_opts = self.conf.chrome_opts
         eloop = self.loop
-        self.chrome_process = await create_subprocess_exec(
+        process = await create_subprocess_exec(
             chrome_opts["exe"],
-            *chrome_opts["args"],
+            *(args if args is not None else chrome_opts["args"]),
             stderr=DEVNULL,
             stdout=DEVNULL,
             loop=eloop,
         )
+        if port is None:
+            self.chrome_process = process
         cdp_list = CDP.List
+        connect_opts = self._make_connect_opts(port) if port is not None else {}
         helper_one_tick_sleep = Helper.one_tick_sleep
         while True:
             try:
-                await cdp_list(loop=eloop)
+                await cdp_list(**connect_opts, loop=eloop)
                 break
             except Exception:
                 await helper_one_tick_sleep()
                 pass
+        return process
 
     async def init(self) -> None:
         self.logger.info("init", "initializing")
         await super().init()
+        if self.conf.local_browsers > 0:
+            await self.launch_pool()
+            return
         if self.conf.chrome_opts.get("launch", False):
             try:
                 async with timeout(60):
@@ -103,12 +199,240 @@ class LocalBrowserDiver(BaseDriver):
             behavior_manager=self.behavior_manager,
             session=self.session,
             redis=self.redis,
+            uploader=self.uploader,
             loop=self.loop,
         )
         self.browser.on(Events.BrowserExiting, self.on_browser_exit)
         await self.browser.init(tabs)
 
+    async def launch_pool(self) -> None:
+        """Launches the configured number of chrome processes, concurrently, each with its own
+        debugging port, user data dir and tabs. The browsers share the automation's frontier.
+
+        The processes are supervised, a process that exits (crashes) is restarted and the URLs
+        its tabs were crawling are returned to the frontier's q.
+        """
+        conf = self.conf
+        start = self.loop.time()
+        self.pool = [
+            LocalChromeProcess(idx, conf.local_browser_base_port + idx)
+            for idx in range(conf.local_browsers)
+        ]
+        results = await gather(
+            *[self._start_pooled(pooled) for pooled in self.pool],
+            loop=self.loop,
+            return_exceptions=True,
+        )
+        for pooled, result in zip(self.pool, results):
+            if isinstance(result, Exception):
+                self.logger.exception(
+                    "launch_pool", f"starting {pooled} failed", exc_info=result
+                )
+                pooled.finished = True
+        self.logger.info(
+            "launch_pool",
+            Helper.json_string(
+                browsers=len(self.pool),
+                started=sum(1 for pooled in self.pool if not pooled.finished),
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
+        if all(pooled.finished for pooled in self.pool):
+            await self.clean_up()
+            raise DriverError("No Browsers Of The Pool Could Be Started")
+
+    def _pooled_chrome_args(self, pooled: LocalChromeProcess) -> List[str]:
+        """Returns the configured chrome command line args with the debugging port
+        and user data dir of the supplied pooled chrome process
+
+        :param pooled: The pooled chrome process
+        :return: The chrome command line args
+        """
+        args = [
+            arg
+            for arg in self.conf.chrome_opts["args"]
+            if not arg.startswith(POOLED_CHROME_ARGS)
+        ]
+        args.append(f"--remote-debugging-port={pooled.port}")
+        args.append(f"--user-data-dir={pooled.user_data_dir}")
+        return args
+
+    async def _start_pooled(self, pooled: LocalChromeProcess) -> None:
+        """Launches the supplied pooled chrome process, connects to its tabs and
+        starts supervising it
+
+        :param pooled: The pooled chrome process to be started
+        """
+        try:
+            async with timeout(60):
+                pooled.process = await self.launch_browser(
+                    self._pooled_chrome_args(pooled), pooled.port
+                )
+        except TimeoutError:
+            pooled.kill()
+            raise DriverError(f"Failed To Launch {pooled} Within 60 seconds")
+        tabs = await self.get_tabs(pooled.port)
+        if len(tabs) == 0:
+            pooled.kill()
+            raise DriverError(f"No Tabs Were Found To Connect To In {pooled}")
+        browser = Chrome(
+            config=self.conf,
+            behavior_manager=self.behavior_manager,
+            session=self.session,
+            redis=self.redis,
+            uploader=self.uploader,
+            loop=self.loop,
+        )
+        browser.on(
+            Events.BrowserExiting,
+            lambda info: self._on_pooled_browser_exit(pooled, info),
+        )
+        pooled.browser = browser
+        pooled.exited = self.loop.create_future()
+        await browser.init(tabs)
+        pooled.tabs = list(browser.tabs.values())
+        restarts_on_crash = pooled.restarts < self.conf.local_browser_max_restarts
+        for tab in pooled.tabs:
+            if hasattr(tab, "restarts_on_crash"):
+                tab.restarts_on_crash = restarts_on_crash
+        pooled.monitor_task = self.loop.create_task(self._supervise(pooled))
+
+    async def _supervise(self, pooled: LocalChromeProcess) -> None:
+        """Waits for the supplied pooled chrome process to exit and, unless we are shutting down,
+        returns the URLs its tabs were crawling to the frontier's q and restarts it.
+
+        The process can exit before its tabs have finished closing, so the requeue and
+        restart wait for the process's browser to emit BrowserExiting (up to 30 seconds)
+
+        :param pooled: The pooled chrome process to be supervised
+        """
+        logged_method = "_supervise"
+        returncode = await pooled.process.wait()
+        if self._shutting_down or pooled.finished:
+            return
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                index=pooled.index, returncode=returncode, restarts=pooled.restarts
+            ),
+        )
+        if pooled.exited is not None and not pooled.exited.done():
+            try:
+                async with timeout(30):
+                    await pooled.exited
+            except TimeoutError:
+                self.logger.info(
+                    logged_method,
+                    f"the tabs of {pooled} did not close within 30 seconds of its exit",
+                )
+        for tab in pooled.tabs:
+            frontier = getattr(tab, "frontier", None)
+            if frontier is not None:
+                await Helper.no_raise_await(frontier.requeue_current())
+        if pooled.browser is not None:
+            pooled.browser.remove_all_listeners()
+            await Helper.no_raise_await(pooled.browser.close())
+            pooled.browser = None
+        if pooled.restarts >= self.conf.local_browser_max_restarts:
+            self.logger.info(
+                logged_method, f"{pooled} exceeded the maximum number of restarts"
+            )
+            self._pooled_finished(
+                pooled,
+                BrowserExitInfo(
+                    self.conf,
+                    [
+                        TabClosedInfo(tab.tab_id, CloseReason.TARGET_CRASHED)
+                        for tab in pooled.tabs
+                    ],
+                ),
+            )
+            return
+        pooled.restarts += 1
+        try:
+            await self._start_pooled(pooled)
+        except Exception as e:
+            self.logger.exception(logged_method, f"restarting {pooled} failed", exc_info=e)
+            self._pooled_finished(pooled, None)
+
+    def _on_pooled_browser_exit(
+        self, pooled: LocalChromeProcess, info: BrowserExitInfo
+    ) -> None:
+        """Listener registered to the BrowserExiting event of the pooled browsers.
+
+        If the browser exited because its tabs crashed or lost their connection the
+        chrome process is killed, and restarted by its supervision, otherwise the
+        browser is done crawling.
+
+        :param pooled: The pooled chrome process whose browser exited
+        :param info: The browser's exit info
+        """
+        if pooled.exited is not None and not pooled.exited.done():
+            pooled.exited.set_result(info)
+        crashed = any(
+            tci.reason in (CloseReason.TARGET_CRASHED, CloseReason.CONNECTION_CLOSED)
+            for tci in info.tab_closed_reasons
+        )
+        if crashed and not self._shutting_down:
+            self.logger.info(
+                "_on_pooled_browser_exit", f"the browser of {pooled} crashed"
+            )
+            pooled.kill()
+            return
+        if pooled.browser is not None:
+            pooled.browser.remove_all_listeners()
+            pooled.browser = None
+        self._pooled_finished(pooled, info)
+
+    def _pooled_finished(
+        self, pooled: LocalChromeProcess, info: Optional[BrowserExitInfo]
+    ) -> None:
+        """Marks the supplied pooled chrome process as finished and initiates
+        shutdown once every process of the pool has finished
+
+        :param pooled: The pooled chrome process that finished
+        :param info: Optional exit info of the process's browser
+        """
+        pooled.finished = True
+        if info is not None:
+            self._browser_exit_infos.append(info)
+        if all(other.finished for other in self.pool):
+            self.logger.info(
+                "_pooled_finished", "every browser of the pool finished, shutting down"
+            )
+            self.shutdown_condition.initiate_shutdown()
+
+    async def _clean_up_pool(self) -> None:
+        """Shuts down the browsers of the pool, concurrently, and kills their processes"""
+        for pooled in self.pool:
+            if pooled.monitor_task is not None and not pooled.monitor_task.done():
+                pooled.monitor_task.cancel()
+                try:
+                    await pooled.monitor_task
+                except CancelledError:
+                    pass
+        await gather(
+            *[
+                self.gracefully_shutdown_browser(pooled.browser)
+                for pooled in self.pool
+                if pooled.browser is not None
+            ],
+            loop=self.loop,
+            return_exceptions=True,
+        )
+        for pooled in self.pool:
+            pooled.browser = None
+            if pooled.running:
+                pooled.kill()
+                await pooled.process.wait()
+            rmtree(pooled.user_data_dir, ignore_errors=True)
+        self.pool.clear()
+
     async def clean_up(self) -> None:
+        self._shutting_down = True
+        if self.pool:
+            await self._clean_up_pool()
+
         if self.browser is not None:
             await self.gracefully_shutdown_browser(self.browser)
             self.browser = None
@@ -138,4 +462,4 @@ class LocalBrowserDiver(BaseDriver):
         self.shutdown_condition.initiate_shutdown()
 
     def __str__(self) -> str:
-        return f"LocalBrowserDiver(browser={self.browser}, conf={self.conf})"
+        return f"LocalBrowserDiver(browser={self.browser}, pool={self.pool}, conf={self.conf})"
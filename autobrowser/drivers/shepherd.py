@@ -1,14 +1,18 @@
-from asyncio import AbstractEventLoop, CancelledError, Task, sleep
-from typing import Any, Dict, List, Optional, Union
+from asyncio import AbstractEventLoop, CancelledError, Event, Task, gather
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar, Union
 
 from aioredis import Channel
 from ujson import loads
 
 from autobrowser.automation import AutomationConfig, BrowserExitInfo
 from autobrowser.chrome_browser import Chrome
-from autobrowser.errors import BrowserStagingError
+from autobrowser.errors import BrowserInitError, BrowserStagingError
 from autobrowser.events import Events
+from autobrowser.util import Backoff, Helper, LatencyStats
+from .autoscaler import QueueAutoscaler
 from .basedriver import BaseDriver
+from .dispatcher import BrowserCommandDispatcher
 
 __all__ = [
     "CDP_JSON",
@@ -16,7 +20,6 @@ __all__ = [
     "REQ_BROWSER_URL",
     "INIT_BROWSER_URL",
     "GET_BROWSER_INFO_URL",
-    "WAIT_TIME",
     "ShepherdDriver",
     "SingleBrowserDriver",
     "MultiBrowserDriver",
@@ -27,7 +30,8 @@ CDP_JSON_NEW: str = "http://{ip}:9222/json/new"
 REQ_BROWSER_URL: str = "/request_browser/{browser}"
 INIT_BROWSER_URL: str = "/init_browser?reqid={reqid}"
 GET_BROWSER_INFO_URL: str = "/info/{reqid}"
-WAIT_TIME: float = 0.5
+
+T = TypeVar("T")
 
 
 class ShepherdDriver(BaseDriver):
@@ -42,6 +46,10 @@ class ShepherdDriver(BaseDriver):
         self.init_browser_url: str = self.conf.make_shepherd_url(INIT_BROWSER_URL)
         self.pubsub_channel: Channel = None
         self.pubsub_task: Task = None
+        #: The latencies of the steps of starting a browser
+        self.startup_stats: Dict[str, LatencyStats] = {
+            step: LatencyStats(step) for step in ("stage", "ready", "tabs", "total")
+        }
 
     async def stage_new_browser(
         self, browser_id: str, data: Optional[Any] = None
@@ -71,30 +79,51 @@ class ShepherdDriver(BaseDriver):
         :param data: Optional data to be sent with the initialization request
         :return: An dictionary containing the information about the newly initialized browser
         """
+        start = self.loop.time()
         reqid = await self.stage_new_browser(browser_id, data)
+        staged = self.loop.time()
         headers = {"Host": "localhost"}
-        eloop = self.loop
         logged_method = f"init_new_browser<browser_id={browser_id}, data={data}>"
 
         self_session_get = self.session.get
         self_logger_info = self.logger.info
-        self_logger_exception = self.logger.exception
         init_browser_url = self.conf.init_browser_url(reqid)
+        failed = False
 
-        while 1:
+        async def browser_ready() -> Optional[Dict]:
+            nonlocal failed
             async with self_session_get(init_browser_url, headers=headers) as response:
                 try:
-                    data = await response.json()
+                    info = await response.json()
                 except Exception as e:
-                    self_logger_exception(
+                    self.logger.exception(
                         logged_method, "Browser Init Failed", exc_info=e
                     )
+                    failed = True
                     return None
-                if "cmd_port" in data:
-                    break
-                self_logger_info(logged_method, f"Waiting for Browser: {data}")
-                await sleep(WAIT_TIME, loop=eloop)
+            if "cmd_port" in info:
+                return info
+            self_logger_info(logged_method, f"Waiting for Browser: {info}")
+            return None
+
+        data = await self.wait_until_ready(
+            logged_method,
+            browser_ready,
+            notification_channel=self.conf.shepherd_ready_channel.format(reqid=reqid),
+            stop=lambda: failed,
+        )
+        if data is None:
+            return None
+        ready = self.loop.time()
         tab_datas = await self.wait_for_tabs(data.get("ip"), self.conf.num_tabs)
+        end = self.loop.time()
+        self._record_startup(
+            logged_method,
+            stage=staged - start,
+            ready=ready - staged,
+            tabs=end - ready,
+            total=end - start,
+        )
         return {"ip": data.get("ip"), "reqid": reqid, "tab_datas": tab_datas}
 
     async def wait_for_tabs(self, ip: str, num_tabs: int = 0) -> List[Dict[str, str]]:
@@ -105,19 +134,26 @@ class ShepherdDriver(BaseDriver):
         :param ip: The ip address of the remote browser
         :param num_tabs: How many additional tabs are to be created in the remote browser
         :return: A list of dictionaries containing information about the remote browser tabs
+        :raises BrowserInitError: If no tab became available within the configured deadline
         """
         find_browser_tabs = self.find_browser_tabs
         log = self.logger.info
 
-        eloop = self.loop
         log_method = f"wait_for_tabs(ip={ip}, num_tabs={num_tabs})"
 
-        while 1:
-            tab_datas = await find_browser_tabs(ip=ip)
-            if tab_datas:
-                break
+        async def first_tab() -> Optional[List[Dict[str, str]]]:
+            found = await find_browser_tabs(ip=ip)
+            if found:
+                return found
             log(log_method, "Waiting for first tab")
-            await sleep(WAIT_TIME, loop=eloop)
+            return None
+
+        tab_datas = await self.wait_until_ready(log_method, first_tab)
+        if tab_datas is None:
+            raise BrowserInitError(
+                f"No tabs became available in the browser at {ip} within "
+                f"{self.conf.shepherd_wait_deadline} seconds"
+            )
 
         if num_tabs > 0:
             create_browser_tab = self.create_browser_tab
@@ -128,6 +164,58 @@ class ShepherdDriver(BaseDriver):
 
         return tab_datas
 
+    async def wait_until_ready(
+        self,
+        logged_method: str,
+        check: Callable[[], Awaitable[Optional[T]]],
+        notification_channel: Optional[str] = None,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> Optional[T]:
+        """Repeatedly calls the supplied check until it returns a value (ready), waiting
+        between checks using exponential backoff with jitter, up to the configured deadline.
+
+        If a notification channel is supplied, the channel is subscribed to and a message
+        published to it causes the next check to be made immediately.
+
+        :param logged_method: The name of the method to use when logging
+        :param check: Function returning an awaitable resolving with the value once ready
+        or None if not ready
+        :param notification_channel: Optional pubsub channel notifications of readiness
+        are published to
+        :param stop: Optional function returning T/F indicating if no further checks should be made
+        :return: The value of the check once ready or None if the deadline passed
+        """
+        conf = self.conf
+        backoff = Backoff(
+            conf.shepherd_wait_initial,
+            conf.shepherd_wait_max,
+            conf.shepherd_wait_deadline,
+            loop=self.loop,
+        )
+        wake: Optional[Event] = None
+        listener: Optional[Task] = None
+        if notification_channel:
+            wake = Event(loop=self.loop)
+            channels = await self.redis.subscribe(notification_channel)
+            listener = self.loop.create_task(self._notify_on_message(channels[0], wake))
+        try:
+            while 1:
+                value = await check()
+                if value is not None:
+                    return value
+                if stop is not None and stop():
+                    return None
+                if not await backoff.wait(wake):
+                    self.logger.info(
+                        logged_method,
+                        f"not ready before the deadline of {backoff.deadline} seconds",
+                    )
+                    return None
+        finally:
+            if listener is not None:
+                listener.cancel()
+                await Helper.no_raise_await(self.redis.unsubscribe(notification_channel))
+
     async def find_browser_tabs(
         self,
         ip: Optional[str] = None,
@@ -199,6 +287,34 @@ class ShepherdDriver(BaseDriver):
         async with self.session.get(self.conf.cdp_json_new_url(ip)) as res:
             return await res.json(loads=loads)
 
+    async def _notify_on_message(self, channel: Channel, wake: Event) -> None:
+        """Sets the supplied event whenever a message is published to the supplied channel
+
+        :param channel: The channel to listen to
+        :param wake: The event to be set
+        """
+        while await channel.wait_message():
+            await channel.get()
+            wake.set()
+
+    def _record_startup(self, logged_method: str, **steps: float) -> None:
+        """Records the latencies of the steps of starting a browser and logs their percentiles
+
+        :param logged_method: The name of the method to use when logging
+        :param steps: The latency of each step
+        """
+        for step, latency in steps.items():
+            self.startup_stats[step].add(latency)
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                startup={step: round(latency, 3) for step, latency in steps.items()},
+                percentiles={
+                    step: stats.summary() for step, stats in self.startup_stats.items()
+                },
+            ),
+        )
+
     async def clean_up(self) -> None:
         """Closes the pubsub channel and calls the clean_up method the super class"""
         self.logger.info("clean_up", "closing redis connection")
@@ -226,14 +342,18 @@ class SingleBrowserDriver(ShepherdDriver):
     async def init(self) -> None:
         self.logger.info("init", "initializing")
         await super().init()
-        tab_datas = await self.wait_for_tabs(
-            self.conf.browser_host_ip, self.conf.num_tabs
-        )
+        if self.conf.num_workers > 1:
+            tab_datas = await self.wait_for_worker_tabs(self.conf.browser_host_ip)
+        else:
+            tab_datas = await self.wait_for_tabs(
+                self.conf.browser_host_ip, self.conf.num_tabs
+            )
         self.browser = Chrome(
             config=self.conf,
             behavior_manager=self.behavior_manager,
             session=self.session,
             redis=self.redis,
+            uploader=self.uploader,
             loop=self.loop,
         )
         self.browser.on(Events.BrowserExiting, self.on_browser_exit)
@@ -241,6 +361,22 @@ class SingleBrowserDriver(ShepherdDriver):
         self.pubsub_channel = await self.get_auto_event_channel()
         self.pubsub_task = self.loop.create_task(self.pubsub_loop())
 
+    async def wait_for_worker_tabs(self, ip: str) -> List[Dict[str, str]]:
+        """Waits for the browser, signified by the supplied ip address, to become available
+        and returns this worker's tabs when the browser is shared by multiple worker processes.
+
+        The first worker uses the browser's initial tab and creates the rest of its tabs,
+        the other workers create all their tabs.
+
+        :param ip: The ip address of the remote browser
+        :return: A list of dictionaries containing information about this worker's tabs
+        """
+        existing = await self.wait_for_tabs(ip)
+        tab_datas = existing[:1] if self.conf.worker_index == 0 else []
+        while len(tab_datas) < self.conf.num_tabs:
+            tab_datas.append(await self.create_browser_tab(ip))
+        return tab_datas
+
     async def get_auto_event_channel(self) -> Channel:
         """Returns a pubsub channel for the automation `wr.auto-event:{requid}`
 
@@ -259,6 +395,7 @@ class SingleBrowserDriver(ShepherdDriver):
           - start: all tabs start running behaviors
           - stop: all tabs if they have an running behavior are paused
           - shutdown: stops the running automation
+          - profile: profiles the driver for the message's duration (seconds)
         """
         logged_method = "pubsub_loop"
         self.logger.debug(logged_method, "started")
@@ -279,6 +416,9 @@ class SingleBrowserDriver(ShepherdDriver):
             elif msg["cmd"] == "shutdown":
                 self.shutdown_condition.initiate_shutdown()
 
+            elif msg["cmd"] == "profile":
+                self.loop.create_task(self.profile(msg.get("duration")))
+
             self.logger.debug(logged_method, "waiting for another message")
 
         self.logger.debug(logged_method, "stopped")
@@ -321,6 +461,12 @@ class MultiBrowserDriver(ShepherdDriver):
     ) -> None:
         super().__init__(conf, loop)
         self.browsers: Dict[str, Chrome] = {}
+        self.dispatcher: BrowserCommandDispatcher = BrowserCommandDispatcher(
+            conf.browser_command_concurrency,
+            loop=self.loop,
+            on_idle=self._shutdown_if_no_browsers,
+        )
+        self.autoscaler: Optional[QueueAutoscaler] = None
 
     async def get_auto_event_channel(self) -> Channel:
         """Returns a pubsub channel for the automation `wr.auto-event:{requid}`
@@ -339,8 +485,15 @@ class MultiBrowserDriver(ShepherdDriver):
         Messages:
           - start: adds a the browser signified by the message's requid to the managed browsers
           - stop: removes a the browser signified by the message's requid to the managed browsers
+          - profile: profiles the driver for the message's duration (seconds)
+
+        The messages are dispatched to the browser command dispatcher, which runs the
+        commands for different browsers concurrently and the commands for the same
+        browser in order. When running multiple worker processes, only the messages for
+        the browsers handled by this worker are dispatched.
         """
         logged_method = "pubsub_loop"
+        dispatch = self.dispatcher.dispatch
 
         while 1:
             have_message = await self.pubsub_channel.wait_message()
@@ -348,10 +501,18 @@ class MultiBrowserDriver(ShepherdDriver):
                 break
             msg = await self.pubsub_channel.get(encoding="utf-8", decoder=loads)
             self.logger.debug(logged_method, f"got message {msg}")
-            if msg["cmd"] == "start":
-                await self.add_browser(msg["reqid"])
-            elif msg["cmd"] == "stop":
-                await self.remove_browser(msg["reqid"])
+            cmd = msg["cmd"]
+            if cmd in ("start", "stop") and not self.conf.handles_reqid(msg["reqid"]):
+                self.logger.debug(logged_method, "handled by another worker")
+                continue
+            if cmd == "start":
+                reqid = msg["reqid"]
+                dispatch(reqid, cmd, lambda reqid=reqid: self.add_browser(reqid))
+            elif cmd == "stop":
+                reqid = msg["reqid"]
+                dispatch(reqid, cmd, lambda reqid=reqid: self.remove_browser(reqid))
+            elif cmd == "profile":
+                self.loop.create_task(self.profile(msg.get("duration")))
             self.logger.debug(logged_method, "waiting for another message")
 
         self.logger.debug(logged_method, "stopped")
@@ -368,26 +529,39 @@ class MultiBrowserDriver(ShepherdDriver):
             # attempt to connect to existing browser/tab
             browser_ip = await self.get_ip_for_reqid(reqid)
             if browser_ip is not None:
-                tab_datas = await self.wait_for_tabs(browser_ip)
+                try:
+                    tab_datas = await self.wait_for_tabs(browser_ip)
+                except BrowserInitError as e:
+                    self.logger.info(
+                        f"add_browser(reqid={reqid})",
+                        f"the existing browser is not usable, initializing a new one - {e}",
+                    )
 
-            if tab_datas is None:
+            if not tab_datas:
                 # no tab found, init new browser
                 results = await self.init_new_browser(
                     self.conf.browser_id, self.conf.get("cdata")
                 )
+                if results is None:
+                    raise BrowserInitError(
+                        f"Could not initialize a browser for reqid = {reqid}"
+                    )
                 tab_datas = results["tab_datas"]
 
-            browser = Chrome(
-                config=self.conf,
-                behavior_manager=self.behavior_manager,
-                session=self.session,
-                redis=self.redis,
-                loop=self.loop,
-            )
+            await self._start_browser(reqid, tab_datas)
 
-            await browser.init(tab_datas)
-            self.browsers[reqid] = browser
-            browser.on(Events.BrowserExiting, self.on_browser_exit)
+    async def add_new_browser(self) -> str:
+        """Initializes a new browser, using shepherd, and adds it to the managed browser dictionary
+
+        :return: The request id of the new browser
+        """
+        results = await self.init_new_browser(
+            self.conf.browser_id, self.conf.get("cdata")
+        )
+        if results is None:
+            raise BrowserInitError("Could not initialize a new browser")
+        await self._start_browser(results["reqid"], results["tab_datas"])
+        return results["reqid"]
 
     async def remove_browser(self, reqid: str) -> None:
         """Removes a browser, signified by the supplied request id, from the managed browser dictionary
@@ -405,27 +579,95 @@ class MultiBrowserDriver(ShepherdDriver):
         await super().init()
         self.pubsub_channel = await self.get_auto_event_channel()
         self.pubsub_task = self.loop.create_task(self.pubsub_loop())
+        # the queue is shared by the workers, only the first one scales the browsers
+        if self.conf.autoscale and self.conf.worker_index == 0:
+            self.autoscaler = QueueAutoscaler(self, loop=self.loop)
+            self.autoscaler.start()
 
     async def shutdown(self) -> int:
         logged_method = "shutdown"
         self.logger.info(logged_method, "shutting down")
-        for browser in self.browsers.values():
-            await self.gracefully_shutdown_browser(browser)
+        if self.autoscaler is not None:
+            await self.autoscaler.stop()
+        await self.dispatcher.close()
+        start = self.loop.time()
+        browsers = list(self.browsers.values())
         self.browsers.clear()
+        await gather(
+            *[self.gracefully_shutdown_browser(browser) for browser in browsers],
+            loop=self.loop,
+            return_exceptions=True,
+        )
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                browsers=len(browsers), time=round(self.loop.time() - start, 3)
+            ),
+        )
         await self.clean_up()
         self.logger.info(logged_method, "exiting")
         return self.determine_exit_code()
 
+    async def _start_browser(self, reqid: str, tab_datas: List[Dict]) -> None:
+        """Creates and initializes the browser, signified by the supplied request id,
+        adding it to the managed browser dictionary
+
+        :param reqid: The request id of the browser
+        :param tab_datas: List of data about the browser's tabs to be connected to
+        """
+        browser = Chrome(
+            config=self.conf,
+            behavior_manager=self.behavior_manager,
+            session=self.session,
+            redis=self.redis,
+            uploader=self.uploader,
+            loop=self.loop,
+        )
+
+        # registered before init as the browser exits during init if none of its tabs start
+        self.browsers[reqid] = browser
+        # the exit info has the automation's reqid, the browser is known by its own reqid
+        browser.on(Events.BrowserExiting, partial(self._on_managed_browser_exit, reqid))
+        try:
+            await browser.init(tab_datas)
+        except Exception:
+            if self.browsers.get(reqid) is browser:
+                del self.browsers[reqid]
+            browser.remove_all_listeners()
+            raise
+
     def on_browser_exit(self, info: BrowserExitInfo) -> None:
-        logged_method = f"on_browser_exit(info={info})"
-        self.logger.info(logged_method, "the browser exited")
-        browser = self.browsers.pop(info.auto_info.reqid, None)
+        self._on_managed_browser_exit(info.auto_info.reqid, info)
+
+    def _on_managed_browser_exit(self, reqid: str, info: BrowserExitInfo) -> None:
+        """Listener registered to the BrowserExiting event of the managed browsers
+
+        :param reqid: The request id the browser is managed under
+        :param info: The browser's exit info
+        """
+        logged_method = f"on_browser_exit(reqid={reqid})"
+        self.logger.info(logged_method, f"the browser exited - {info}")
+        browser = self.browsers.pop(reqid, None)
         if browser is None:
             return
         browser.remove_all_listeners()
         self._browser_exit_infos.append(info)
-        if len(self.browsers) == 0:
-            self.logger.info(logged_method, "no more active browsers, shutting down")
+        self._shutdown_if_no_browsers()
+
+    def _shutdown_if_no_browsers(self) -> None:
+        """Initiates the shutdown of the driver if every browser it managed exited and
+        there are no pending browser commands that could start a browser. Checked when a
+        browser exits and when the last pending browser command completes (e.g. a start
+        that failed after the last browser exited)
+        """
+        if (
+            len(self.browsers) == 0
+            and self._browser_exit_infos
+            and self.dispatcher.num_pending == 0
+        ):
+            self.logger.info(
+                "_shutdown_if_no_browsers", "no more active browsers, shutting down"
+            )
             self.shutdown_condition.initiate_shutdown()
 
     def __str__(self) -> str:
@@ -3,6 +3,7 @@ __all__ = [
     "BrowserStagingError",
     "AutoBrowserError",
     "AutoTabError",
+    "CDPError",
     "DriverError",
 ]
 
@@ -25,3 +26,7 @@ class AutoTabError(Exception):
 
 class DriverError(Exception):
     pass
+
+
+class CDPError(Exception):
+    pass
@@ -0,0 +1,125 @@
+"""Processing of large batches of outlinks off of the event loop"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from time import perf_counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ujson import dumps, loads
+from urlcanon import MatchRule
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.scope.redis import is_inner_page_link
+from autobrowser.util import Helper
+
+__all__ = [
+    "OutlinkBatch",
+    "classify_outlinks",
+    "encode_rule_specs",
+    "outlink_executor",
+    "shutdown_outlink_executor",
+]
+
+_executor: Optional[Executor] = None
+
+
+class OutlinkBatch(NamedTuple):
+    """The result of classifying a batch of outlinks"""
+
+    #: The URL and the JSON encoded url info (q entry) of the in scope outlinks
+    candidates: List[Tuple[str, str]]
+    #: The outlinks that are inner page links of the page
+    inner_page_links: List[str]
+    #: The number of outlinks that were not in scope
+    num_out_of_scope: int
+    #: The number of duplicate outlinks in the batch
+    num_duplicates: int
+    #: The number of seconds it took to classify the batch
+    time: float
+
+
+@lru_cache(maxsize=16)
+def _match_rules(rule_specs: str) -> List[MatchRule]:
+    return [MatchRule(**spec) for spec in loads(rule_specs)]
+
+
+def classify_outlinks(
+    urls: List[str],
+    depth: int,
+    current_page: str,
+    rule_specs: Optional[str],
+) -> OutlinkBatch:
+    """Classifies the supplied outlinks of the page as the frontier's add would:
+    duplicates are dropped and the remaining outlinks are either not in scope,
+    inner page links of the page or candidates for the frontier (not yet checked
+    against the seen set) with their JSON encoded url info.
+
+    Runs in the outlink worker pool so must only use its arguments.
+
+    :param urls: The outlinks of the page
+    :param depth: The depth the outlinks are to be crawled at
+    :param current_page: The fragmentless URL of the page
+    :param rule_specs: JSON encoded list of the keyword arguments of the scope rules
+    or None if every outlink is in scope
+    :return: The classified outlinks
+    """
+    start = perf_counter()
+    rules = _match_rules(rule_specs) if rule_specs is not None else None
+    candidates: List[Tuple[str, str]] = []
+    inner_page_links: List[str] = []
+    num_out_of_scope = 0
+    fingerprints = set()
+    for url in urls:
+        if url in fingerprints:
+            continue
+        fingerprints.add(url)
+        if rules is not None and not any(rule.applies(url) for rule in rules):
+            num_out_of_scope += 1
+            continue
+        if is_inner_page_link(url, current_page):
+            inner_page_links.append(url)
+            continue
+        candidates.append(
+            (url, Helper.json_string(url=url, depth=depth, page=current_page))
+        )
+    return OutlinkBatch(
+        candidates,
+        inner_page_links,
+        num_out_of_scope,
+        len(urls) - len(fingerprints),
+        perf_counter() - start,
+    )
+
+
+def outlink_executor(config: AutomationConfig) -> Executor:
+    """Returns the pool large batches of outlinks are processed in, shared by
+    every frontier of the process, creating it if necessary
+
+    :param config: The automation config
+    :return: The outlink worker pool
+    """
+    global _executor
+    if _executor is None:
+        workers = max(config.outlink_workers, 1)
+        if config.outlink_pool == "thread":
+            _executor = ThreadPoolExecutor(max_workers=workers)
+        else:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def shutdown_outlink_executor() -> None:
+    """Shuts down the outlink worker pool if it was created"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def encode_rule_specs(rule_specs: Optional[Iterable[Dict]]) -> str:
+    """Returns the JSON encoding of the supplied scope rules' keyword arguments
+    used to ship them to the outlink worker pool
+
+    :param rule_specs: The keyword arguments of the scope rules
+    :return: The JSON encoded rules
+    """
+    return dumps(list(rule_specs or []))
@@ -1,5 +1,5 @@
 from asyncio import AbstractEventLoop, CancelledError, TimeoutError, sleep
-from typing import Any, Awaitable, Dict, Iterable, Optional, Union
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Union
 
 from aioredis import Redis
 from async_timeout import timeout
@@ -8,11 +8,15 @@ from ujson import loads
 from autobrowser.automation import AutomationConfig, RedisKeys
 from autobrowser.scope import RedisScope
 from autobrowser.util import AutoLogger, Helper, create_autologger
+from .outlinks import classify_outlinks, encode_rule_specs, outlink_executor
 
 __all__ = ["RedisFrontier"]
 
 CRAWL_DEPTH_FIELD: str = "crawl_depth"
 
+#: The maximum number of URLs pushed to the q by a single command
+MAX_PUSH_SIZE: int = 1000
+
 
 class RedisFrontier:
     __slots__ = [
@@ -20,12 +24,15 @@ class RedisFrontier:
         "_did_wait",
         "config",
         "crawl_depth",
+        "current_queue",
         "currently_crawling",
         "keys",
         "logger",
         "loop",
+        "queues",
         "redis",
         "scope",
+        "track_inner_page_links",
     ]
 
     def __init__(
@@ -33,21 +40,36 @@ class RedisFrontier:
         redis: Redis,
         config: AutomationConfig,
         loop: Optional[AbstractEventLoop] = None,
+        consume_escalated: bool = True,
+        track_inner_page_links: bool = True,
     ):
         """Initialize the new instance of RedisFrontier
 
         :param redis: The redis instance to be used
         :param config: The automation config
         :param loop: The event loop used by the automation
+        :param consume_escalated: Should the URLs escalated by fetch tabs be crawled
+        before the URLs in the q
+        :param track_inner_page_links: Should the inner page links of the crawled pages
+        be added to the inner page links set, only tabs that visit them should
         """
         self.config: AutomationConfig = config
         self.crawl_depth: int = -1
         self.currently_crawling: Optional[Dict[str, Union[str, int]]] = None
+        #: The queue the currently crawled URL was popped from
+        self.current_queue: Optional[str] = None
         self.keys: RedisKeys = self.config.redis_keys
         self.logger: AutoLogger = create_autologger("frontier", "RedisFrontier")
         self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
         self.redis: Redis = redis
         self.scope: RedisScope = RedisScope(self.redis, self.keys)
+        #: The queues URLs are popped from, in order of priority
+        self.queues: List[str] = (
+            [self.keys.escalated, self.keys.queue]
+            if consume_escalated
+            else [self.keys.queue]
+        )
+        self.track_inner_page_links: bool = track_inner_page_links
         self._did_wait: bool = False
 
     @property
@@ -146,14 +168,17 @@ class RedisFrontier:
 
         :return: The length of the queue
         """
-        return await self.redis.llen(self.keys.queue)
+        qlen = 0
+        for queue in self.queues:
+            qlen += await self.redis.llen(queue)
+        return qlen
 
     async def exhausted(self) -> bool:
         """Returns a boolean that indicates if the frontier is exhausted or not
 
         :return: T/F indicating if the frontier is exhausted
         """
-        qlen = await self.redis.llen(self.keys.queue)
+        qlen = await self.q_len()
         self.logger.debug("exhausted", f"len(queue) = {qlen}")
         return qlen == 0
 
@@ -189,6 +214,20 @@ class RedisFrontier:
             await self.remove_from_pending(curl)
             self.currently_crawling = None
 
+    async def requeue_current(self) -> None:
+        """If currently_crawling url is set, returns it to the front of the q it was
+        popped from and removes it from the pending set. Used when the URL's crawl was
+        cut short (e.g. the browser crashed) so that it is crawled again
+        """
+        if self.currently_crawling is None:
+            return
+        current = self.currently_crawling
+        url_info = Helper.json_string(url=current["url"], depth=current["depth"])
+        await self.redis.lpush(self.current_queue or self.keys.queue, url_info)
+        await self.remove_from_pending(current["url"])
+        self.currently_crawling = None
+        self.logger.info("requeue_current", f"Requeued URL - {url_info}")
+
     async def init(self) -> bool:
         """Initialize the frontier. Returns T/F indicating
         if the frontier is currently exhausted
@@ -230,7 +269,8 @@ class RedisFrontier:
             return False
 
         if self.scope.is_inner_page_link(url):
-            await self.redis.sadd(self.keys.inner_page_links, url)
+            if self.track_inner_page_links:
+                await self.redis.sadd(self.keys.inner_page_links, url)
             self.logger.info(
                 logged_method,
                 f"Not adding URL to the frontier, inner page link - {url_info}",
@@ -248,6 +288,17 @@ class RedisFrontier:
         self.logger.info(logged_method, f"Added URL to the frontier - {url_info}")
         return True
 
+    async def escalate(self, url: str, depth: int) -> None:
+        """Adds the supplied URL, that could not be crawled without a browser,
+        to the escalated q that is crawled by tabs with a browser
+
+        :param url: The URL to be escalated
+        :param depth: The depth the URL is to be crawled at
+        """
+        url_info = Helper.json_string(url=url, depth=depth)
+        await self.redis.rpush(self.keys.escalated, url_info)
+        self.logger.info("escalate", f"Escalated URL to a browser - {url_info}")
+
     async def add_all(self, urls: Iterable[str]) -> bool:
         """Conditionally adds URLs to frontier.
 
@@ -271,6 +322,12 @@ class RedisFrontier:
             f"The next depth is {next_depth}. Max depth = {self.crawl_depth}",
         )
 
+        threshold = self.config.outlink_batch_threshold
+        if threshold > 0 and self.scope.rule_specs is not None:
+            urls = urls if isinstance(urls, list) else list(urls)
+            if len(urls) >= threshold:
+                return await self._add_batch(urls, next_depth)
+
         add_to_frontier = self.add
         num_added = 0
 
@@ -286,13 +343,75 @@ class RedisFrontier:
         self.logger.debug(logged_method, f"No URLs added to the frontier")
         return False
 
+    async def _add_batch(self, urls: List[str], depth: int) -> bool:
+        """Conditionally adds a large batch of URLs to frontier.
+
+        The URLs are deduplicated, scope checked, checked for being inner page links and
+        encoded in the outlink worker pool, rather than on the event loop, and only the
+        surviving URLs are checked against the seen set and added to the q in bulk.
+
+        :param urls: The URLs to maybe add to the frontier
+        :param depth: The depth the URLs are to be crawled at
+        :return: T/F indicating if any of the URLs were added to the frontier
+        """
+        logged_method = "_add_batch"
+        start = self.loop.time()
+        scope = self.scope
+        batch = await self.loop.run_in_executor(
+            outlink_executor(self.config),
+            classify_outlinks,
+            urls,
+            depth,
+            scope.current_page,
+            None if scope.all_links else encode_rule_specs(scope.rule_specs),
+        )
+        offloaded = self.loop.time()
+        redis = self.redis
+        keys = self.keys
+        if batch.inner_page_links and self.track_inner_page_links:
+            await redis.sadd(keys.inner_page_links, *batch.inner_page_links)
+        num_added = 0
+        if batch.candidates:
+            pipeline = redis.pipeline()
+            for url, _ in batch.candidates:
+                pipeline.sadd(keys.seen, url)
+            was_added = await pipeline.execute()
+            url_infos = [
+                url_info
+                for (_, url_info), added in zip(batch.candidates, was_added)
+                if added
+            ]
+            num_added = len(url_infos)
+            for idx in range(0, num_added, MAX_PUSH_SIZE):
+                await redis.rpush(keys.queue, *url_infos[idx : idx + MAX_PUSH_SIZE])
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                urls=len(urls),
+                duplicates=batch.num_duplicates,
+                out_of_scope=batch.num_out_of_scope,
+                inner_page_links=len(batch.inner_page_links),
+                seen=len(batch.candidates) - num_added,
+                added=num_added,
+                worker_time=round(batch.time, 3),
+                offload_time=round(offloaded - start, 3),
+                admission_time=round(self.loop.time() - offloaded, 3),
+            ),
+        )
+        return num_added > 0
+
     async def _pop_url(self) -> Dict[str, Union[str, int]]:
         """Pops (removes) the next URL to be crawled from
         the queue and returns it
 
         :return: The next URL to be crawled
         """
-        udict_str = await self.redis.lpop(self.keys.queue)
+        udict_str = None
+        for queue in self.queues:
+            udict_str = await self.redis.lpop(queue)
+            if udict_str is not None:
+                self.current_queue = queue
+                break
         return loads(udict_str)
 
     async def _wait_for_populated_q(
@@ -1,4 +1,4 @@
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 
 from aioredis import Redis
 from ujson import loads
@@ -8,7 +8,7 @@ from urlcanon.canon import remove_fragment, whatwg
 from autobrowser.automation import RedisKeys
 from autobrowser.util import AutoLogger, create_autologger
 
-__all__ = ["RedisScope"]
+__all__ = ["RedisScope", "is_inner_page_link", "strip_frag"]
 
 
 def strip_frag(url: str) -> str:
@@ -22,6 +22,22 @@ def strip_frag(url: str) -> str:
     return str(cannond)
 
 
+def is_inner_page_link(url: str, current_page: str) -> bool:
+    """Returns T/F indicating if the supplied outlink URL is a inner page link
+    of the supplied page, the page's URL without its fragment
+
+    :param url: The outlink URL to be tested
+    :param current_page: The fragmentless URL of the page
+    :return: T/F indicating if the supplied outlink URL is a inner page link
+    """
+    canonicalized = whatwg.canonicalize(url)
+    hash_frag = (canonicalized.hash_sign + canonicalized.fragment).decode("utf-8")
+    if not hash_frag:
+        return False
+    remove_fragment(canonicalized)
+    return str(canonicalized) == current_page
+
+
 class RedisScope:
     __slots__ = [
         "__weakref__",
@@ -30,6 +46,7 @@ class RedisScope:
         "keys",
         "logger",
         "redis",
+        "rule_specs",
         "rules",
     ]
 
@@ -42,6 +59,8 @@ class RedisScope:
         self.redis: Redis = redis
         self.keys: RedisKeys = keys
         self.rules: List[MatchRule] = []
+        #: The keyword arguments of the rules, None if a rule was supplied as a MatchRule
+        self.rule_specs: Optional[List[Dict]] = []
         self.all_links: bool = False
         self.logger: AutoLogger = create_autologger("scope", "RedisScope")
         self._current_page: str = ""
@@ -91,11 +110,14 @@ class RedisScope:
         :return:
         """
         if isinstance(scope_rule, str):
-            the_rule = MatchRule(**loads(scope_rule))
-        elif isinstance(scope_rule, dict):
+            scope_rule = loads(scope_rule)
+        if isinstance(scope_rule, dict):
             the_rule = MatchRule(**scope_rule)
+            if self.rule_specs is not None:
+                self.rule_specs.append(scope_rule)
         else:
             the_rule = scope_rule
+            self.rule_specs = None
         self.logger.info("add_scope_rule", f"adding rule={the_rule}")
         self.rules.append(the_rule)
 
@@ -107,12 +129,7 @@ class RedisScope:
         :return: T/F indicating if the supplied outlink URL
         is a inner page link.
         """
-        canonicalized = whatwg.canonicalize(url)
-        hash_frag = (canonicalized.hash_sign + canonicalized.fragment).decode("utf-8")
-        if not hash_frag:
-            return False
-        remove_fragment(canonicalized)
-        return str(canonicalized) == self._current_page
+        return is_inner_page_link(url, self._current_page)
 
     def crawling_new_page(self, current_page: str) -> None:
         """Informs this instance of RedisScope that the crawler
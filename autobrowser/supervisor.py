@@ -0,0 +1,243 @@
+"""Runs an automation's driver in multiple worker processes so that every CPU core is used"""
+import os
+import sys
+from asyncio import AbstractEventLoop, gather
+from asyncio.subprocess import PIPE, STDOUT, Process, create_subprocess_exec
+from signal import SIGINT, SIGTERM
+from typing import Dict, List, Optional
+
+from ujson import dumps, loads
+
+from autobrowser.util import AutoLogger, Helper, create_autologger
+
+__all__ = ["WorkerSupervisor", "chrome_opts_for_worker", "tabs_for_worker"]
+
+#: The maximum length of a line of a worker's output
+MAX_LINE_LENGTH: int = 1 << 24
+
+#: The default remote debugging port of chrome
+DEFAULT_DEBUGGING_PORT: int = 9222
+
+
+def tabs_for_worker(num_tabs: int, num_workers: int, index: int) -> int:
+    """Returns the number of tabs, of the supplied total number of tabs,
+    the worker with the supplied index runs when the tabs are evenly divided
+    amongst the workers
+
+    :param num_tabs: The total number of tabs
+    :param num_workers: The number of workers
+    :param index: The index of the worker
+    :return: The number of tabs the worker runs
+    """
+    return num_tabs // num_workers + (1 if index < num_tabs % num_workers else 0)
+
+
+def chrome_opts_for_worker(chrome_opts: Dict, index: int) -> Dict:
+    """Returns a copy of the supplied chrome options (CHROME_OPTS) with the remote
+    debugging port offset by the index of the worker and, for every worker
+    but the first, a user data dir of its own
+
+    :param chrome_opts: The chrome options of the local driver
+    :param index: The index of the worker
+    :return: The worker's chrome options
+    """
+    worker_opts = dict(chrome_opts)
+    connect = dict(worker_opts.get("connect") or {})
+    port = int(connect.get("port", DEFAULT_DEBUGGING_PORT))
+    port_arg = "--remote-debugging-port="
+    for arg in worker_opts.get("args", []):
+        if arg.startswith(port_arg):
+            port = int(arg[len(port_arg) :])
+    args = []
+    for arg in worker_opts.get("args", []):
+        if arg.startswith(port_arg):
+            arg = f"{port_arg}{port + index}"
+        elif arg.startswith("--user-data-dir=") and index > 0:
+            arg = f"{arg}-{index}"
+        args.append(arg)
+    connect["port"] = port + index
+    worker_opts["args"] = args
+    worker_opts["connect"] = connect
+    return worker_opts
+
+
+class WorkerSupervisor:
+    """Starts N worker processes each running its own driver (the supplied driver script),
+    and its own subset of tabs, against the automation's shared redis frontier.
+
+    Each worker is told its index and the number of workers via the WORKER_INDEX and
+    NUM_WORKERS env vars. When the workers share a single browser (BROWSER_HOST) the
+    NUM_TABS tabs are divided amongst the workers. When the workers launch local browsers
+    (CHROME_OPTS) each worker's browsers use their own debugging ports and user data dirs,
+    and a browser that is connected to rather than launched is used by a single worker.
+
+    The output (logs) of the workers is aggregated into the supervisor's output, each line
+    prefixed with the index of the worker. SIGINT and SIGTERM are forwarded to the workers
+    as SIGTERM so that they shutdown gracefully and the exit code of the supervisor is the
+    highest exit code of the workers, or 1 if the shutdown was initiated by signal.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "exit_codes",
+        "logger",
+        "loop",
+        "num_workers",
+        "script",
+        "shutdown_from_signal",
+        "workers",
+    ]
+
+    def __init__(
+        self, script: str, num_workers: int, loop: Optional[AbstractEventLoop] = None
+    ) -> None:
+        """Initialize the new WorkerSupervisor instance
+
+        :param script: The path to the driver script each worker runs
+        :param num_workers: The number of workers
+        :param loop: The event loop used by the supervisor
+        """
+        self.script: str = script
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.num_workers: int = self._bounded_num_workers(max(num_workers, 1))
+        self.workers: List[Process] = []
+        self.exit_codes: List[int] = []
+        self.shutdown_from_signal: bool = False
+        self.logger: AutoLogger = create_autologger("supervisor", "WorkerSupervisor")
+
+    def worker_env(self, index: int) -> Dict[str, str]:
+        """Returns the env vars of the worker with the supplied index
+
+        :param index: The index of the worker
+        :return: The worker's env vars
+        """
+        env = dict(os.environ)
+        env["WORKER_INDEX"] = str(index)
+        env["NUM_WORKERS"] = str(self.num_workers)
+        if env.get("BROWSER_HOST"):
+            num_tabs = int(env.get("NUM_TABS", 1))
+            env["NUM_TABS"] = str(tabs_for_worker(num_tabs, self.num_workers, index))
+        elif env.get("CHROME_OPTS"):
+            local_browsers = int(env.get("LOCAL_BROWSERS") or 0)
+            if local_browsers > 0:
+                base_port = int(
+                    env.get("LOCAL_BROWSER_BASE_PORT") or DEFAULT_DEBUGGING_PORT
+                )
+                env["LOCAL_BROWSER_BASE_PORT"] = str(
+                    base_port + index * local_browsers
+                )
+            else:
+                env["CHROME_OPTS"] = dumps(
+                    chrome_opts_for_worker(loads(env["CHROME_OPTS"]), index)
+                )
+        return env
+
+    async def run(self) -> int:
+        """Runs the workers until every worker has exited
+
+        :return: The exit code of the supervisor
+        """
+        logged_method = "run"
+        start = self.loop.time()
+        self.logger.info(
+            logged_method, f"starting {self.num_workers} workers running {self.script}"
+        )
+        self.loop.add_signal_handler(SIGINT, self._forward_signal)
+        self.loop.add_signal_handler(SIGTERM, self._forward_signal)
+        try:
+            for index in range(self.num_workers):
+                self.workers.append(
+                    await create_subprocess_exec(
+                        sys.executable,
+                        "-u",
+                        self.script,
+                        env=self.worker_env(index),
+                        stdout=PIPE,
+                        stderr=STDOUT,
+                        limit=MAX_LINE_LENGTH,
+                        loop=self.loop,
+                    )
+                )
+            self.exit_codes = await gather(
+                *[
+                    self._run_worker(index, worker)
+                    for index, worker in enumerate(self.workers)
+                ],
+                loop=self.loop,
+            )
+        finally:
+            self.loop.remove_signal_handler(SIGINT)
+            self.loop.remove_signal_handler(SIGTERM)
+        exit_code = self.determine_exit_code()
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                exit_codes=self.exit_codes,
+                exit_code=exit_code,
+                from_signal=self.shutdown_from_signal,
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
+        return exit_code
+
+    def determine_exit_code(self) -> int:
+        """Determines the exit code of the supervisor based on the exit codes of the workers.
+
+        If the shutdown was initiated by signal the return value is 1, otherwise
+        the highest exit code of the workers so that any failed worker fails the supervisor.
+
+        :return: The exit code of the supervisor
+        """
+        if self.shutdown_from_signal:
+            return 1
+        return max(self.exit_codes, default=0)
+
+    async def _run_worker(self, index: int, worker: Process) -> int:
+        """Writes the output of the supplied worker prefixed with its index
+        to the supervisor's output until it exits
+
+        :param index: The index of the worker
+        :param worker: The worker's process
+        :return: The exit code of the worker
+        """
+        prefix = f"[worker {index}] ".encode("utf-8")
+        stdout = sys.stdout.buffer
+        async for line in worker.stdout:
+            stdout.write(prefix + line)
+            stdout.flush()
+        exit_code = await worker.wait()
+        self.logger.info(
+            "_run_worker", f"worker {index} (pid={worker.pid}) exited with {exit_code}"
+        )
+        # a worker killed by signal has a negative return code
+        return exit_code if exit_code >= 0 else 2
+
+    def _forward_signal(self) -> None:
+        """Forwards the shutdown signal to the workers as SIGTERM"""
+        self.logger.info("_forward_signal", "shutdown signal received")
+        self.shutdown_from_signal = True
+        for worker in self.workers:
+            if worker.returncode is None:
+                try:
+                    worker.send_signal(SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    def _bounded_num_workers(self, num_workers: int) -> int:
+        """Returns the supplied number of workers bounded by the number of tabs
+        when the workers share a single browser, or one when the local browser
+        is connected to rather than launched"""
+        if os.environ.get("BROWSER_HOST"):
+            return min(num_workers, max(int(os.environ.get("NUM_TABS", 1)), 1))
+        chrome_opts = os.environ.get("CHROME_OPTS")
+        if chrome_opts and int(os.environ.get("LOCAL_BROWSERS") or 0) <= 0:
+            if not loads(chrome_opts).get("launch", False):
+                return 1
+        return num_workers
+
+    def __str__(self) -> str:
+        info = f"script={self.script}, num_workers={self.num_workers}"
+        return f"WorkerSupervisor({info}, exit_codes={self.exit_codes})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
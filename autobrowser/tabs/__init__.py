@@ -4,10 +4,20 @@ from autobrowser.abcs import Browser, Tab
 from .basetab import BaseTab
 from .behaviorTab import BehaviorTab
 from .crawlerTab import CrawlerTab
+from .fetchTab import FetchTab
 
-__all__ = ["BaseTab", "BehaviorTab", "CrawlerTab", "TAB_CLASSES", "create_tab"]
+__all__ = [
+    "BaseTab",
+    "BehaviorTab",
+    "CrawlerTab",
+    "FetchTab",
+    "TAB_CLASSES",
+    "create_tab",
+]
 
-TAB_CLASSES: Dict[str, Type[Tab]] = dict(BehaviorTab=BehaviorTab, CrawlerTab=CrawlerTab)
+TAB_CLASSES: Dict[str, Type[Tab]] = dict(
+    BehaviorTab=BehaviorTab, CrawlerTab=CrawlerTab, FetchTab=FetchTab
+)
 
 
 async def create_tab(browser: Browser, tab_data: Dict, **kwargs: Any) -> Tab:
@@ -21,5 +31,10 @@ async def create_tab(browser: Browser, tab_data: Dict, **kwargs: Any) -> Tab:
     tab = TAB_CLASSES[browser.config.tab_type].create(
         browser=browser, tab_data=tab_data, **kwargs
     )
-    await tab.init()
+    try:
+        await tab.init()
+    except Exception:
+        # the tab never started so it is not closed, only what it connected to is released
+        await tab.release()
+        raise
     return tab
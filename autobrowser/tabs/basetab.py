@@ -1,22 +1,43 @@
 """Abstract base classes that implements the base functionality of a tab as defined by autobrowser.abcs.Tab"""
 from asyncio import AbstractEventLoop, CancelledError, Task, gather, sleep
+import os
 from base64 import b64decode
 from io import BytesIO
-from typing import Any, Dict, Optional
+from tempfile import mkstemp
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
 
 from aiohttp import ClientResponseError, ClientSession
 from aioredis import Redis
 from cripy import Client, connect
 from math import ceil
-from simplechrome import NetworkIdleMonitor
+from ujson import dumps
 
 from autobrowser.abcs import Behavior, BehaviorManager, Browser, Tab
 from autobrowser.automation import AutomationConfig, CloseReason, TabClosedInfo
 from autobrowser.events import Events
-from autobrowser.util import AutoLogger, Helper, create_autologger
+from autobrowser.uploads import ScreenshotHashIndex, UploadQueue
+from autobrowser.util import (
+    AutoLogger,
+    CDPInstrumentation,
+    ChunkedJSONWriter,
+    Helper,
+    MultiplexedConnection,
+    RendererMemoryWatchdog,
+    RequestTracker,
+    VirtualTimeController,
+    create_autologger,
+    dhash_png,
+)
 
 __all__ = ["BaseTab"]
 
+#: The width of the tiny screenshots perceptual hashes are computed from
+HASH_CAPTURE_WIDTH: int = 64
+
+#: The maximum number of CDP metrics summaries kept in redis when exporting them
+MAX_EXPORTED_CDP_METRICS: int = 10000
+
 
 class BaseTab(Tab):
     """An abstract automation tab class that represents a browser tab in a running browser and
@@ -26,32 +47,55 @@ class BaseTab(Tab):
     __slots__ = [
         "_behavior_run_task",
         "_behaviors_paused",
+        "_browser_context_id",
+        "_cdp_metrics",
         "_close_reason",
         "_connection_closed",
+        "_context_host",
+        "_context_pages",
         "_default_handling_of_dialogs",
         "_graceful_shutdown",
         "_id",
+        "_memory_watchdog",
+        "_num_recycles",
         "_reconnect_promise",
         "_reconnecting",
+        "_request_tracker",
         "_running",
         "_running_behavior",
         "_timestamp",
         "_url",
         "_viewport",
+        "_virtual_time",
         "browser",
         "client",
+        "connection",
         "logger",
         "redis",
+        "screenshot_index",
         "session",
         "tab_data",
+        "uploader",
     ]
 
+    #: The attributes bound to the browser target the tab controls, swapped
+    #: as a unit when the target is recycled
+    _target_attrs: Tuple[str, ...] = (
+        "client",
+        "tab_data",
+        "_memory_watchdog",
+        "_request_tracker",
+        "_virtual_time",
+    )
+
     def __init__(
         self,
         browser: Browser,
         tab_data: Dict[str, str],
         redis: Optional[Redis] = None,
         session: Optional[ClientSession] = None,
+        uploader: Optional[UploadQueue] = None,
+        connection: Optional[MultiplexedConnection] = None,
         *args: Any,
         **kwargs: Any,
     ) -> None:
@@ -59,6 +103,9 @@ class BaseTab(Tab):
         self.browser: Browser = browser
         self.redis = redis
         self.session = session
+        self.uploader: Optional[UploadQueue] = uploader
+        #: The browser level connection the tab's target is attached to, if multiplexing
+        self.connection: Optional[MultiplexedConnection] = connection
         self.tab_data: Dict[str, str] = tab_data
         self.client: Optional[Client] = None
         self.logger: AutoLogger = create_autologger("tabs", self.__class__.__name__)
@@ -76,6 +123,21 @@ class BaseTab(Tab):
         self._running_behavior: Optional[Behavior] = None
         self._close_reason: Optional[CloseReason] = None
         self._viewport: Optional[Dict] = None
+        self._request_tracker: Optional[RequestTracker] = None
+        self._virtual_time: Optional[VirtualTimeController] = None
+        self._memory_watchdog: Optional[RendererMemoryWatchdog] = None
+        self._num_recycles: int = 0
+        self._browser_context_id: Optional[str] = None
+        self._context_host: Optional[str] = None
+        self._context_pages: int = 0
+        self._cdp_metrics: Optional[CDPInstrumentation] = (
+            CDPInstrumentation(loop=self.loop) if self.config.cdp_metrics else None
+        )
+        self.screenshot_index: Optional[ScreenshotHashIndex] = (
+            ScreenshotHashIndex(self.config, redis)
+            if self.config.screenshot_dedup
+            else None
+        )
 
     @property
     def loop(self) -> AbstractEventLoop:
@@ -126,6 +188,11 @@ class BaseTab(Tab):
         """Is this tab attempting to reconnect to the tab"""
         return self._running and self._reconnecting
 
+    @property
+    def request_tracker(self) -> Optional[RequestTracker]:
+        """Returns the tracker of the tab's in-flight network requests"""
+        return self._request_tracker
+
     def devtools_reconnect(self, result: Dict[str, str]) -> None:
         """Callback used to reconnect to the browser tab when the client connection was
         replaced with the devtools."""
@@ -189,19 +256,23 @@ class BaseTab(Tab):
     ) -> None:
         """Returns a future that  resolves once network idle occurs.
 
-        See the options of autobrowser.util.netidle.monitor for a complete
-        description of the available arguments
+        See the options of autobrowser.util.netidle.RequestTracker.wait_for_idle
+        for a complete description of the available arguments
         """
         logged_method = "wait_for_net_idle"
         self.logger.debug(logged_method, "waiting for network idle")
-        await NetworkIdleMonitor.monitor(
-            self.client,
-            num_inflight=num_inflight,
-            idle_time=idle_time,
-            global_wait=global_wait,
-            loop=self.loop,
+        start = self.loop.time()
+        idle = await self._request_tracker.wait_for_idle(
+            num_inflight=num_inflight, idle_time=idle_time, global_wait=global_wait
+        )
+        self.logger.debug(
+            logged_method,
+            Helper.json_string(
+                idle=idle,
+                waited=round(self.loop.time() - start, 3),
+                tracker=str(self._request_tracker),
+            ),
         )
-        self.logger.debug(logged_method, "network idle reached")
 
     async def evaluate_in_page(
         self, js_string: str, contextId: Optional[Any] = None
@@ -251,6 +322,7 @@ class BaseTab(Tab):
         :return: The information returned by Page.navigate
         """
         self.logger.info(f"goto(url={url})", f"navigating to the supplied URL")
+        self._request_tracker.reset()
         return await self.client.Page.navigate(url, **kwargs)
 
     async def connect_to_tab(self) -> None:
@@ -260,24 +332,265 @@ class BaseTab(Tab):
         """
         if self._running:
             return
+        await self._connect()
+
+    async def recycle_target_if_bloated(self) -> bool:
+        """Samples the renderer metrics of the tab and if any of the configured thresholds
+        are exceeded, recycles the browser target (see recycle_target).
+
+        Should only be called between pages.
+
+        :return: T/F indicating if the target was recycled
+        """
+        if self._memory_watchdog is None or not self._running:
+            return False
+        exceeded = await self._memory_watchdog.exceeded()
+        if exceeded is None:
+            return False
+        metric, value, threshold = exceeded
+        self.logger.info(
+            "recycle_target_if_bloated",
+            Helper.json_string(metric=metric, value=value, threshold=threshold),
+        )
+        try:
+            await self.recycle_target()
+        except Exception as e:
+            self.logger.exception(
+                "recycle_target_if_bloated", "recycling the target failed", exc_info=e
+            )
+            return False
+        return True
+
+    async def rotate_browser_context_if_due(self, next_url: str) -> bool:
+        """Moves the tab into a fresh browser context, before navigating to the supplied URL,
+        if the configured browser context policy says the current context's lifetime is over.
+
+        Policies:
+          - none: the tab uses the browser's default context
+          - automation: the tab uses a single context of its own
+          - pages: the tab uses a new context every BROWSER_CONTEXT_PAGES pages
+          - host: the tab uses a new context whenever the host of the page changes
+
+        Should only be called between pages.
+
+        :param next_url: The URL that will be navigated to next
+        :return: T/F indicating if the tab was moved into a new context
+        """
+        policy = self.config.browser_context_policy
+        if policy == "none" or not self._running:
+            return False
+        host = urlsplit(next_url).netloc
+        reason = None
+        if self._browser_context_id is None:
+            reason = "initial"
+        elif (
+            policy == "pages"
+            and self._context_pages >= self.config.browser_context_pages
+        ):
+            reason = "pages"
+        elif policy == "host" and host != self._context_host:
+            reason = "host"
+        self._context_pages += 1
+        if reason is None:
+            return False
+        self.logger.info(
+            "rotate_browser_context_if_due",
+            Helper.json_string(
+                reason=reason,
+                policy=policy,
+                pages=self._context_pages - 1,
+                host=host,
+                previous_host=self._context_host,
+            ),
+        )
+        try:
+            await self.recycle_target(new_context=True)
+        except Exception as e:
+            self.logger.exception(
+                "rotate_browser_context_if_due",
+                "moving into a new browser context failed",
+                exc_info=e,
+            )
+            return False
+        self._context_host = host
+        self._context_pages = 1
+        return True
+
+    async def recycle_target(self, new_context: bool = False) -> None:
+        """Replaces the browser target (tab) this tab controls with a fresh target.
+
+        A new target is created, connected to and set up (browser overrides
+        and everything subclasses set up in _setup_target) and only then is the previous
+        target closed. If connecting to or setting up the new target fails the new target
+        is closed and the tab keeps controlling the previous target. The tab's id remains
+        the same.
+
+        If a new context is requested, the fresh target is created in a new browser context
+        and the previous context, if the tab had one, is disposed of freeing everything the
+        previous target used (cookies, cache, storage and memory) in one shot.
+        Otherwise the fresh target is created in the tab's current browser context.
+
+        :param new_context: Should the fresh target be created in a new browser context
+        """
+        logged_method = "recycle_target"
+        start = self.loop.time()
+        old_state = {attr: getattr(self, attr) for attr in self._target_attrs}
+        old_client = self.client
+        old_target_id = self.tab_data["id"]
+        old_context_id = self._browser_context_id
+        context_id = old_context_id
+        created_context_id = None
+        if new_context:
+            context = await self._send_to_browser(
+                "Target.createBrowserContext", {"disposeOnDetach": False}
+            )
+            context_id = created_context_id = context["browserContextId"]
+        new_target_id = None
+        try:
+            params = {"url": "about:blank"}
+            if context_id is not None:
+                params["browserContextId"] = context_id
+            created = await self._send_to_browser("Target.createTarget", params)
+            new_target_id = created["targetId"]
+            ws_url = self.tab_data["webSocketDebuggerUrl"]
+            self.tab_data = dict(
+                self.tab_data,
+                id=new_target_id,
+                webSocketDebuggerUrl=f"{ws_url[:ws_url.rfind('/') + 1]}{new_target_id}",
+            )
+            await self._connect()
+            await self._apply_browser_overrides()
+            await self._setup_target()
+        except Exception:
+            await self._abandon_target(new_target_id, created_context_id, old_state)
+            raise
+        # the tab is only in the new context once it controls a target in it
+        self._browser_context_id = context_id
+        # the previous target is going away, we no longer care about its events
+        old_client.remove_all_listeners()
+        await old_client.dispose()
+        if not new_context:
+            await self._send_to_browser(
+                "Target.closeTarget", {"targetId": old_target_id}
+            )
+        elif old_context_id is not None:
+            # disposing of the context closes the previous target
+            await self._send_to_browser(
+                "Target.disposeBrowserContext", {"browserContextId": old_context_id}
+            )
+        # the tab's original target, in the default context, is left as is
+        self._num_recycles += 1
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                old_target=old_target_id,
+                new_target=new_target_id,
+                context=self._browser_context_id,
+                recycles=self._num_recycles,
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
+
+    async def _abandon_target(
+        self,
+        target_id: Optional[str],
+        context_id: Optional[str],
+        old_state: Dict[str, Any],
+    ) -> None:
+        """Closes the supplied target and browser context, that could not be switched to,
+        and restores the tab's state for the previous target
+
+        :param target_id: The id of the target to be closed, if it was created
+        :param context_id: The id of the browser context to be disposed of, if it was created
+        :param old_state: The target bound attributes of the tab for the previous target
+        """
+        new_client = self.client
+        if new_client is not None and new_client is not old_state["client"]:
+            # the new client's disconnection must not close the tab
+            new_client.remove_all_listeners()
+            await Helper.no_raise_await(new_client.dispose())
+        for attr, value in old_state.items():
+            setattr(self, attr, value)
+        if context_id is not None:
+            # disposing of the context closes the target created in it
+            await Helper.no_raise_await(
+                self._send_to_browser(
+                    "Target.disposeBrowserContext", {"browserContextId": context_id}
+                )
+            )
+        elif target_id is not None:
+            await Helper.no_raise_await(
+                self._send_to_browser("Target.closeTarget", {"targetId": target_id})
+            )
+
+    def _send_to_browser(self, method: str, params: Dict) -> Awaitable[Dict]:
+        """Sends the supplied browser level command using the multiplexed browser connection
+        if the tab has one otherwise using the tab's client. Commands Chrome only allows
+        on the browser endpoint (e.g. Target.createBrowserContext) require the multiplexed
+        browser connection, see CDP_MULTIPLEX
+
+        :param method: The name of the command
+        :param params: The params of the command
+        :return: An awaitable resolving with the result of the command
+        """
+        if self.connection is not None:
+            return self.connection.send(method, params)
+        return self.client.send(method, params)
+
+    async def _connect(self) -> None:
+        """Connects to the remote browser tab described by the tab data"""
         logged_method = "connect_to_tab"
         self.logger.debug(logged_method, f"connecting to the browser {self.tab_data}")
-        self.client = await connect(
-            self.tab_data["webSocketDebuggerUrl"], loop=self.loop
+        start = self.loop.time()
+        if self.connection is not None:
+            self.client = await self.connection.attach(self.tab_data["id"])
+        else:
+            self.client = await connect(
+                self.tab_data["webSocketDebuggerUrl"], loop=self.loop
+            )
+        if self._cdp_metrics is not None:
+            self._cdp_metrics.instrument(self.client)
+
+        self.logger.debug(
+            logged_method,
+            Helper.json_string(
+                multiplexed=self.connection is not None,
+                time=round(self.loop.time() - start, 3),
+            ),
         )
 
-        self.logger.debug(logged_method, "connected to browser")
-
         self.client.on(Client.Events.Disconnected, self._on_connection_closed)
         self.client.Inspector.detached(self.devtools_reconnect)
         self.client.Inspector.targetCrashed(self._on_inspector_crashed)
 
+        # the tracker must listen before the Network domain is enabled
+        # so that it sees every request made by the tab
+        self._request_tracker = RequestTracker(
+            self.client,
+            loop=self.loop,
+            min_idle_time=self.config.net_idle_min_time,
+            long_lived_time=self.config.net_idle_long_lived_time,
+        )
+        self._request_tracker.start()
+        self._virtual_time = VirtualTimeController(self.client, loop=self.loop)
+        config = self.config
+        self._memory_watchdog = RendererMemoryWatchdog(
+            self.client,
+            max_js_heap=config.tab_max_js_heap,
+            max_nodes=config.tab_max_dom_nodes,
+            max_documents=config.tab_max_documents,
+        )
+        if not self._memory_watchdog.enabled:
+            self._memory_watchdog = None
+
         await gather(
             self.client.Page.enable(),
             self.client.Network.enable(),
             self.client.Runtime.enable(),
             loop=self.loop,
         )
+        if self._memory_watchdog is not None:
+            await self._memory_watchdog.start()
         self.logger.info(logged_method, "enabled domains")
         if self._default_handling_of_dialogs:
             self.client.Page.javascriptDialogOpening(self.__handle_page_dialog)
@@ -294,6 +607,7 @@ class BaseTab(Tab):
             return
         await self.connect_to_tab()
         await self._apply_browser_overrides()
+        await self._setup_target()
         self._running = True
 
     async def close(self) -> None:
@@ -312,12 +626,77 @@ class BaseTab(Tab):
         self.logger.info("close", "closing client")
         if self.reconnecting:
             await self.stop_reconnecting()
+        if self._browser_context_id is not None and self.client is not None:
+            try:
+                await self._send_to_browser(
+                    "Target.disposeBrowserContext",
+                    {"browserContextId": self._browser_context_id},
+                )
+            except Exception as e:
+                self.logger.exception(
+                    "close", "disposing of the browser context failed", exc_info=e
+                )
+            self._browser_context_id = None
+        if self._cdp_metrics is not None:
+            await self.report_cdp_metrics(self._cdp_metrics.tab.summary())
         if self.client:
             self.client.remove_all_listeners()
             await self.client.dispose()
             self.client = None
+            self._request_tracker = None
+            self._virtual_time = None
+            self._memory_watchdog = None
         self.emit(Events.TabClosed, TabClosedInfo(self.tab_id, self._close_reason))
 
+    async def release(self) -> None:
+        """Releases the connection to the tab's target, and everything bound to it,
+        without closing the tab: no TabClosed event is emitted and none of the
+        end of crawl actions are performed.
+
+        Used when the tab failed to initialize.
+        """
+        self._running = False
+        client = self.client
+        self.client = None
+        self._request_tracker = None
+        self._virtual_time = None
+        self._memory_watchdog = None
+        if client is not None:
+            client.remove_all_listeners()
+            await Helper.no_raise_await(client.dispose())
+
+    async def end_page_cdp_metrics(self, url: str) -> None:
+        """Reports the metrics of the CDP commands sent and events received
+        while the tab was on the page, if the tab's CDP client is instrumented
+
+        :param url: The URL of the page
+        """
+        if self._cdp_metrics is None:
+            return
+        summary = self._cdp_metrics.end_page()
+        summary["url"] = url
+        await self.report_cdp_metrics(summary)
+
+    async def report_cdp_metrics(self, summary: Dict) -> None:
+        """Logs the supplied CDP metrics summary and, if configured, exports it to redis
+
+        :param summary: The summary of the CDP metrics
+        """
+        summary_json = Helper.json_string(tab=self._id, **summary)
+        self.logger.info("cdp_metrics", summary_json)
+        if not self.config.cdp_metrics_export or self.redis is None:
+            return
+        key = self.config.redis_keys.cdp_metrics
+        pipeline = self.redis.pipeline()
+        pipeline.lpush(key, summary_json)
+        pipeline.ltrim(key, 0, MAX_EXPORTED_CDP_METRICS - 1)
+        try:
+            await pipeline.execute()
+        except Exception as e:
+            self.logger.exception(
+                "cdp_metrics", "exporting the CDP metrics failed", exc_info=e
+            )
+
     async def shutdown_gracefully(self) -> None:
         """Initiates the graceful shutdown of the tab"""
         logged_method = "shutdown_gracefully"
@@ -330,13 +709,22 @@ class BaseTab(Tab):
         await self.capture_and_upload_screenshot()
         await self.extract_page_data_and_send()
 
-    async def capture_screenshot(self) -> bytes:
-        """Capture a screenshot (in png format) of the current page.
+    async def capture_screenshot(self) -> AsyncIterator[Tuple[int, int, bytes]]:
+        """Capture a screenshot, in the configured format, of the current page.
+
+        Pages taller than the configured tile height are captured as tiles of that height,
+        one at a time, so that neither the browser or us has to hold the entire screenshot.
+
+        The configured viewport is restored once the iterator is exhausted or closed,
+        consumers that may stop early must call its aclose method.
 
-        :return: The captured screenshot as bytes
+        :return: An async iterator yielding the index of the tile, the number of tiles
+        and the tile as bytes
         """
         logged_method = "capture_screenshot"
+        config = self.config
         self.logger.info(logged_method, "capturing screenshot of page")
+        start = self.loop.time()
         # focus our tabs main window just in case we lost focus somewhere
         # i suspect that chrome has issues with non-focused/activated windows
         # and screenshots
@@ -349,68 +737,176 @@ class BaseTab(Tab):
         content_width = ceil(content_size["width"])
         content_height = ceil(content_size["height"])
 
-        if self.config.screenshot_dimensions is not None:
+        if config.screenshot_dimensions is not None:
             # use configured screen shot width height
-            sc_width, sc_height = self.config.screenshot_dimensions
+            sc_width, sc_height = config.screenshot_dimensions
         else:
             # use content width height
             sc_width = content_width
             sc_height = content_height
 
-        # do the virtual resize, take the screenshot, and  then reset
+        tile_height = config.screenshot_tile_height
+        tiled = 0 < tile_height < sc_height
+        num_tiles = ceil(sc_height / tile_height) if tiled else 1
+        # do the virtual resize, take the screenshot, and  then reset.
+        # When tiling only the width is resized and each tile is rendered
+        # beyond the viewport so that the browser never has to rasterize the full page
         await self.client.Emulation.setDeviceMetricsOverride(
             width=content_width,
-            height=content_height,
+            height=self._viewport["height"] if tiled else content_height,
             mobile=self._viewport["mobile"],
             deviceScaleFactor=self._viewport["deviceScaleFactor"],
             screenOrientation=self._viewport["screenOrientation"],
         )
-        # NOTE: we may need fromSurface=False to make our screen shot consider the viewport only
-        # not the surface (the entirety of the rendered chrome)
-        result = await self.client.Page.captureScreenshot(
-            clip={"x": 0, "y": 0, "width": sc_width, "height": sc_height, "scale": 1},
-            format="png",
+        num_bytes = 0
+        try:
+            for tile in range(num_tiles):
+                y = tile * tile_height if tiled else 0
+                height = min(tile_height, sc_height - y) if tiled else sc_height
+                # NOTE: we may need fromSurface=False to make our screen shot consider the viewport only
+                # not the surface (the entirety of the rendered chrome)
+                data = await self._capture_clip(
+                    {"x": 0, "y": y, "width": sc_width, "height": height, "scale": 1},
+                    beyond_viewport=tiled,
+                )
+                num_bytes += len(data)
+                yield tile, num_tiles, data
+                del data
+        finally:
+            # reset back to our configured viewport
+            await self.client.Emulation.setDeviceMetricsOverride(**self._viewport)
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                format=config.screenshot_format,
+                width=sc_width,
+                height=sc_height,
+                tiles=num_tiles,
+                bytes=num_bytes,
+                time=round(self.loop.time() - start, 3),
+            ),
         )
-        # reset back to our configured viewport
-        await self.client.Emulation.setDeviceMetricsOverride(**self._viewport)
-        self.logger.info(logged_method, "captured screenshot of page")
-        return b64decode(result.get("data", b""))
+
+    async def capture_thumbnail(self) -> bytes:
+        """Capture a thumbnail, of the configured width and in the configured format,
+        of the first screen of the current page.
+
+        :return: The captured thumbnail as bytes
+        """
+        logged_method = "capture_thumbnail"
+        start = self.loop.time()
+        metrics = await self.client.Page.getLayoutMetrics()
+        vv = metrics["visualViewport"]
+        width = vv["clientWidth"]
+        data = await self._capture_clip(
+            {
+                "x": 0,
+                "y": 0,
+                "width": width,
+                "height": vv["clientHeight"],
+                "scale": self.config.screenshot_thumbnail_width / width,
+            }
+        )
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                format=self.config.screenshot_format,
+                width=self.config.screenshot_thumbnail_width,
+                bytes=len(data),
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
+        return data
+
+    async def screenshot_perceptual_hash(self) -> int:
+        """Computes the perceptual hash (dHash) of a screenshot of the current page.
+
+        The page is captured as a tiny png, scaled down to HASH_CAPTURE_WIDTH pixels wide,
+        which is then hashed off of the event loop.
+
+        :return: The perceptual hash
+        """
+        metrics = await self.client.Page.getLayoutMetrics()
+        content_size = metrics["contentSize"]
+        width = ceil(content_size["width"])
+        # very tall pages are squashed beyond recognition, only hash their top
+        height = min(ceil(content_size["height"]), width * 8)
+        data = await self._capture_clip(
+            {
+                "x": 0,
+                "y": 0,
+                "width": width,
+                "height": height,
+                "scale": HASH_CAPTURE_WIDTH / width,
+            },
+            beyond_viewport=True,
+            format_="png",
+        )
+        return await self.loop.run_in_executor(None, dhash_png, data)
 
     async def capture_and_upload_screenshot(self) -> None:
         if not self.config.should_take_screenshot:
             return
         logged_method = "capture_and_upload_screenshot"
-        screen_shot = None
+        config = self.config
+        screenshot_hash = None
+        if self.screenshot_index is not None:
+            try:
+                screenshot_hash = await self.screenshot_perceptual_hash()
+            except Exception as e:
+                self.logger.exception(
+                    logged_method, "hashing the screenshot failed", exc_info=e
+                )
+            if screenshot_hash is not None:
+                match = await self.screenshot_index.find(screenshot_hash)
+                if match is not None:
+                    await self._upload_screenshot_reference(screenshot_hash, match)
+                    return
+        tiles = self.capture_screenshot()
         try:
-            screen_shot = await self.capture_screenshot()
+            async for tile, num_tiles, screen_shot in tiles:
+                self.logger.info(
+                    logged_method,
+                    f"sending the captured screenshot to the configured endpoint <tile={tile}>",
+                )
+                params = None
+                if num_tiles > 1:
+                    params = {"tile": str(tile), "tiles": str(num_tiles)}
+                await self._upload_data(
+                    config.screenshot_api_url,
+                    params=params,
+                    data=BytesIO(screen_shot),
+                    content_type=config.screenshot_content_type,
+                )
         except Exception as e:
             self.logger.exception(
                 logged_method, "capturing a screenshot of the page failed", exc_info=e
             )
-        if screen_shot is not None:
-            self.logger.info(
-                logged_method,
-                "sending the captured screenshot to the configured endpoint",
-            )
-            await self._upload_data(
-                self.config.screenshot_api_url,
-                data=BytesIO(screen_shot),
-                content_type='image/png'
+            return
+        finally:
+            # restores the viewport even when the upload of a tile failed
+            await Helper.no_raise_await(tiles.aclose())
+        if screenshot_hash is not None:
+            await self.screenshot_index.add(screenshot_hash, self._url)
+        if config.screenshot_thumbnail_width <= 0:
+            return
+        try:
+            thumbnail = await self.capture_thumbnail()
+        except Exception as e:
+            self.logger.exception(
+                logged_method, "capturing a thumbnail of the page failed", exc_info=e
             )
+            return
+        await self._upload_data(
+            config.screenshot_api_url,
+            params={"thumbnail": "1"},
+            data=BytesIO(thumbnail),
+            content_type=config.screenshot_content_type,
+        )
 
     async def extract_page_data_and_send(self) -> None:
         if self.config.should_retrieve_raw_dom:
-            try:
-                dom = await self.client.DOM.getDocument(depth=-1, pierce=True)
-            except Exception as e:
-                dom = None
-            if dom is not None:
-                await self._upload_data(
-                    self.config.extracted_raw_dom_api_url,
-                    params={'hasScreenshot': '1' if self.config.should_take_screenshot else '0'},
-                    json=dom,
-                    content_type='application/json'
-                )
+            await self.extract_raw_dom_and_send()
 
         if self.config.should_retrieve_mhtml:
             try:
@@ -424,6 +920,79 @@ class BaseTab(Tab):
                     content_type='text/mhtml'
                 )
 
+    async def start_virtual_time(self, behavior_name: Optional[str] = None) -> None:
+        """Starts fast-forwarding the page's timers using virtual time if the
+        automation or the named behavior is configured to do so
+
+        :param behavior_name: The name of the behavior about to be run
+        """
+        budget = self.config.virtual_time_budget_for(behavior_name)
+        if budget <= 0 or self._virtual_time is None:
+            return
+        self.logger.info(
+            "start_virtual_time",
+            Helper.json_string(behavior=behavior_name, budget=budget),
+        )
+        await self._virtual_time.start(budget)
+
+    async def stop_virtual_time(self) -> None:
+        """Stops fast-forwarding the page's timers if they were"""
+        if self._virtual_time is not None:
+            await self._virtual_time.stop()
+
+    async def extract_raw_dom_and_send(self) -> None:
+        """Extracts the page's DOM and sends it to the configured endpoint.
+
+        The DOM is either the tree returned by DOM.getDocument or, if configured, the
+        flattened snapshot returned by DOMSnapshot.captureSnapshot. The DOM is serialized
+        to a file in chunks, gzip compressed if configured, and the file is streamed to
+        the endpoint.
+        """
+        logged_method = "extract_raw_dom_and_send"
+        config = self.config
+        start = self.loop.time()
+        try:
+            if config.raw_dom_format == "snapshot":
+                dom = await self.client.send(
+                    "DOMSnapshot.captureSnapshot", {"computedStyles": []}
+                )
+            else:
+                dom = await self.client.DOM.getDocument(depth=-1, pierce=True)
+        except Exception as e:
+            self.logger.exception(logged_method, "extracting the DOM failed", exc_info=e)
+            return
+        path = self._new_upload_file_path()
+        try:
+            async with ChunkedJSONWriter(path, compress=config.raw_dom_gzip) as writer:
+                await writer.write_object(dom)
+        except Exception as e:
+            self.logger.exception(
+                logged_method, "serializing the DOM failed", exc_info=e
+            )
+            os.remove(path)
+            return
+        finally:
+            del dom
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                format=config.raw_dom_format,
+                raw_bytes=writer.raw_bytes,
+                bytes=writer.written_bytes,
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
+        await self._upload_file(
+            config.extracted_raw_dom_api_url,
+            path,
+            params={
+                "hasScreenshot": "1" if config.should_take_screenshot else "0",
+                "format": config.raw_dom_format,
+            },
+            content_type="application/json",
+            content_encoding="gzip" if config.raw_dom_gzip else None,
+        )
+
     async def navigation_reset(self) -> None:
         logged_method = "navigation_reset"
         self.logger.debug(logged_method, "Resetting tab to about:blank")
@@ -436,6 +1005,13 @@ class BaseTab(Tab):
         else:
             self.logger.debug(logged_method, "Tab reset to about:blank")
 
+    async def _setup_target(self) -> None:
+        """Performs the tab type specific setup of the browser target once connected
+        to it and the browser overrides were applied. Subclasses should override this
+        method, rather than init, for any setup that must be re-done when the target
+        is recycled
+        """
+
     async def _apply_browser_overrides(self) -> None:
         """Applies any configured browser overrides.
         If none were configured, ensures that the User-Agent
@@ -509,6 +1085,23 @@ class BaseTab(Tab):
             "screenOrientation": screen_orientation,
         }
 
+    async def _behavior_name_for_url(self, url: str) -> str:
+        """Returns the name of the behavior that will be run for the supplied URL
+
+        :param url: The URL of the page the behavior will be run on
+        :return: The name of the behavior or unknown if the info could not be retrieved
+        """
+        try:
+            info = await self.behavior_manager.behavior_info_for_url(url)
+        except Exception as e:
+            self.logger.exception(
+                "_behavior_name_for_url",
+                "retrieving the behavior info failed",
+                exc_info=e,
+            )
+            return "unknown"
+        return info.get("name") or "unknown"
+
     async def _upload_data(
         self,
         url: str,
@@ -520,16 +1113,28 @@ class BaseTab(Tab):
         """Uploads the supplied data or json to the supplied URL.
         Method used is PUT
 
+        If the tab has an upload queue the data is added to the queue
+        and uploaded in the background, otherwise it is uploaded immediately
+
         :param url: The URL of the upload endpoint
         :param params: Extra query params for the Request
         :param data: Optional non JSON data
         :param json: Optional json data
         :param content_type: content-type to be used with the data
         """
-        params = params or {}
-        params['reqid'] = self.config.reqid
-        params['url'] = self._url
-        params['timestamp'] = self._timestamp
+        params = self._upload_params(params)
+
+        if self.uploader is not None:
+            if json is not None:
+                body = dumps(json, ensure_ascii=False).encode("utf-8")
+            elif isinstance(data, BytesIO):
+                body = data.getvalue()
+            elif isinstance(data, str):
+                body = data.encode("utf-8")
+            else:
+                body = data
+            await self.uploader.put(url, params, body, content_type)
+            return
 
         headers = {'Content-Type': content_type}
 
@@ -550,6 +1155,116 @@ class BaseTab(Tab):
         else:
             self.logger.info(logged_method, "sent the data to the configured endpoint")
 
+    async def _upload_file(
+        self,
+        url: str,
+        path: str,
+        params: Optional[Dict] = None,
+        content_type: str = "application/json",
+        content_encoding: Optional[str] = None,
+    ) -> None:
+        """Uploads the contents of the supplied file to the supplied URL, streaming it in chunks.
+        Method used is PUT. The file is removed once uploaded
+
+        :param url: The URL of the upload endpoint
+        :param path: The path to the file to be uploaded
+        :param params: Extra query params for the Request
+        :param content_type: content-type to be used with the data
+        :param content_encoding: content-encoding to be used with the data if it is encoded
+        """
+        params = self._upload_params(params)
+        if self.uploader is not None:
+            await self.uploader.put_file(
+                url, params, path, content_type, content_encoding=content_encoding
+            )
+            return
+
+        headers = {"Content-Type": content_type}
+        if content_encoding is not None:
+            headers["Content-Encoding"] = content_encoding
+
+        logged_method = "_upload_file"
+        try:
+            with open(path, "rb") as data:
+                async with self.session.put(
+                    url, params=params, data=data, headers=headers
+                ) as resp:
+                    resp.raise_for_status()
+        except Exception as e:
+            self.logger.exception(logged_method, "sending the file failed", exc_info=e)
+        else:
+            self.logger.info(logged_method, "sent the file to the configured endpoint")
+        finally:
+            os.remove(path)
+
+    def _upload_params(self, params: Optional[Dict] = None) -> Dict:
+        """Returns the query params for an upload, the supplied params plus
+        the reqid, url and timestamp of the current page
+
+        :param params: Extra query params for the Request
+        :return: The query params
+        """
+        params = params or {}
+        params['reqid'] = self.config.reqid
+        params['url'] = self._url
+        params['timestamp'] = self._timestamp
+        return params
+
+    def _new_upload_file_path(self) -> str:
+        """Returns the path to a new empty file used to write artifacts to be uploaded"""
+        if self.uploader is not None:
+            return self.uploader.new_file_path()
+        fd, path = mkstemp(suffix=".upload")
+        os.close(fd)
+        return path
+
+    async def _capture_clip(
+        self,
+        clip: Dict[str, Any],
+        beyond_viewport: bool = False,
+        format_: Optional[str] = None,
+    ) -> bytes:
+        """Captures the supplied region of the page in the configured format
+
+        :param clip: The region of the page to be captured
+        :param beyond_viewport: Should the region be rendered even if it is outside the viewport
+        :param format_: Optional format used instead of the configured format
+        :return: The captured region as bytes
+        """
+        format_ = format_ or self.config.screenshot_format
+        params: Dict[str, Any] = {"clip": clip, "format": format_}
+        if format_ != "png":
+            params["quality"] = self.config.screenshot_quality
+        if beyond_viewport:
+            params["captureBeyondViewport"] = True
+        result = await self.client.send("Page.captureScreenshot", params)
+        return b64decode(result.get("data", b""))
+
+    async def _upload_screenshot_reference(
+        self, screenshot_hash: int, match: Tuple[int, str, int]
+    ) -> None:
+        """Sends a reference record, in place of the screenshot, to the configured endpoint
+        for a screenshot that is a near-duplicate of an already sent screenshot
+
+        :param screenshot_hash: The perceptual hash of the screenshot
+        :param match: The hash, page URL and distance of the already sent screenshot
+        """
+        _, duplicate_of, distance = match
+        self.logger.info(
+            "_upload_screenshot_reference",
+            f"screenshot is a near-duplicate of the screenshot of {duplicate_of}, sending a reference record",
+        )
+        await self._upload_data(
+            self.config.screenshot_api_url,
+            params={"reference": "1"},
+            json={
+                "duplicateOf": duplicate_of,
+                "hash": f"{screenshot_hash:016x}",
+                "distance": distance,
+            },
+            content_type="application/json",
+        )
+
     async def _wait_for_reconnect(self) -> None:
         """Attempt to reconnect to browser tab after client connection was replayed with
         the devtools"""
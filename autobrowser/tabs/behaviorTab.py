@@ -1,5 +1,6 @@
-from typing import List
+from typing import List, Optional
 
+from autobrowser.abcs import Behavior
 from autobrowser.util.helper import Helper
 from .basetab import BaseTab
 
@@ -80,4 +81,24 @@ class BehaviorTab(BaseTab):
             "_run_behavior_for_current_url", f"starting behavior for {self._url}"
         )
         await self.evaluate_in_page(self.config.no_out_links_express)
-        self._behavior_run_task = self.loop.create_task(behavior.run())
+        behavior_name = None
+        if self.config.virtual_time_behaviors:
+            behavior_name = await self._behavior_name_for_url(self._url)
+        self._behavior_run_task = self.loop.create_task(
+            self._run_behavior(behavior, behavior_name)
+        )
+
+    async def _run_behavior(
+        self, behavior: Behavior, behavior_name: Optional[str]
+    ) -> None:
+        """Runs the supplied behavior, fast-forwarding the page's timers using
+        virtual time while it runs if configured to do so
+
+        :param behavior: The behavior to be run
+        :param behavior_name: The name of the behavior
+        """
+        await self.start_virtual_time(behavior_name)
+        try:
+            await behavior.run()
+        finally:
+            await self.stop_virtual_time()
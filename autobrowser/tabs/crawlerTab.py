@@ -2,21 +2,55 @@ import time
 from asyncio import Task, gather
 from enum import Enum, auto
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Set, Union
+from urllib.parse import urldefrag
 
 from email.utils import parsedate
 import datetime
 
 import aiofiles
 from simplechrome import Frame, FrameManager, NavigationError, NetworkManager, Response
+from ujson import dumps
 
 from autobrowser.automation import CloseReason
+from autobrowser.behaviors import BehaviorTimeBudgets
 from autobrowser.frontier import RedisFrontier
 from autobrowser.util import Helper
 from .basetab import BaseTab
+from .probe import ContentTypeProbe
 
 __all__ = ["CrawlerTab"]
 
+#: Changes the location hash of the current document and resolves once the DOM
+#: has not been mutated for the quiet time or the maximum wait time elapsed
+CHANGE_HASH_EXPRESSION: str = """(function (hash, quietTime, maxWait) {
+  return new Promise(function (resolve) {
+    var mutations = 0;
+    var quietTimer = null;
+    var maxTimer = null;
+    var observer = new MutationObserver(function (records) {
+      mutations += records.length;
+      clearTimeout(quietTimer);
+      quietTimer = setTimeout(finish, quietTime);
+    });
+    function finish() {
+      observer.disconnect();
+      clearTimeout(quietTimer);
+      clearTimeout(maxTimer);
+      resolve({ changed: true, mutations: mutations });
+    }
+    observer.observe(document, {
+      childList: true,
+      subtree: true,
+      attributes: true,
+      characterData: true
+    });
+    quietTimer = setTimeout(finish, quietTime);
+    maxTimer = setTimeout(finish, maxWait);
+    window.location.hash = hash;
+  });
+})(%s, %d, %d)"""
+
 
 class NavigationResult(Enum):
     """An enumeration representing the three possible outcomes of navigation"""
@@ -50,11 +84,16 @@ class CrawlerTab(BaseTab):
         "crawl_loop_task",
         "frontier",
         "href_fn",
+        "behavior_budgets",
+        "content_probe",
         "_max_behavior_time",
         "_navigation_timeout",
         "_exit_crawl_loop",
+        "restarts_on_crash",
     ]
 
+    _target_attrs = BaseTab._target_attrs + ("frames", "network")
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.href_fn: str = "function () { return this.href; }"
@@ -71,8 +110,23 @@ class CrawlerTab(BaseTab):
         )
         #: The maximum amount of time the crawler should run behaviors for
         self._max_behavior_time: Union[int, float] = self.config.max_behavior_time
+        #: The learned per behavior and host maximum behavior run times, if configured
+        self.behavior_budgets: Optional[BehaviorTimeBudgets] = (
+            BehaviorTimeBudgets(self.config, self.redis)
+            if self.config.learn_behavior_time
+            else None
+        )
+        #: The probe used to skip navigating to non-page URLs, if configured
+        self.content_probe: Optional[ContentTypeProbe] = (
+            ContentTypeProbe(self.session, self.config, loop=self.loop)
+            if self.config.content_probe and self.session is not None
+            else None
+        )
         self._navigation_timeout: Union[int, float] = self.config.navigation_timeout
         self._exit_crawl_loop: bool = False
+        #: Is the tab's browser restarted if the tab crashes, set by the local
+        #: browser pool so that crashed tabs do not report their crawl as done
+        self.restarts_on_crash: bool = False
 
     @classmethod
     def create(cls, *args, **kwargs) -> "CrawlerTab":
@@ -248,7 +302,12 @@ class CrawlerTab(BaseTab):
         if self._close_reason is None and is_frontier_exhausted:
             self._close_reason = CloseReason.CRAWL_END
 
-        await self.redis.lpush(self.config.redis_keys.auto_done, end_info)
+        crashed = self._close_reason in (
+            CloseReason.TARGET_CRASHED,
+            CloseReason.CONNECTION_CLOSED,
+        )
+        if not (crashed and self.restarts_on_crash):
+            await self.redis.lpush(self.config.redis_keys.auto_done, end_info)
         await super().close()
 
     def set_timestamp_from_response(self, response: Response) -> None:
@@ -291,6 +350,20 @@ class CrawlerTab(BaseTab):
         """
         self._url = url
         logged_method = f"goto"
+        if self.content_probe is not None:
+            mime = await self.content_probe.probe(url)
+            if mime is not None and not ContentTypeProbe.is_page(mime):
+                self.logger.info(
+                    logged_method,
+                    f"not navigating to a non-page, capturing it directly - {Helper.json_string(url=url, mime=mime)}",
+                )
+                if await self.content_probe.capture(url):
+                    return NavigationResult.SKIP_URL
+                self.logger.info(
+                    logged_method,
+                    f"capturing the non-page failed, navigating to it - {Helper.json_string(url=url)}",
+                )
+        self._request_tracker.reset()
         try:
             response = await self.frames.mainFrame.goto(
                 url, waitUntil=wait, timeout=self._navigation_timeout
@@ -337,6 +410,24 @@ class CrawlerTab(BaseTab):
         self.logger.info(logged_method, "initializing")
         # must call super init
         await super().init()
+        empty_frontier = await self.frontier.init()
+        if empty_frontier:
+            specifics = (
+                "we waited for it become populated"
+                if self.frontier.did_wait
+                else "we were not configured to wait"
+            )
+            self.logger.info(
+                logged_method,
+                f"the frontier is empty and {specifics}, we will be exiting",
+            )
+        self.crawl_loop_task = self.loop.create_task(self.crawl())
+        self.logger.info(logged_method, "initialized")
+        await Helper.one_tick_sleep()
+
+    async def _setup_target(self) -> None:
+        """Sets up the frame and network managers for the target, disables its
+        network cache if configured and loads the utility JS"""
         if self.config.net_cache_disabled:
             await self.client.Network.setCacheDisabled(True)
         # enable receiving of frame lifecycle events for the frame manager
@@ -355,20 +446,6 @@ class CrawlerTab(BaseTab):
         # ensure we do not have any naughty JS by disabling its ability to
         # prevent us from navigating away from the page
         await self._load_utility_js()
-        empty_frontier = await self.frontier.init()
-        if empty_frontier:
-            specifics = (
-                "we waited for it become populated"
-                if self.frontier.did_wait
-                else "we were not configured to wait"
-            )
-            self.logger.info(
-                logged_method,
-                f"the frontier is empty and {specifics}, we will be exiting",
-            )
-        self.crawl_loop_task = self.loop.create_task(self.crawl())
-        self.logger.info(logged_method, "initialized")
-        await Helper.one_tick_sleep()
 
     async def navigation_reset(self) -> None:
         logged_method = "navigation_reset"
@@ -394,6 +471,12 @@ class CrawlerTab(BaseTab):
 
         If the crawler is configured to run behaviors until a configured maximum time, the time_run
         method of autobrowser.behaviors.runners.WRBehaviorRunner is used otherwise run.
+
+        If the crawler is configured to learn behavior run times, the maximum time is the
+        learned time for the page's behavior and host and the time the behavior ran for is recorded.
+
+        If the crawler is configured to use virtual time for the page's behavior, the page's timers
+        are fast-forwarded while the behavior runs.
         """
         if self._should_exit_crawl_loop():
             return
@@ -410,14 +493,24 @@ class CrawlerTab(BaseTab):
         self.logger.debug(logged_method, f"running behavior {behavior}")
         # we have a behavior to be run so run it
         if behavior is not None:
+            max_behavior_time = self._max_behavior_time
+            behavior_name = None
+            if self.config.requires_behavior_name:
+                behavior_name = await self._behavior_name_for_url(self._url)
+            if self.behavior_budgets is not None:
+                max_behavior_time = await self.behavior_budgets.budget_for(
+                    behavior_name, self._url
+                )
+            await self.start_virtual_time(behavior_name)
+            start = self.loop.time()
             # run the behavior in a timed fashion (async_timeout will cancel the corutine if max time is reached)
             try:
-                if self._max_behavior_time != -1:
+                if max_behavior_time != -1:
                     self.logger.debug(
                         logged_method,
-                        f"running the behavior timed <time={self._max_behavior_time}>",
+                        f"running the behavior timed <time={max_behavior_time}>",
                     )
-                    await behavior.timed_run(self._max_behavior_time)
+                    await behavior.timed_run(max_behavior_time)
                 else:
                     await behavior.run()
             except Exception as e:
@@ -426,6 +519,16 @@ class CrawlerTab(BaseTab):
                     "while running the behavior it raised an error",
                     exc_info=e,
                 )
+            finally:
+                # the next page must not be navigated to under the virtual time policy
+                await self.stop_virtual_time()
+            if self.behavior_budgets is not None:
+                await self.behavior_budgets.record(
+                    behavior_name,
+                    self._url,
+                    self.loop.time() - start,
+                    finished=behavior.done,
+                )
         # perform any actions that we are configured to do after the behavior has run
         await self._post_run_behavior()
 
@@ -501,6 +604,8 @@ class CrawlerTab(BaseTab):
             logged_method,
             f"we navigated to a non-page - mime={navigation_response.mimeType}, status={navigation_response.status}",
         )
+        if self.content_probe is not None and navigation_response.ok:
+            self.content_probe.learn(self._url, navigation_response.mimeType)
         return NavigationResult.SKIP_URL
 
     async def _crawl_loop(self) -> None:
@@ -525,6 +630,9 @@ class CrawlerTab(BaseTab):
         log_info = self.logger.info
         handle_navigation_result = self._handle_navigation_result
         one_tick_sleep = Helper.one_tick_sleep
+        recycle_target_if_bloated = self.recycle_target_if_bloated
+        rotate_browser_context_if_due = self.rotate_browser_context_if_due
+        end_page_cdp_metrics = self.end_page_cdp_metrics
 
         # loop until frontier is exhausted or we should exit crawl loop
         while 1:
@@ -536,12 +644,17 @@ class CrawlerTab(BaseTab):
 
             next_url = await next_crawl_url()
 
+            # move into a fresh browser context if the configured policy says so
+            await rotate_browser_context_if_due(next_url)
+
             log_info(logged_method, f"navigating - {next_url}")
 
             navigation_result = await navigate_to_page(next_url)
 
             await handle_navigation_result(next_url, navigation_result)
 
+            await end_page_cdp_metrics(next_url)
+
             frontier_exhausted = await is_frontier_exhausted()
 
             if frontier_exhausted or should_exit_crawl_loop():
@@ -551,6 +664,9 @@ class CrawlerTab(BaseTab):
                 )
                 break
 
+            # replace the target with a fresh one, between pages, if its renderer has bloated
+            await recycle_target_if_bloated()
+
             # we sleep for one event loop tick in order to ensure that other
             # coroutines can do their thing if they are waiting. e.g. shutdowns etc
             await one_tick_sleep()
@@ -560,23 +676,49 @@ class CrawlerTab(BaseTab):
         await self._visit_inner_page_links()
 
     async def _visit_inner_page_links(self) -> None:
-        """Visits any inner page links that may have been collected for the current page"""
+        """Visits any inner page links that may have been collected for the current page.
+
+        Inner page links of the current document (that only differ by their fragment) are
+        visited by changing the location hash of the document and waiting for the DOM and
+        network to settle rather than navigating to them. The number of inner page links
+        visited per page is capped and links with the same route are visited once.
+        """
         logged_method = "_visit_inner_page_links"
         have_ipls = False
         next_ipl = self.frontier.pop_inner_page_link
-        goto_ipl = self.frames.mainFrame.goto
         log = self.logger.debug
-        wait = "load"
+        max_ipls = self.config.inner_page_links_max
+        page_url = urldefrag(self.main_frame.url)[0]
+        routes: Set[str] = set()
+        num_hash = num_navigated = num_duplicate = 0
+        start = self.loop.time()
         try:
             have_ipls = await self.frontier.have_inner_page_links()
             if have_ipls:
                 log(logged_method, f"visiting inner page links")
                 while 1:
+                    if max_ipls != -1 and len(routes) >= max_ipls:
+                        self.logger.info(
+                            logged_method,
+                            f"the maximum number of inner page links were visited <max={max_ipls}>",
+                        )
+                        break
                     ipl = await next_ipl()
                     if ipl is None:
                         break
+                    url, fragment = urldefrag(ipl)
+                    route = fragment.lstrip("!").rstrip("/")
+                    if route in routes:
+                        num_duplicate += 1
+                        continue
+                    routes.add(route)
                     log(logged_method, f"visiting - {ipl}")
-                    await goto_ipl(ipl, wait=wait)
+                    if url == page_url and await self._change_location_hash(fragment):
+                        num_hash += 1
+                        continue
+                    num_navigated += 1
+                    await self.frames.mainFrame.goto(ipl, wait="load")
+                    page_url = urldefrag(self.main_frame.url)[0]
             if have_ipls:
                 await self.frontier.remove_inner_page_links()
         except Exception as e:
@@ -586,6 +728,51 @@ class CrawlerTab(BaseTab):
                 else "attempted to visit all inner page links but an exception occurred"
             )
             self.logger.exception(logged_method, msg, exc_info=e)
+        if have_ipls:
+            self.logger.info(
+                logged_method,
+                Helper.json_string(
+                    url=page_url,
+                    hash_changes=num_hash,
+                    navigations=num_navigated,
+                    duplicates=num_duplicate,
+                    time=round(self.loop.time() - start, 3),
+                ),
+            )
+
+    async def _change_location_hash(self, fragment: str) -> bool:
+        """Changes the location hash of the current document to the supplied fragment
+        and waits for the DOM and then the network to settle
+
+        :param fragment: The new location hash
+        :return: T/F indicating if the location hash was changed
+        """
+        config = self.config
+        settle_time = config.inner_page_links_settle_time
+        max_wait = config.inner_page_links_max_wait
+        start = self.loop.time()
+        result = await self.evaluate_in_page(
+            CHANGE_HASH_EXPRESSION
+            % (dumps(fragment), settle_time * 1000, max_wait * 1000)
+        )
+        if not isinstance(result, dict) or not result.get("changed"):
+            return False
+        waited = self.loop.time() - start
+        await self._request_tracker.wait_for_idle(
+            num_inflight=0,
+            idle_time=settle_time,
+            global_wait=max(max_wait - waited, settle_time),
+        )
+        self.logger.debug(
+            "_change_location_hash",
+            Helper.json_string(
+                fragment=fragment,
+                mutations=result.get("mutations"),
+                dom_time=round(waited, 3),
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
+        return True
 
     async def _extract_href_from_remote_node(
         self, node: Dict, outlink_accum: List[str]
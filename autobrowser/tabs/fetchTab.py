@@ -0,0 +1,268 @@
+import codecs
+from html.parser import HTMLParser
+from typing import Any, List, Optional, Set, Tuple
+from urllib.parse import urljoin
+
+from aiohttp import ClientTimeout
+
+from autobrowser.frontier import RedisFrontier
+from autobrowser.util import Helper
+from .crawlerTab import CrawlerTab, NavigationResult
+
+__all__ = ["FetchTab", "LinkExtractor"]
+
+#: The ids of the (empty) root elements client side rendered applications mount into
+APP_ROOT_IDS: Set[str] = {"root", "app", "__next", "___gatsby", "__nuxt"}
+
+#: The elements whose text is not visible
+INVISIBLE_TEXT_TAGS: Set[str] = {"script", "style", "noscript", "template"}
+
+
+class LinkExtractor(HTMLParser):
+    """A streaming HTML parser that extracts the out links (a[href], area[href])
+    of a page and the signals used to determine if the page depends on
+    JavaScript to render its content.
+
+    Chunks of the page's HTML are supplied using feed as they are received.
+    """
+
+    def __init__(self, base_url: str) -> None:
+        """Initialize the new LinkExtractor instance
+
+        :param base_url: The URL of the page, out links are resolved against it
+        """
+        super().__init__(convert_charrefs=True)
+        self.base_url: str = base_url
+        self.links: List[str] = []
+        self.num_scripts: int = 0
+        self.text_length: int = 0
+        self.has_app_root: bool = False
+        self._seen: Set[str] = set()
+        self._invisible_depth: int = 0
+        self._seen_base: bool = False
+
+    def looks_script_dependent(self, min_text: int) -> bool:
+        """Returns T/F indicating if the page looks like it needs JavaScript to
+        render its content: it has scripts and either very little visible text or
+        an application root element and no out links
+
+        :param min_text: The minimum amount of visible text a page without scripts has
+        """
+        if self.num_scripts == 0:
+            return False
+        return self.text_length < min_text or (self.has_app_root and not self.links)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in INVISIBLE_TEXT_TAGS:
+            self._invisible_depth += 1
+            if tag == "script":
+                self.num_scripts += 1
+            return
+        if tag == "a" or tag == "area":
+            href = self._attr(attrs, "href")
+            if href:
+                self._add_link(href)
+        elif tag == "base" and not self._seen_base:
+            href = self._attr(attrs, "href")
+            if href:
+                self._seen_base = True
+                self.base_url = urljoin(self.base_url, href)
+        elif tag == "div" and not self.has_app_root:
+            self.has_app_root = self._attr(attrs, "id") in APP_ROOT_IDS
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in INVISIBLE_TEXT_TAGS and self._invisible_depth > 0:
+            self._invisible_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._invisible_depth == 0:
+            self.text_length += len(data.strip())
+
+    def _add_link(self, href: str) -> None:
+        url = urljoin(self.base_url, href.strip())
+        if url not in self._seen and Helper.url_has_crawlable_scheme(url):
+            self._seen.add(url)
+            self.links.append(url)
+
+    @staticmethod
+    def _attr(attrs: List[Tuple[str, Optional[str]]], name: str) -> Optional[str]:
+        for attr_name, value in attrs:
+            if attr_name == name:
+                return value
+        return None
+
+
+class FetchTab(CrawlerTab):
+    """A crawling tab that does not use the browser, the pages are fetched using
+    plain HTTP requests (through the configured proxy) and their out links
+    are extracted from the HTML as it is received.
+
+    Pages that look like they require JavaScript to render their content are
+    not crawled further but escalated to the escalated q, which the tabs using
+    a browser (CrawlerTab) crawl before their q.
+
+    Env vars:
+         - HTTP_PROXY_URL: the (recording) proxy pages are fetched through, required
+         - FETCH_MAX_PARSE_BYTES: the maximum number of bytes of a page parsed for out links
+         - FETCH_ESCALATE_MIN_TEXT: pages with scripts and less visible text than this
+           are escalated to a browser
+    """
+
+    __slots__ = ["_escalate", "_page_links"]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # the escalated URLs are for tabs using a browser
+        # and the inner page links are never visited by fetch tabs so are not tracked
+        self.frontier: RedisFrontier = RedisFrontier(
+            self.redis,
+            config=self.config,
+            loop=self.loop,
+            consume_escalated=False,
+            track_inner_page_links=False,
+        )
+        self._page_links: Optional[List[str]] = None
+        self._escalate: bool = False
+
+    @classmethod
+    def create(cls, *args: Any, **kwargs: Any) -> "FetchTab":
+        return cls(*args, **kwargs)
+
+    async def init(self) -> None:
+        """Initialize the fetch tab, if the fetch tab is already running this is a no op.
+        Unlike the other tabs no connection to the browser is made
+        """
+        if self._running:
+            return
+        logged_method = "init"
+        self.logger.info(logged_method, "initializing")
+        self._running = True
+        empty_frontier = await self.frontier.init()
+        if empty_frontier:
+            specifics = (
+                "we waited for it become populated"
+                if self.frontier.did_wait
+                else "we were not configured to wait"
+            )
+            self.logger.info(
+                logged_method,
+                f"the frontier is empty and {specifics}, we will be exiting",
+            )
+        self.crawl_loop_task = self.loop.create_task(self.crawl())
+        self.logger.info(logged_method, "initialized")
+        await Helper.one_tick_sleep()
+
+    async def goto(
+        self, url: str, wait: str = "load", *args: Any, **kwargs: Any
+    ) -> NavigationResult:
+        """Fetches the supplied URL, parsing the out links of the page as it is received.
+        The return value of this function indicates the next action to be performed by the crawler
+
+        :param url: The URL of the page to fetch
+        :param wait: Unused, the page is always fully received
+        :param kwargs: Any additional arguments for use in fetching
+        :return: An NavigationResult indicating the next action of the crawler
+        """
+        self._url = url
+        self._page_links = None
+        self._escalate = False
+        logged_method = "goto"
+        config = self.config
+        start = self.loop.time()
+        num_bytes = 0
+        try:
+            async with self.session.get(
+                url,
+                proxy=config.http_proxy_url,
+                timeout=ClientTimeout(total=self._navigation_timeout),
+            ) as response:
+                self.set_timestamp_from_response(response)
+                response_url = str(response.url)
+                mime = response.content_type or ""
+                is_page = "html" in mime.lower() and response.status < 400
+                extractor = LinkExtractor(response_url) if is_page else None
+                decoder = codecs.getincrementaldecoder(
+                    self._codec(response.charset)
+                )(errors="replace")
+                # the entire response is always read so that it is fully
+                # recorded by the proxy, only the parsing is bounded
+                async for chunk in response.content.iter_chunked(65536):
+                    num_bytes += len(chunk)
+                    if extractor is not None:
+                        extractor.feed(decoder.decode(chunk))
+                        if num_bytes >= config.fetch_max_parse_bytes:
+                            extractor.close()
+                            self._collect_page(extractor)
+                            extractor = None
+                if extractor is not None:
+                    extractor.feed(decoder.decode(b"", final=True))
+                    extractor.close()
+                    self._collect_page(extractor)
+                status = response.status
+        except Exception as e:
+            self.logger.exception(
+                logged_method, f"fetching failed for {url}", exc_info=e
+            )
+            return NavigationResult.SKIP_URL
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                url=url,
+                responseURL=response_url,
+                status=status,
+                mime=mime,
+                bytes=num_bytes,
+                links=len(self._page_links) if self._page_links is not None else -1,
+                escalate=self._escalate,
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
+        self.frontier.crawling_new_page(response_url)
+        if not is_page:
+            return NavigationResult.SKIP_URL
+        return NavigationResult.OK
+
+    async def run_behavior(self) -> None:
+        """Adds the out links of the fetched page to the frontier or escalates
+        the page to a browser if it looks like it depends on JavaScript.
+
+        Fetch tabs do not run behaviors.
+        """
+        if self._should_exit_crawl_loop():
+            return
+        if self._escalate:
+            current = self.frontier.currently_crawling
+            await self.frontier.escalate(
+                self._url, current["depth"] if current is not None else 0
+            )
+        elif self._page_links:
+            await self.frontier.add_all(self._page_links)
+        self._page_links = None
+
+    async def navigation_reset(self) -> None:
+        """Fetch tabs have no page to reset"""
+
+    async def rotate_browser_context_if_due(self, next_url: str) -> bool:
+        """Fetch tabs have no browser context"""
+        return False
+
+    async def post_behavior_run(self) -> None:
+        """Fetch tabs have no page to capture"""
+
+    async def _post_run_behavior(self) -> None:
+        """Fetch tabs have no page to visit inner page links in"""
+
+    def _collect_page(self, extractor: LinkExtractor) -> None:
+        self._page_links = extractor.links
+        self._escalate = extractor.looks_script_dependent(
+            self.config.fetch_escalate_min_text
+        )
+
+    @staticmethod
+    def _codec(charset: Optional[str]) -> str:
+        if charset:
+            try:
+                return codecs.lookup(charset).name
+            except LookupError:
+                pass
+        return "utf-8"
@@ -0,0 +1,231 @@
+import re
+from asyncio import AbstractEventLoop
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import urldefrag, urlsplit
+
+from aiohttp import ClientSession, ClientTimeout
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.util import AutoLogger, Helper, create_autologger
+
+__all__ = ["ContentTypeProbe"]
+
+DIGITS_RE = re.compile(r"\d")
+
+
+class ContentTypeProbe:
+    """Determines the content-type of a URL, before the browser navigates to it,
+    using a HEAD request (or a single byte ranged GET if HEAD is not supported).
+    The probe is made directly, not through the configured (recording) proxy,
+    so that it does not end up in the archive.
+
+    HTML content-types are cached per URL pattern, the URL's host and path with
+    the path segments containing digits replaced by * and the last path segment replaced
+    by its extension, so that pages of the same shape are probed once. Any other
+    content-type is cached for the exact URL only, so that a URL is never captured
+    without a browser based on another URL's content-type.
+
+    URLs whose content-type is not HTML are not navigated to by the browser, instead
+    they are directly fetched (captured) through the configured proxy (HTTP_PROXY_URL,
+    required by CONTENT_PROBE).
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "cache",
+        "cache_size",
+        "capture_timeout",
+        "logger",
+        "loop",
+        "num_cache_hits",
+        "num_captured",
+        "num_probed",
+        "proxy",
+        "session",
+        "timeout",
+    ]
+
+    def __init__(
+        self,
+        session: ClientSession,
+        config: AutomationConfig,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> None:
+        """Initialize the new ContentTypeProbe instance
+
+        :param session: The HTTP session used to make the requests
+        :param config: The automation config
+        :param loop: The event loop used by the automation
+        """
+        self.session: ClientSession = session
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.proxy: Optional[str] = config.http_proxy_url
+        self.timeout: ClientTimeout = ClientTimeout(total=config.content_probe_timeout)
+        self.capture_timeout: ClientTimeout = ClientTimeout(
+            total=config.navigation_timeout
+        )
+        self.cache: OrderedDict = OrderedDict()
+        self.cache_size: int = config.content_probe_cache_size
+        self.num_probed: int = 0
+        self.num_cache_hits: int = 0
+        self.num_captured: int = 0
+        self.logger: AutoLogger = create_autologger("contentProbe", "ContentTypeProbe")
+
+    @staticmethod
+    def is_page(mime: str) -> bool:
+        """Returns T/F indicating if the supplied content-type is for a page (HTML)"""
+        return "html" in mime.lower()
+
+    @staticmethod
+    def url_pattern(url: str) -> str:
+        """Returns the pattern the supplied URL's content-type is cached by
+
+        :param url: The URL to get the pattern of
+        :return: The pattern of the URL
+        """
+        split = urlsplit(url)
+        segments = split.path.split("/")
+        last = segments[-1]
+        for idx, segment in enumerate(segments):
+            if DIGITS_RE.search(segment) is not None:
+                segments[idx] = "*"
+        dot = last.rfind(".")
+        segments[-1] = f"*{last[dot:].lower()}" if dot > 0 else segments[-1]
+        return f"{split.netloc}{'/'.join(segments)}"
+
+    def cache_key(self, url: str, mime: str) -> str:
+        """Returns the key the supplied URL's content-type is cached by, the URL's
+        pattern for pages and the fragmentless URL otherwise
+
+        :param url: The URL
+        :param mime: The content-type of the URL
+        :return: The cache key
+        """
+        if self.is_page(mime):
+            return self.url_pattern(url)
+        return urldefrag(url)[0]
+
+    def cached(self, url: str) -> Optional[str]:
+        """Returns the cached content-type of the supplied URL, if any
+
+        :param url: The URL
+        :return: The cached content-type or None
+        """
+        for key in (urldefrag(url)[0], self.url_pattern(url)):
+            mime = self.cache.get(key)
+            if mime is not None:
+                self.cache.move_to_end(key)
+                return mime
+        return None
+
+    def learn(self, url: str, mime: str) -> None:
+        """Caches the content-type of the supplied URL, learned by some other means
+        (e.g. navigating to it)
+
+        :param url: The URL
+        :param mime: The content-type of the URL
+        """
+        self._cache(self.cache_key(url, mime), mime)
+
+    async def probe(self, url: str) -> Optional[str]:
+        """Returns the content-type of the supplied URL
+
+        :param url: The URL to be probed
+        :return: The content-type of the URL or None if it could not be determined
+        """
+        logged_method = "probe"
+        mime = self.cached(url)
+        if mime is not None:
+            self.num_cache_hits += 1
+            self.logger.debug(
+                logged_method, Helper.json_string(url=url, mime=mime, cached=True)
+            )
+            return mime
+        start = self.loop.time()
+        self.num_probed += 1
+        try:
+            status, mime = await self._request("HEAD", url)
+            if status == 405 or status >= 500:
+                status, mime = await self._request(
+                    "GET", url, {"Range": "bytes=0-0"}
+                )
+        except Exception as e:
+            self.logger.exception(logged_method, f"probing {url} failed", exc_info=e)
+            return None
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                url=url,
+                status=status,
+                mime=mime,
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
+        if status >= 400 or not mime:
+            return None
+        self.learn(url, mime)
+        return mime
+
+    async def capture(self, url: str) -> bool:
+        """Captures a non-page URL by fetching it through the configured proxy,
+        the response body is read and discarded. Responses with an error status
+        are not considered captured
+
+        :param url: The URL to be captured
+        :return: T/F indicating if the URL was captured
+        """
+        logged_method = "capture"
+        start = self.loop.time()
+        num_bytes = 0
+        try:
+            async with self.session.get(
+                url, proxy=self.proxy, timeout=self.capture_timeout
+            ) as response:
+                async for chunk in response.content.iter_chunked(65536):
+                    num_bytes += len(chunk)
+                status = response.status
+        except Exception as e:
+            self.logger.exception(logged_method, f"capturing {url} failed", exc_info=e)
+            return False
+        captured = status < 400
+        if captured:
+            self.num_captured += 1
+        self.logger.info(
+            logged_method,
+            Helper.json_string(
+                url=url,
+                status=status,
+                bytes=num_bytes,
+                captured=captured,
+                time=round(self.loop.time() - start, 3),
+            ),
+        )
+        return captured
+
+    async def _request(
+        self, method: str, url: str, headers: Optional[dict] = None
+    ) -> Tuple[int, str]:
+        # not through the recording proxy, probes are not to be archived
+        async with self.session.request(
+            method,
+            url,
+            headers=headers,
+            timeout=self.timeout,
+            allow_redirects=True,
+        ) as response:
+            # the raw header, aiohttp defaults a missing content-type to application/octet-stream
+            return response.status, response.headers.get("Content-Type", "")
+
+    def _cache(self, pattern: str, mime: str) -> None:
+        self.cache[pattern] = mime
+        self.cache.move_to_end(pattern)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def __str__(self) -> str:
+        info = f"probed={self.num_probed}, cache_hits={self.num_cache_hits}, captured={self.num_captured}"
+        return f"ContentTypeProbe({info}, cached={len(self.cache)})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,4 @@
+from .dedup import ScreenshotHashIndex
+from .queue import Upload, UploadQueue
+
+__all__ = ["ScreenshotHashIndex", "Upload", "UploadQueue"]
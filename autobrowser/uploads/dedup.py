@@ -0,0 +1,126 @@
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from aioredis import Redis
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.util import AutoLogger, Helper, create_autologger, hamming_distance
+
+__all__ = ["ScreenshotHashIndex"]
+
+#: A matching entry of the index: the hash, the URL of the page it is for and its distance
+Match = Tuple[int, str, int]
+
+
+class ScreenshotHashIndex:
+    """A bounded index of the perceptual hashes of the screenshots uploaded by an automation,
+    used to detect screenshots that are near-duplicates of an already uploaded screenshot.
+
+    The index keeps the most recently added hashes, up to the configured size. If a redis
+    instance is supplied the index is the automation's screenshot hashes list, shared by
+    every tab of the automation, otherwise it is kept locally.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "key",
+        "local",
+        "logger",
+        "max_distance",
+        "num_checked",
+        "num_duplicates",
+        "redis",
+        "size",
+    ]
+
+    def __init__(self, config: AutomationConfig, redis: Optional[Redis] = None) -> None:
+        """Initialize the new ScreenshotHashIndex instance
+
+        :param config: The automation config
+        :param redis: Optional redis instance used to share the index
+        """
+        self.redis: Optional[Redis] = redis
+        self.key: str = config.redis_keys.screenshot_hashes
+        self.size: int = max(config.screenshot_dedup_index_size, 1)
+        self.max_distance: int = config.screenshot_dedup_distance
+        self.local: Deque[str] = deque(maxlen=self.size)
+        self.num_checked: int = 0
+        self.num_duplicates: int = 0
+        self.logger: AutoLogger = create_autologger(
+            "screenshotDedup", "ScreenshotHashIndex"
+        )
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Returns the fraction of the checked screenshots that were near-duplicates"""
+        if self.num_checked == 0:
+            return 0.0
+        return self.num_duplicates / self.num_checked
+
+    async def find(self, hash_value: int) -> Optional[Match]:
+        """Finds the indexed hash closest to the supplied hash that is within
+        the configured distance of it
+
+        :param hash_value: The perceptual hash of the screenshot
+        :return: The hash, page URL and distance of the closest match or None
+        if the screenshot is not a near-duplicate
+        """
+        self.num_checked += 1
+        best: Optional[Match] = None
+        for entry in await self._entries():
+            hex_hash, _, url = entry.partition(" ")
+            indexed = int(hex_hash, 16)
+            distance = hamming_distance(hash_value, indexed)
+            if distance <= self.max_distance and (best is None or distance < best[2]):
+                best = (indexed, url, distance)
+                if distance == 0:
+                    break
+        if best is not None:
+            self.num_duplicates += 1
+        self.logger.info(
+            "find",
+            Helper.json_string(
+                hash=f"{hash_value:016x}",
+                duplicate_of=best[1] if best is not None else None,
+                distance=best[2] if best is not None else None,
+                checked=self.num_checked,
+                duplicates=self.num_duplicates,
+                dedup_ratio=round(self.dedup_ratio, 3),
+            ),
+        )
+        return best
+
+    async def add(self, hash_value: int, url: str) -> None:
+        """Adds the hash of an uploaded screenshot to the index, evicting the
+        oldest hash if the index is full
+
+        :param hash_value: The perceptual hash of the screenshot
+        :param url: The URL of the page the screenshot is of
+        """
+        entry = f"{hash_value:016x} {url}"
+        if self.redis is None:
+            self.local.appendleft(entry)
+            return
+        try:
+            transaction = self.redis.multi_exec()
+            transaction.lpush(self.key, entry)
+            transaction.ltrim(self.key, 0, self.size - 1)
+            await transaction.execute()
+        except Exception as e:
+            self.logger.exception("add", "adding the hash failed", exc_info=e)
+
+    async def _entries(self) -> List[str]:
+        if self.redis is None:
+            return list(self.local)
+        try:
+            return await self.redis.lrange(self.key, 0, -1)
+        except Exception as e:
+            self.logger.exception("_entries", "retrieving the hashes failed", exc_info=e)
+            return []
+
+    def __str__(self) -> str:
+        info = f"size={self.size}, max_distance={self.max_distance}, checked={self.num_checked}"
+        return f"ScreenshotHashIndex({info}, duplicates={self.num_duplicates}, shared={self.redis is not None})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
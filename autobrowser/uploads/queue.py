@@ -0,0 +1,332 @@
+import os
+from asyncio import AbstractEventLoop, CancelledError, Condition, Queue, Task, sleep
+from random import random
+from shutil import rmtree
+from tempfile import mkdtemp, mkstemp
+from typing import Any, Dict, List, Optional, Union
+
+import aiofiles
+import attr
+from aiohttp import ClientResponseError, ClientSession
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.util import AutoLogger, Helper, create_autologger
+
+__all__ = ["Upload", "UploadQueue"]
+
+
+@attr.dataclass(slots=True)
+class Upload:
+    """Simple data class representing an artifact waiting to be uploaded.
+    The artifact's body is either held in memory or in a file on disk
+    """
+
+    url: str = attr.ib()
+    params: Dict[str, str] = attr.ib()
+    content_type: str = attr.ib()
+    size: int = attr.ib()
+    body: Optional[bytes] = attr.ib(default=None, repr=False)
+    path: Optional[str] = attr.ib(default=None)
+    content_encoding: Optional[str] = attr.ib(default=None)
+    attempts: int = attr.ib(default=0)
+
+
+class UploadQueue:
+    """A per driver background upload pipeline for the artifacts produced by
+    tabs (screenshots, DOM, MHTML) so that slow upload endpoints do not stall crawling.
+
+    Artifacts are uploaded (PUT) by a bounded number of workers and failed uploads
+    are retried with exponential backoff. The bodies of queued artifacts are held in
+    memory up to the configured maximum, after which they are spilled to disk up to
+    the configured maximum. Once both are full adding an artifact waits until space
+    is freed (backpressure on the tabs).
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_memory",
+        "_queue",
+        "_space_freed",
+        "_spill_dir",
+        "_spilled",
+        "_workers",
+        "backoff",
+        "logger",
+        "loop",
+        "max_concurrency",
+        "max_memory",
+        "max_retries",
+        "max_spill",
+        "num_failed",
+        "num_uploaded",
+        "session",
+        "spill_dir",
+    ]
+
+    def __init__(
+        self,
+        session: ClientSession,
+        config: AutomationConfig,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> None:
+        """Initialize the new UploadQueue instance
+
+        :param session: The HTTP session used to upload the artifacts
+        :param config: The automation config
+        :param loop: The event loop used by the automation
+        """
+        self.session: ClientSession = session
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.max_concurrency: int = max(config.upload_concurrency, 1)
+        self.max_memory: int = config.upload_max_memory
+        self.max_spill: int = config.upload_max_spill
+        self.max_retries: int = config.upload_max_retries
+        self.backoff: Union[int, float] = config.upload_retry_backoff
+        self.spill_dir: Optional[str] = config.upload_spill_dir
+        self.num_uploaded: int = 0
+        self.num_failed: int = 0
+        self.logger: AutoLogger = create_autologger("uploads", "UploadQueue")
+        self._queue: Queue = Queue(loop=self.loop)
+        self._space_freed: Condition = Condition(loop=self.loop)
+        self._workers: List[Task] = []
+        self._memory: int = 0
+        self._spilled: int = 0
+        self._spill_dir: Optional[str] = None
+
+    @property
+    def pending(self) -> int:
+        """Returns the number of artifacts waiting to be uploaded"""
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        """Starts the upload workers"""
+        if self._workers:
+            return
+        self.logger.info(
+            "start", f"starting {self.max_concurrency} upload workers - {self}"
+        )
+        for _ in range(self.max_concurrency):
+            self._workers.append(self.loop.create_task(self._worker()))
+
+    async def put(
+        self, url: str, params: Dict[str, str], body: bytes, content_type: str
+    ) -> None:
+        """Adds an artifact to be uploaded. If the memory and spill space
+        is used up, waits until enough space is available.
+
+        :param url: The URL of the upload endpoint
+        :param params: The query params for the upload request
+        :param body: The artifact's bytes
+        :param content_type: The content-type of the artifact
+        """
+        size = len(body)
+        upload = Upload(url=url, params=params, content_type=content_type, size=size)
+        if self._fits_in_memory(size):
+            upload.body = body
+            self._memory += size
+        elif self.max_spill > 0 and self._fits_on_disk(size):
+            upload.path = await self._spill(body)
+            self._spilled += size
+        else:
+            self.logger.info(
+                "put", f"upload queue is full, waiting for space <size={size}>"
+            )
+            async with self._space_freed:
+                await self._space_freed.wait_for(lambda: self._fits_in_memory(size))
+            upload.body = body
+            self._memory += size
+        self._queue.put_nowait(upload)
+
+    async def put_file(
+        self,
+        url: str,
+        params: Dict[str, str],
+        path: str,
+        content_type: str,
+        content_encoding: Optional[str] = None,
+    ) -> None:
+        """Adds an artifact whose bytes are in the supplied file to be uploaded.
+        The file is streamed to the upload endpoint and removed once uploaded.
+
+        :param url: The URL of the upload endpoint
+        :param params: The query params for the upload request
+        :param path: The path to the file containing the artifact
+        :param content_type: The content-type of the artifact
+        :param content_encoding: The content-encoding of the artifact, if it is encoded
+        """
+        size = os.path.getsize(path)
+        if self.max_spill > 0 and not self._fits_on_disk(size):
+            self.logger.info(
+                "put_file", f"upload queue is full, waiting for space <size={size}>"
+            )
+            async with self._space_freed:
+                await self._space_freed.wait_for(lambda: self._fits_on_disk(size))
+        self._spilled += size
+        upload = Upload(url=url, params=params, content_type=content_type, size=size)
+        upload.path = path
+        upload.content_encoding = content_encoding
+        self._queue.put_nowait(upload)
+
+    def new_file_path(self) -> str:
+        """Returns the path to a new empty file in the spill directory, used by
+        tabs to write artifacts that are then added using put_file
+
+        :return: The path to the new file
+        """
+        if self._spill_dir is None:
+            if self.spill_dir is not None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._spill_dir = self.spill_dir
+            else:
+                self._spill_dir = mkdtemp(prefix="autobrowser-uploads-")
+        fd, path = mkstemp(suffix=".upload", dir=self._spill_dir)
+        os.close(fd)
+        return path
+
+    async def close(self, timeout: Union[int, float] = 60) -> None:
+        """Waits for the queued artifacts to be uploaded, up to the supplied timeout,
+        and then stops the upload workers. The spill directory created by the queue
+        is removed once the queue has drained
+
+        :param timeout: The maximum amount of time to wait for the queued artifacts
+        """
+        logged_method = "close"
+        self.logger.info(logged_method, f"draining the upload queue - {self}")
+        if self._workers:
+            drained = self.loop.create_task(self._queue.join())
+            await Helper.timed_future_completion(
+                drained, timeout=timeout, cancel=False, loop=self.loop
+            )
+            drained.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except CancelledError:
+                pass
+        self._workers.clear()
+        if self._spill_dir is not None and self._spill_dir != self.spill_dir:
+            if self._queue.empty():
+                rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir = None
+            else:
+                self.logger.info(
+                    logged_method,
+                    f"keeping the spill directory {self._spill_dir}, the queue did not drain",
+                )
+        self.logger.info(logged_method, f"upload queue closed - {self}")
+
+    def _fits_on_disk(self, size: int) -> bool:
+        return self._spilled == 0 or self._spilled + size <= self.max_spill
+
+    def _fits_in_memory(self, size: int) -> bool:
+        # an artifact larger than the memory limit is let through once nothing else is held
+        return self._memory == 0 or self._memory + size <= self.max_memory
+
+    async def _spill(self, body: bytes) -> str:
+        """Writes the supplied bytes to a new file in the spill directory
+
+        :param body: The bytes to be written
+        :return: The path to the file
+        """
+        path = self.new_file_path()
+        async with aiofiles.open(path, "wb") as out:
+            await out.write(body)
+        return path
+
+    async def _worker(self) -> None:
+        """Uploads queued artifacts until cancelled"""
+        queue = self._queue
+        upload_artifact = self._upload
+        while 1:
+            upload = await queue.get()
+            try:
+                await upload_artifact(upload)
+            finally:
+                await self._release(upload)
+                queue.task_done()
+
+    async def _upload(self, upload: Upload) -> None:
+        """Uploads the supplied artifact, retrying failed attempts with exponential backoff
+
+        :param upload: The artifact to be uploaded
+        """
+        logged_method = "_upload"
+        headers = {"Content-Type": upload.content_type}
+        if upload.content_encoding is not None:
+            headers["Content-Encoding"] = upload.content_encoding
+        while 1:
+            upload.attempts += 1
+            start = self.loop.time()
+            try:
+                await self._send(upload, headers)
+            except CancelledError:
+                raise
+            except Exception as e:
+                retryable = not isinstance(e, ClientResponseError) or (
+                    e.status >= 500 or e.status == 429
+                )
+                if not retryable or upload.attempts > self.max_retries:
+                    self.num_failed += 1
+                    self.logger.exception(
+                        logged_method,
+                        f"uploading failed, giving up - {upload}",
+                        exc_info=e,
+                    )
+                    return
+                delay = self.backoff * (2 ** (upload.attempts - 1)) * (0.5 + random())
+                self.logger.info(
+                    logged_method,
+                    f"uploading failed, retrying in {delay:.2f}s - {upload} - {e}",
+                )
+                await sleep(delay, loop=self.loop)
+                continue
+            self.num_uploaded += 1
+            self.logger.info(
+                logged_method,
+                Helper.json_string(
+                    url=upload.params.get("url"),
+                    endpoint=upload.url,
+                    bytes=upload.size,
+                    attempts=upload.attempts,
+                    time=round(self.loop.time() - start, 3),
+                    pending=self._queue.qsize(),
+                ),
+            )
+            return
+
+    async def _send(self, upload: Upload, headers: Dict[str, str]) -> None:
+        data: Any = upload.body
+        if data is None:
+            # aiohttp streams file objects in chunks
+            data = open(upload.path, "rb")
+        try:
+            async with self.session.put(
+                upload.url, params=upload.params, data=data, headers=headers
+            ) as resp:
+                resp.raise_for_status()
+        finally:
+            if upload.body is None:
+                data.close()
+
+    async def _release(self, upload: Upload) -> None:
+        """Frees the memory or disk space used by the supplied artifact"""
+        if upload.body is not None:
+            upload.body = None
+            self._memory -= upload.size
+        else:
+            self._spilled -= upload.size
+            try:
+                os.remove(upload.path)
+            except OSError:
+                pass
+        async with self._space_freed:
+            self._space_freed.notify_all()
+
+    def __str__(self) -> str:
+        info = f"pending={self._queue.qsize()}, memory={self._memory}, spilled={self._spilled}"
+        return f"UploadQueue({info}, uploaded={self.num_uploaded}, failed={self.num_failed})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -1,4 +1,34 @@
+from .backoff import Backoff
+from .cdpmetrics import CDPInstrumentation, CDPMetrics
 from .helper import Helper
 from .loggers import AutoLogger, RootLogger, create_autologger
+from .looplag import LoopLagMonitor
+from .memory import RendererMemoryWatchdog
+from .multiplexed import MultiplexedConnection, SessionClient
+from .netidle import RequestTracker
+from .phash import dhash_png, hamming_distance
+from .profiler import SamplingProfiler
+from .serialization import ChunkedJSONWriter
+from .stats import LatencyStats
+from .virtualtime import VirtualTimeController
 
-__all__ = ["AutoLogger", "Helper", "RootLogger", "create_autologger"]
+__all__ = [
+    "AutoLogger",
+    "Backoff",
+    "CDPInstrumentation",
+    "CDPMetrics",
+    "ChunkedJSONWriter",
+    "Helper",
+    "LatencyStats",
+    "LoopLagMonitor",
+    "MultiplexedConnection",
+    "RendererMemoryWatchdog",
+    "RequestTracker",
+    "RootLogger",
+    "SamplingProfiler",
+    "SessionClient",
+    "VirtualTimeController",
+    "create_autologger",
+    "dhash_png",
+    "hamming_distance",
+]
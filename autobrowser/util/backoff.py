@@ -0,0 +1,103 @@
+"""Exponential backoff with jitter, bounded by an overall deadline, for polling"""
+from asyncio import AbstractEventLoop, Event, TimeoutError, sleep, wait_for
+from random import random
+from typing import Optional, Union
+
+from .helper import Helper
+
+__all__ = ["Backoff"]
+
+Number = Union[int, float]
+
+
+class Backoff:
+    """Computes the delays between the attempts of a polling operation, the delays grow
+    exponentially from the initial delay up to the maximum delay and are jittered (by up to
+    half of the delay) so that many pollers started at once do not poll in lock step.
+
+    Once the deadline has passed, measured from the creation of the backoff, no
+    further attempts should be made.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "attempts",
+        "deadline",
+        "factor",
+        "initial",
+        "loop",
+        "maximum",
+        "started",
+    ]
+
+    def __init__(
+        self,
+        initial: Number,
+        maximum: Number,
+        deadline: Number,
+        factor: Number = 2,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> None:
+        """Initialize the new Backoff instance
+
+        :param initial: The delay before the second attempt in seconds
+        :param maximum: The maximum delay between attempts in seconds
+        :param deadline: The number of seconds after which no more attempts
+        should be made, 0 for no deadline
+        :param factor: The factor the delay grows by after each attempt
+        :param loop: The event loop used by the automation
+        """
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.initial: Number = initial
+        self.maximum: Number = max(maximum, initial)
+        self.deadline: Number = deadline
+        self.factor: Number = factor
+        self.attempts: int = 0
+        self.started: float = self.loop.time()
+
+    @property
+    def elapsed(self) -> float:
+        """Returns the number of seconds since the backoff was created"""
+        return self.loop.time() - self.started
+
+    @property
+    def expired(self) -> bool:
+        """Has the deadline passed"""
+        return self.deadline > 0 and self.elapsed >= self.deadline
+
+    def next_delay(self) -> float:
+        """Returns the delay before the next attempt, never past the deadline"""
+        delay = min(self.maximum, self.initial * self.factor ** self.attempts)
+        self.attempts += 1
+        delay = delay * (0.5 + random() / 2)
+        if self.deadline > 0:
+            delay = min(delay, max(self.deadline - self.elapsed, 0))
+        return delay
+
+    async def wait(self, wake: Optional[Event] = None) -> bool:
+        """Waits until the next attempt should be made, or the supplied
+        event is set, whichever happens first. A set event is cleared.
+
+        :param wake: Optional event that ends the wait early when set
+        :return: T/F indicating if another attempt should be made,
+        false if the deadline had passed before waiting
+        """
+        if self.expired:
+            return False
+        delay = self.next_delay()
+        if wake is None:
+            await sleep(delay, loop=self.loop)
+        else:
+            try:
+                await wait_for(wake.wait(), delay, loop=self.loop)
+            except TimeoutError:
+                pass
+            wake.clear()
+        return True
+
+    def __str__(self) -> str:
+        info = f"initial={self.initial}, maximum={self.maximum}, deadline={self.deadline}"
+        return f"Backoff({info}, attempts={self.attempts}, elapsed={round(self.elapsed, 3)})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,240 @@
+"""Instrumentation of the CDP commands sent and events received by a tab"""
+from asyncio import AbstractEventLoop, Future, ensure_future
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Callable, Counter as CounterT, Dict, List, Optional
+
+from .helper import Helper
+from .stats import LatencyStats
+
+__all__ = [
+    "CDP_LATENCY_BUCKETS",
+    "CDPCommandMetrics",
+    "CDPInstrumentation",
+    "CDPMetrics",
+    "estimate_payload_size",
+]
+
+#: The upper bounds, in seconds, of the buckets of the command latency histograms
+CDP_LATENCY_BUCKETS: List[float] = [0.005, 0.01, 0.05, 0.1, 0.5, 1, 5]
+
+
+def estimate_payload_size(value: Any, depth: int = 2) -> int:
+    """Returns a cheap estimate of the number of bytes of the supplied CDP params or
+    result without serializing it.
+
+    Only the first depth levels are walked, the strings (e.g. base64 data, bodies)
+    found there are counted by their length and everything else, including
+    the containers below depth, counts as a single byte per item.
+
+    :param value: The params or result of a CDP command
+    :param depth: How many levels of nested containers are walked
+    :return: The estimated size of the value
+    """
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        if depth <= 0:
+            return len(value)
+        return sum(
+            len(key) + estimate_payload_size(item, depth - 1)
+            for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        if depth <= 0:
+            return len(value)
+        return sum(estimate_payload_size(item, depth - 1) for item in value)
+    return 1
+
+
+class CDPCommandMetrics:
+    """The count, errors, latency and estimated payload bytes of a CDP command (method)"""
+
+    __slots__ = ["buckets", "bytes_received", "bytes_sent", "errors", "latency"]
+
+    def __init__(self, method: str) -> None:
+        """Initialize the new CDPCommandMetrics instance
+
+        :param method: The name of the command
+        """
+        self.latency: LatencyStats = LatencyStats(method, max_samples=256)
+        self.buckets: List[int] = [0] * (len(CDP_LATENCY_BUCKETS) + 1)
+        self.errors: int = 0
+        self.bytes_sent: int = 0
+        self.bytes_received: int = 0
+
+    def record(self, latency: float, sent: int, received: int, error: bool) -> None:
+        """Records a sent command
+
+        :param latency: The number of seconds it took for the command to resolve
+        :param sent: The estimated number of bytes of the command's params
+        :param received: The estimated number of bytes of the command's result
+        :param error: Did the command fail
+        """
+        self.latency.add(latency)
+        self.buckets[bisect_left(CDP_LATENCY_BUCKETS, latency)] += 1
+        self.bytes_sent += sent
+        self.bytes_received += received
+        if error:
+            self.errors += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns the summary of the command's metrics"""
+        histogram = {
+            f"le_{bound}": count
+            for bound, count in zip(CDP_LATENCY_BUCKETS, self.buckets)
+            if count
+        }
+        if self.buckets[-1]:
+            histogram[f"gt_{CDP_LATENCY_BUCKETS[-1]}"] = self.buckets[-1]
+        return dict(
+            latency=self.latency.summary(),
+            histogram=histogram,
+            errors=self.errors,
+            sent=self.bytes_sent,
+            received=self.bytes_received,
+        )
+
+
+class CDPMetrics:
+    """The metrics of the CDP commands sent and events received, per command and
+    per event type, for a single scope (a tab or a page)"""
+
+    __slots__ = ["__weakref__", "commands", "events", "scope"]
+
+    def __init__(self, scope: str) -> None:
+        """Initialize the new CDPMetrics instance
+
+        :param scope: The name of what the metrics are for
+        """
+        self.scope: str = scope
+        self.commands: Dict[str, CDPCommandMetrics] = {}
+        self.events: CounterT[str] = Counter()
+
+    def record_command(
+        self, method: str, latency: float, sent: int, received: int, error: bool
+    ) -> None:
+        """Records a sent command
+
+        :param method: The name of the command
+        :param latency: The number of seconds it took for the command to resolve
+        :param sent: The estimated number of bytes of the command's params
+        :param received: The estimated number of bytes of the command's result
+        :param error: Did the command fail
+        """
+        command = self.commands.get(method)
+        if command is None:
+            command = self.commands[method] = CDPCommandMetrics(method)
+        command.record(latency, sent, received, error)
+
+    def reset(self) -> None:
+        """Clears the recorded metrics"""
+        self.commands.clear()
+        self.events.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns the summary of the recorded metrics, the commands ordered
+        by the total time spent waiting on them"""
+        ordered = sorted(
+            self.commands.items(), key=lambda item: item[1].latency.total, reverse=True
+        )
+        return dict(
+            scope=self.scope,
+            totals=dict(
+                commands=sum(command.latency.count for _, command in ordered),
+                errors=sum(command.errors for _, command in ordered),
+                time=round(sum(command.latency.total for _, command in ordered), 3),
+                sent=sum(command.bytes_sent for _, command in ordered),
+                received=sum(command.bytes_received for _, command in ordered),
+                events=sum(self.events.values()),
+            ),
+            commands={method: command.summary() for method, command in ordered},
+            events={str(event): count for event, count in self.events.most_common()},
+        )
+
+    def __str__(self) -> str:
+        return f"CDPMetrics(scope={self.scope}, commands={len(self.commands)}, events={sum(self.events.values())})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class CDPInstrumentation:
+    """Instruments the CDP clients of a tab, wrapping their send and emit, so that
+    every command sent and event received is recorded in both the tab's metrics and
+    the metrics of the page the tab is currently on.
+
+    Only clients that are instrumented pay for it, when disabled the tab's clients
+    are left untouched.
+    """
+
+    __slots__ = ["__weakref__", "loop", "page", "tab"]
+
+    def __init__(self, loop: Optional[AbstractEventLoop] = None) -> None:
+        """Initialize the new CDPInstrumentation instance
+
+        :param loop: The event loop used by the automation
+        """
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.tab: CDPMetrics = CDPMetrics("tab")
+        self.page: CDPMetrics = CDPMetrics("page")
+
+    def instrument(self, client: Any) -> None:
+        """Wraps the supplied client's send and emit methods recording
+        the commands it sends and the events it emits
+
+        :param client: The CDP client to be instrumented
+        """
+        client.send = self._wrap_send(client.send)
+        client.emit = self._wrap_emit(client.emit)
+
+    def end_page(self) -> Dict[str, Any]:
+        """Returns the summary of the current page's metrics and starts a new page
+
+        :return: The summary of the page's metrics
+        """
+        summary = self.page.summary()
+        self.page.reset()
+        return summary
+
+    def _wrap_send(self, send: Callable[..., Any]) -> Callable[..., Future]:
+        loop = self.loop
+        tab = self.tab
+        page = self.page
+
+        def instrumented_send(
+            method: str, params: Optional[Dict] = None, *args: Any, **kwargs: Any
+        ) -> Future:
+            start = loop.time()
+            sent = estimate_payload_size(params) if params else 0
+            future = ensure_future(send(method, params, *args, **kwargs), loop=loop)
+
+            def record(done: Future) -> None:
+                latency = loop.time() - start
+                error = done.cancelled() or done.exception() is not None
+                result = None if error else done.result()
+                received = estimate_payload_size(result) if result else 0
+                tab.record_command(method, latency, sent, received, error)
+                page.record_command(method, latency, sent, received, error)
+
+            future.add_done_callback(record)
+            return future
+
+        return instrumented_send
+
+    def _wrap_emit(self, emit: Callable[..., bool]) -> Callable[..., bool]:
+        tab_events = self.tab.events
+        page_events = self.page.events
+
+        def instrumented_emit(event: Any, *args: Any, **kwargs: Any) -> bool:
+            tab_events[event] += 1
+            page_events[event] += 1
+            return emit(event, *args, **kwargs)
+
+        return instrumented_emit
+
+    def __str__(self) -> str:
+        return f"CDPInstrumentation(tab={self.tab}, page={self.page})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
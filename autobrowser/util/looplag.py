@@ -0,0 +1,175 @@
+"""Measuring of the event loop's lag and reporting of what blocked it"""
+import sys
+import traceback
+from asyncio import AbstractEventLoop, CancelledError, Task, sleep
+from bisect import bisect_left
+from threading import Event as ThreadEvent, Thread, get_ident
+from time import monotonic
+from typing import List, Optional
+
+from .helper import Helper
+from .loggers import AutoLogger, create_autologger
+from .stats import LatencyStats
+
+__all__ = ["LAG_BUCKETS", "LoopLagMonitor"]
+
+#: The upper bounds, in seconds, of the buckets of the lag histogram
+LAG_BUCKETS: List[float] = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 5]
+
+
+class LoopLagMonitor:
+    """Measures the lag of the event loop, the difference between when a sleep was
+    scheduled to wake up and when it actually woke up, and reports it periodically
+    as a histogram.
+
+    A watchdog thread checks that the loop keeps waking up, if the loop has not woken
+    up within the threshold the stack of the loop's thread (what is blocking it) is
+    captured and logged along with the lag once the loop wakes up.
+
+    When the loop is healthy the cost is a single wake up per interval.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_blocked_stack",
+        "_heartbeat",
+        "_loop_thread_id",
+        "_stop_watchdog",
+        "_task",
+        "_watchdog",
+        "buckets",
+        "interval",
+        "logger",
+        "loop",
+        "num_blocked",
+        "report_interval",
+        "stats",
+        "threshold",
+    ]
+
+    def __init__(
+        self,
+        interval: float = 0.25,
+        threshold: float = 0.1,
+        report_interval: float = 60,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> None:
+        """Initialize the new LoopLagMonitor instance
+
+        :param interval: How often, in seconds, the lag is measured
+        :param threshold: The lag, in seconds, past which the blocking stack is captured
+        :param report_interval: How often, in seconds, the lag histogram is logged
+        :param loop: The event loop to be monitored
+        """
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.interval: float = interval
+        self.threshold: float = threshold
+        self.report_interval: float = report_interval
+        self.stats: LatencyStats = LatencyStats("loop_lag", max_samples=4096)
+        self.buckets: List[int] = [0] * (len(LAG_BUCKETS) + 1)
+        self.num_blocked: int = 0
+        self.logger: AutoLogger = create_autologger("loopLag", "LoopLagMonitor")
+        self._task: Optional[Task] = None
+        self._watchdog: Optional[Thread] = None
+        self._stop_watchdog: ThreadEvent = ThreadEvent()
+        self._heartbeat: float = monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._blocked_stack: Optional[str] = None
+
+    def start(self) -> None:
+        """Starts monitoring the loop, must be called from the loop's thread"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = get_ident()
+        self._heartbeat = monotonic()
+        self._stop_watchdog.clear()
+        self._task = self.loop.create_task(self._measure_loop())
+        self._watchdog = Thread(
+            target=self._watch, name="autobrowser-loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stops monitoring the loop and logs the final report"""
+        if self._task is None:
+            return
+        self._stop_watchdog.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except CancelledError:
+            pass
+        self._task = None
+        self._watchdog = None
+        self.report()
+
+    def record(self, lag: float) -> None:
+        """Records a lag measurement
+
+        :param lag: The lag in seconds
+        """
+        self.stats.add(lag)
+        self.buckets[bisect_left(LAG_BUCKETS, lag)] += 1
+
+    def report(self) -> None:
+        """Logs the lag histogram and summary"""
+        histogram = {
+            f"le_{bound}": count for bound, count in zip(LAG_BUCKETS, self.buckets)
+        }
+        histogram[f"gt_{LAG_BUCKETS[-1]}"] = self.buckets[-1]
+        self.logger.info(
+            "report",
+            Helper.json_string(
+                histogram=histogram,
+                summary=self.stats.summary(),
+                blocked=self.num_blocked,
+            ),
+        )
+
+    async def _measure_loop(self) -> None:
+        loop_time = self.loop.time
+        interval = self.interval
+        last_report = loop_time()
+        while 1:
+            expected = loop_time() + interval
+            await sleep(interval, loop=self.loop)
+            now = loop_time()
+            self._heartbeat = monotonic()
+            lag = max(now - expected, 0)
+            self.record(lag)
+            if lag >= self.threshold:
+                self._report_blocked(lag)
+            if now - last_report >= self.report_interval:
+                last_report = now
+                self.report()
+
+    def _report_blocked(self, lag: float) -> None:
+        stack = self._blocked_stack
+        self._blocked_stack = None
+        self.num_blocked += 1
+        self.logger.warning(
+            "blocked",
+            Helper.json_string(lag=round(lag, 4), stack=stack),
+        )
+
+    def _watch(self) -> None:
+        """Runs in the watchdog thread capturing the stack of the loop's thread
+        once per stall when the loop has not woken up within the threshold"""
+        deadline = self.interval + self.threshold
+        check_every = max(self.threshold / 2, 0.01)
+        captured_for = None
+        while not self._stop_watchdog.wait(check_every):
+            heartbeat = self._heartbeat
+            if monotonic() - heartbeat < deadline or captured_for == heartbeat:
+                continue
+            captured_for = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._blocked_stack = "".join(traceback.format_stack(frame))
+
+    def __str__(self) -> str:
+        info = f"interval={self.interval}, threshold={self.threshold}, blocked={self.num_blocked}"
+        return f"LoopLagMonitor({info}, summary={self.stats.summary()})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,105 @@
+"""Sampling of a tab's renderer metrics to detect renderers that have bloated"""
+from typing import Dict, Optional, TYPE_CHECKING, Tuple
+
+from .helper import Helper
+from .loggers import AutoLogger, create_autologger
+
+if TYPE_CHECKING:
+    from cripy import Client
+
+__all__ = ["RendererMemoryWatchdog"]
+
+
+class RendererMemoryWatchdog:
+    """Samples the renderer metrics of a tab (Performance.getMetrics), between pages,
+    and determines if the renderer has bloated past the configured thresholds.
+
+    Thresholds:
+      - JSHeapUsedSize: the size of the used JS heap in bytes
+      - Nodes: the number of DOM nodes, including detached (leaked) nodes
+      - Documents: the number of documents, including detached (leaked) documents
+
+    A threshold of 0 disables it.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "client",
+        "last_metrics",
+        "logger",
+        "num_samples",
+        "thresholds",
+    ]
+
+    def __init__(
+        self,
+        client: "Client",
+        max_js_heap: int = 0,
+        max_nodes: int = 0,
+        max_documents: int = 0,
+    ) -> None:
+        """Initialize the new RendererMemoryWatchdog instance
+
+        :param client: The CDP client connected to the tab
+        :param max_js_heap: The maximum size of the used JS heap in bytes
+        :param max_nodes: The maximum number of DOM nodes
+        :param max_documents: The maximum number of documents
+        """
+        self.client: "Client" = client
+        self.thresholds: Dict[str, int] = {
+            name: value
+            for name, value in (
+                ("JSHeapUsedSize", max_js_heap),
+                ("Nodes", max_nodes),
+                ("Documents", max_documents),
+            )
+            if value > 0
+        }
+        self.last_metrics: Dict[str, float] = {}
+        self.num_samples: int = 0
+        self.logger: AutoLogger = create_autologger(
+            "memoryWatchdog", "RendererMemoryWatchdog"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Is any threshold configured"""
+        return len(self.thresholds) > 0
+
+    async def start(self) -> None:
+        """Enables the collection of the renderer metrics"""
+        if self.enabled:
+            await self.client.send("Performance.enable", {})
+
+    async def exceeded(self) -> Optional[Tuple[str, float, int]]:
+        """Samples the renderer metrics and returns the first exceeded threshold
+
+        :return: The name of the metric, its value and threshold or None if
+        no threshold was exceeded
+        """
+        if not self.enabled:
+            return None
+        try:
+            result = await self.client.send("Performance.getMetrics", {})
+        except Exception as e:
+            self.logger.exception(
+                "exceeded", "retrieving the renderer metrics failed", exc_info=e
+            )
+            return None
+        self.num_samples += 1
+        metrics = {
+            metric["name"]: metric["value"] for metric in result.get("metrics", [])
+        }
+        self.last_metrics = {name: metrics.get(name, 0) for name in self.thresholds}
+        self.logger.debug("exceeded", Helper.json_string(self.last_metrics))
+        for name, threshold in self.thresholds.items():
+            value = metrics.get(name, 0)
+            if value > threshold:
+                return name, value, threshold
+        return None
+
+    def __str__(self) -> str:
+        return f"RendererMemoryWatchdog(thresholds={self.thresholds}, last_metrics={self.last_metrics})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
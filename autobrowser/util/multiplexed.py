@@ -0,0 +1,356 @@
+"""A single browser level CDP connection multiplexing the flattened sessions of many targets"""
+from asyncio import AbstractEventLoop, CancelledError, Future, Task
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from aiohttp import ClientSession, ClientWebSocketResponse, WSMsgType
+from cripy import Client
+from pyee2 import EventEmitterS
+from ujson import dumps, loads
+
+from autobrowser.errors import CDPError
+from .helper import Helper
+from .loggers import AutoLogger, create_autologger
+
+__all__ = ["MultiplexedConnection", "SessionClient"]
+
+#: The names of the params of the commands that the tabs supply as positional arguments,
+#: the params of any other command must be supplied as keyword arguments
+POSITIONAL_PARAMS: Dict[str, List[str]] = {
+    "Network.setCacheDisabled": ["cacheDisabled"],
+    "Network.setCookies": ["cookies"],
+    "Network.setExtraHTTPHeaders": ["headers"],
+    "Network.setUserAgentOverride": ["userAgent"],
+    "Page.addScriptToEvaluateOnNewDocument": ["source"],
+    "Page.captureSnapshot": ["format"],
+    "Page.handleJavaScriptDialog": ["accept"],
+    "Page.navigate": ["url"],
+    "Page.setLifecycleEventsEnabled": ["enabled"],
+    "Runtime.callFunctionOn": ["functionDeclaration"],
+    "Runtime.evaluate": ["expression"],
+}
+
+
+class _Domain:
+    """Provides the client.Domain.method(...) style of calling commands and
+    client.Domain.event(listener) style of registering event listeners for
+    a SessionClient, matching the cripy client"""
+
+    __slots__ = ["_client", "_name"]
+
+    def __init__(self, client: "SessionClient", name: str) -> None:
+        self._client: "SessionClient" = client
+        self._name: str = name
+
+    def __getattr__(self, item: str) -> Callable[..., Any]:
+        method = f"{self._name}.{item}"
+        client = self._client
+
+        def domain_method(*args: Any, **kwargs: Any) -> Any:
+            if len(args) == 1 and not kwargs and callable(args[0]):
+                client.on(method, args[0])
+                return None
+            params = {key: val for key, val in kwargs.items() if val is not None}
+            if args:
+                names = POSITIONAL_PARAMS.get(method, [])
+                if len(args) > len(names):
+                    raise TypeError(
+                        f"{method} takes {len(names)} positional arguments but "
+                        f"{len(args)} were given, supply its params as keyword arguments"
+                    )
+                params.update(zip(names, args))
+            return client.send(method, params)
+
+        return domain_method
+
+
+class SessionClient(EventEmitterS):
+    """A CDP client for a single target that sends its commands and receives its events
+    over the flattened session the MultiplexedConnection attached to the target.
+
+    Supports the subset of the cripy client's interface used by the tabs.
+    """
+
+    def __init__(
+        self,
+        connection: "MultiplexedConnection",
+        session_id: str,
+        target_id: str,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> None:
+        super().__init__(loop=Helper.ensure_loop(loop))
+        self.connection: "MultiplexedConnection" = connection
+        self.session_id: str = session_id
+        self.target_id: str = target_id
+        self._closed: bool = False
+        self._domains: Dict[str, _Domain] = {}
+
+    @property
+    def closed(self) -> bool:
+        """Is the session closed"""
+        return self._closed
+
+    def send(self, method: str, params: Optional[Dict] = None) -> Future:
+        """Sends the supplied command to the target
+
+        :param method: The name of the command
+        :param params: The params of the command
+        :return: A future resolving with the result of the command
+        """
+        return self.connection.send(method, params, session_id=self.session_id)
+
+    async def dispose(self) -> None:
+        """Detaches from the target, the target itself is not closed"""
+        if self._closed:
+            return
+        await self.connection.detach(self)
+
+    def _on_detached(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.emit(Client.Events.Disconnected)
+
+    def __getattr__(self, item: str) -> _Domain:
+        if not item[0].isupper():
+            raise AttributeError(item)
+        domain = self._domains.get(item)
+        if domain is None:
+            domain = self._domains[item] = _Domain(self, item)
+        return domain
+
+    def __str__(self) -> str:
+        return f"SessionClient(target_id={self.target_id}, session_id={self.session_id}, closed={self._closed})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class MultiplexedConnection:
+    """A single websocket connection to the browser over which every tab's target
+    is controlled using flattened sessions (Target.attachToTarget with flatten).
+
+    Responses are routed to the sent command by message id and events are routed
+    to the session they are for by session id.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_next_id",
+        "_pending",
+        "_reader",
+        "_sessions",
+        "_ws",
+        "logger",
+        "loop",
+        "num_events",
+        "num_messages",
+        "session",
+        "ws_url",
+    ]
+
+    def __init__(
+        self,
+        ws_url: str,
+        session: ClientSession,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> None:
+        """Initialize the new MultiplexedConnection instance
+
+        :param ws_url: The browser's websocket debugger URL
+        :param session: The HTTP session used to make the websocket connection
+        :param loop: The event loop used by the automation
+        """
+        self.ws_url: str = ws_url
+        self.session: ClientSession = session
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.num_messages: int = 0
+        self.num_events: int = 0
+        self.logger: AutoLogger = create_autologger(
+            "multiplexedConnection", "MultiplexedConnection"
+        )
+        self._ws: Optional[ClientWebSocketResponse] = None
+        self._reader: Optional[Task] = None
+        self._next_id: int = 0
+        self._pending: Dict[int, Future] = {}
+        self._sessions: Dict[str, SessionClient] = {}
+
+    @staticmethod
+    async def browser_ws_url(session: ClientSession, tab_ws_url: str) -> str:
+        """Returns the browser's websocket debugger URL, retrieved from the
+        /json/version endpoint of the browser the supplied tab websocket URL is for
+
+        :param session: The HTTP session used to make the request
+        :param tab_ws_url: The websocket debugger URL of a tab of the browser
+        :return: The browser's websocket debugger URL
+        """
+        split = urlsplit(tab_ws_url)
+        scheme = "https" if split.scheme == "wss" else "http"
+        async with session.get(f"{scheme}://{split.netloc}/json/version") as resp:
+            version = await resp.json(content_type=None)
+        return version["webSocketDebuggerUrl"]
+
+    @property
+    def connected(self) -> bool:
+        """Is the connection to the browser open"""
+        return self._ws is not None and not self._ws.closed
+
+    async def connect(self) -> None:
+        """Connects to the browser"""
+        if self.connected:
+            return
+        start = self.loop.time()
+        self._ws = await self.session.ws_connect(
+            self.ws_url, max_msg_size=0, autoping=True
+        )
+        self._reader = self.loop.create_task(self._read_loop())
+        self.logger.info(
+            "connect",
+            Helper.json_string(
+                url=self.ws_url, time=round(self.loop.time() - start, 3)
+            ),
+        )
+
+    async def attach(self, target_id: str) -> SessionClient:
+        """Attaches to the supplied target using a flattened session
+
+        :param target_id: The id of the target to attach to
+        :return: The client for the target's session
+        """
+        result = await self.send(
+            "Target.attachToTarget", {"targetId": target_id, "flatten": True}
+        )
+        session_id = result["sessionId"]
+        client = SessionClient(self, session_id, target_id, loop=self.loop)
+        self._sessions[session_id] = client
+        return client
+
+    async def detach(self, client: SessionClient) -> None:
+        """Detaches the supplied client's session from its target
+
+        :param client: The client to be detached
+        """
+        self._sessions.pop(client.session_id, None)
+        client._on_detached()
+        if not self.connected:
+            return
+        try:
+            await self.send(
+                "Target.detachFromTarget", {"sessionId": client.session_id}
+            )
+        except Exception as e:
+            self.logger.debug("detach", f"detaching from the target failed - {e}")
+
+    def send(
+        self,
+        method: str,
+        params: Optional[Dict] = None,
+        session_id: Optional[str] = None,
+    ) -> Future:
+        """Sends the supplied command to the browser, or to the target of the
+        supplied session
+
+        :param method: The name of the command
+        :param params: The params of the command
+        :param session_id: Optional id of the session the command is for
+        :return: A future resolving with the result of the command
+        """
+        future = self.loop.create_future()
+        if not self.connected:
+            future.set_exception(
+                CDPError(f"{method} failed, the connection is closed")
+            )
+            return future
+        self._next_id += 1
+        msg_id = self._next_id
+        msg: Dict[str, Any] = {"id": msg_id, "method": method, "params": params or {}}
+        if session_id is not None:
+            msg["sessionId"] = session_id
+        self._pending[msg_id] = future
+        sending = self.loop.create_task(self._ws.send_str(dumps(msg)))
+        sending.add_done_callback(partial(self._on_sent, msg_id, method))
+        return future
+
+    async def close(self) -> None:
+        """Closes the connection to the browser, every session is detached"""
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            try:
+                await self._reader
+            except CancelledError:
+                pass
+            self._reader = None
+        self._ws = None
+        self.logger.info("close", f"closed - {self}")
+
+    async def _read_loop(self) -> None:
+        """Reads the messages sent by the browser routing them until the connection is closed"""
+        pending = self._pending
+        sessions = self._sessions
+        try:
+            async for message in self._ws:
+                if message.type != WSMsgType.TEXT:
+                    if message.type in (WSMsgType.CLOSED, WSMsgType.ERROR):
+                        break
+                    continue
+                self.num_messages += 1
+                data = loads(message.data)
+                msg_id = data.get("id")
+                if msg_id is not None:
+                    future = pending.pop(msg_id, None)
+                    if future is None or future.done():
+                        continue
+                    error = data.get("error")
+                    if error is not None:
+                        message = f"{error.get('message')} - {error.get('data', '')}"
+                        future.set_exception(CDPError(message))
+                    else:
+                        future.set_result(data.get("result", {}))
+                    continue
+                self.num_events += 1
+                method = data.get("method")
+                session_id = data.get("sessionId")
+                if session_id is not None:
+                    client = sessions.get(session_id)
+                    if client is not None:
+                        client.emit(method, data.get("params", {}))
+                elif method == "Target.detachedFromTarget":
+                    client = sessions.pop(data["params"]["sessionId"], None)
+                    if client is not None:
+                        client._on_detached()
+        finally:
+            self._connection_closed()
+
+    def _on_sent(self, msg_id: int, method: str, sending: Task) -> None:
+        """Fails the pending command if sending it failed, otherwise
+        it would never be resolved"""
+        if sending.cancelled():
+            error = CDPError(f"{method} failed, sending it was cancelled")
+        else:
+            exception = sending.exception()
+            if exception is None:
+                return
+            error = CDPError(f"{method} failed, sending it failed - {exception}")
+        future = self._pending.pop(msg_id, None)
+        if future is not None and not future.done():
+            future.set_exception(error)
+
+    def _connection_closed(self) -> None:
+        """Fails every pending command and detaches every session"""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(CDPError("the connection was closed"))
+        self._pending.clear()
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for client in sessions:
+            client._on_detached()
+
+    def __str__(self) -> str:
+        info = f"sessions={len(self._sessions)}, messages={self.num_messages}, events={self.num_events}"
+        return f"MultiplexedConnection(url={self.ws_url}, {info})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
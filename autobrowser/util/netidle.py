@@ -0,0 +1,227 @@
+"""Always-on tracking of a tab's in-flight network requests and network idle detection"""
+from asyncio import AbstractEventLoop, Event, TimeoutError
+from typing import Dict, Optional, Set, TYPE_CHECKING, Union
+
+from async_timeout import timeout as aio_timeout
+
+from .helper import Helper
+
+if TYPE_CHECKING:
+    from cripy import Client
+
+__all__ = ["LONG_LIVED_MIME_TYPES", "LONG_LIVED_RESOURCE_TYPES", "RequestTracker"]
+
+#: Resource types (Network.ResourceType) whose requests are expected to stay
+#: open for the lifetime of the page and therefore never count towards idle
+LONG_LIVED_RESOURCE_TYPES: Set[str] = {"WebSocket", "EventSource", "Ping"}
+#: Response mime types that indicate a streaming (long-lived) response
+LONG_LIVED_MIME_TYPES: Set[str] = {"text/event-stream", "multipart/x-mixed-replace"}
+
+
+class RequestTracker:
+    """Tracks the in-flight requests of a tab using the events of the
+    Network domain (enabled by every tab) and provides network idle detection
+    on top of the tracked requests.
+
+    Requests considered long-lived (websockets, event streams, beacons and
+    requests in-flight longer than `long_lived_time`, e.g. long-polling) are
+    not counted towards the number of in-flight requests when determining idle.
+
+    The idle window used by `wait_for_idle` adapts to the page's observed request
+    cadence: it is twice the exponentially weighted average of the time between
+    the page's requests, bounded by the minimum idle time and the requested idle time.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_activity",
+        "_avg_gap",
+        "_last_activity",
+        "_last_request_start",
+        "_long_lived",
+        "client",
+        "inflight",
+        "long_lived_time",
+        "loop",
+        "min_idle_time",
+        "num_failed",
+        "num_finished",
+        "num_requests",
+    ]
+
+    def __init__(
+        self,
+        client: "Client",
+        loop: Optional[AbstractEventLoop] = None,
+        min_idle_time: Union[int, float] = 0.5,
+        long_lived_time: Union[int, float] = 10,
+    ) -> None:
+        """Initialize the new RequestTracker instance
+
+        :param client: The CDP client connected to the tab
+        :param loop: The event loop used by the automation
+        :param min_idle_time: The smallest idle window (in seconds) the adaptive idle window can shrink to
+        :param long_lived_time: How long (in seconds) a request can be in-flight
+        before it is considered long-lived
+        """
+        self.client: "Client" = client
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.min_idle_time: Union[int, float] = min_idle_time
+        self.long_lived_time: Union[int, float] = long_lived_time
+        #: request id -> the loop time the request was sent
+        self.inflight: Dict[str, float] = {}
+        self.num_requests: int = 0
+        self.num_finished: int = 0
+        self.num_failed: int = 0
+        self._long_lived: Set[str] = set()
+        self._activity: Event = Event(loop=self.loop)
+        self._avg_gap: Optional[float] = None
+        self._last_activity: float = self.loop.time()
+        self._last_request_start: Optional[float] = None
+
+    def start(self) -> None:
+        """Registers the Network domain event listeners used to track requests"""
+        network = self.client.Network
+        network.requestWillBeSent(self._on_request_will_be_sent)
+        network.responseReceived(self._on_response_received)
+        network.loadingFinished(self._on_loading_finished)
+        network.loadingFailed(self._on_loading_failed)
+        network.webSocketCreated(self._on_websocket_created)
+
+    def reset(self) -> None:
+        """Forgets all tracked requests and the observed request cadence.
+        Should be called before the tab navigates to a new page.
+        """
+        self.inflight.clear()
+        self._long_lived.clear()
+        self._avg_gap = None
+        self._last_request_start = None
+        self._note_activity()
+
+    def num_inflight(self) -> int:
+        """Returns the number of in-flight requests that are not long-lived"""
+        now = self.loop.time()
+        long_lived_time = self.long_lived_time
+        return sum(
+            1 for started in self.inflight.values() if now - started < long_lived_time
+        )
+
+    def idle_window(self, max_idle_time: Union[int, float]) -> float:
+        """Returns the amount of time the network must be quiet in order to be considered idle
+
+        :param max_idle_time: The upper bound of the idle window
+        :return: The idle window adapted to the page's observed request cadence
+        """
+        if self._avg_gap is None:
+            return max_idle_time
+        return max(self.min_idle_time, min(max_idle_time, 2 * self._avg_gap))
+
+    async def wait_for_idle(
+        self,
+        num_inflight: int = 2,
+        idle_time: Union[int, float] = 2,
+        global_wait: Union[int, float] = 60,
+    ) -> bool:
+        """Waits for network idle: no more than num_inflight (non long-lived) requests
+        in-flight for the adaptive idle window.
+
+        :param num_inflight: The maximum number of in-flight requests allowed for idle
+        :param idle_time: The maximum amount of time the network must be quiet for
+        :param global_wait: The maximum amount of time to wait for idle
+        :return: T/F indicating if network idle was reached before global_wait elapsed
+        """
+        loop = self.loop
+        deadline = loop.time() + global_wait
+        while 1:
+            now = loop.time()
+            if now >= deadline:
+                return False
+            window = self.idle_window(idle_time)
+            if self.num_inflight() <= num_inflight:
+                quiet_for = now - self._last_activity
+                if quiet_for >= window:
+                    return True
+                wake_in = window - quiet_for
+            else:
+                # an in-flight request may become long-lived before any activity happens
+                long_lived_time = self.long_lived_time
+                oldest = min(
+                    (
+                        started
+                        for started in self.inflight.values()
+                        if now - started < long_lived_time
+                    ),
+                    default=None,
+                )
+                wake_in = (
+                    window
+                    if oldest is None
+                    else max(oldest + long_lived_time - now, 0.05)
+                )
+            self._activity.clear()
+            try:
+                async with aio_timeout(min(wake_in, deadline - now), loop=loop):
+                    await self._activity.wait()
+            except TimeoutError:
+                pass
+
+    def _note_activity(self) -> None:
+        self._last_activity = self.loop.time()
+        self._activity.set()
+
+    def _mark_long_lived(self, request_id: str) -> None:
+        self._long_lived.add(request_id)
+        if self.inflight.pop(request_id, None) is not None:
+            self._note_activity()
+
+    def _on_request_will_be_sent(self, info: Dict) -> None:
+        request_id = info["requestId"]
+        if request_id in self._long_lived:
+            return
+        if info.get("type") in LONG_LIVED_RESOURCE_TYPES:
+            self._long_lived.add(request_id)
+            return
+        # redirects re-use the request id of the original request
+        if request_id not in self.inflight:
+            self.num_requests += 1
+        now = self.loop.time()
+        if self._last_request_start is not None:
+            gap = now - self._last_request_start
+            self._avg_gap = (
+                gap if self._avg_gap is None else 0.8 * self._avg_gap + 0.2 * gap
+            )
+        self._last_request_start = now
+        self.inflight[request_id] = now
+        self._note_activity()
+
+    def _on_response_received(self, info: Dict) -> None:
+        if info.get("type") in LONG_LIVED_RESOURCE_TYPES:
+            self._mark_long_lived(info["requestId"])
+            return
+        mime = info.get("response", {}).get("mimeType", "")
+        if mime in LONG_LIVED_MIME_TYPES:
+            self._mark_long_lived(info["requestId"])
+
+    def _on_loading_finished(self, info: Dict) -> None:
+        request_id = info["requestId"]
+        self._long_lived.discard(request_id)
+        if self.inflight.pop(request_id, None) is not None:
+            self.num_finished += 1
+            self._note_activity()
+
+    def _on_loading_failed(self, info: Dict) -> None:
+        request_id = info["requestId"]
+        self._long_lived.discard(request_id)
+        if self.inflight.pop(request_id, None) is not None:
+            self.num_failed += 1
+            self._note_activity()
+
+    def _on_websocket_created(self, info: Dict) -> None:
+        self._mark_long_lived(info["requestId"])
+
+    def __str__(self) -> str:
+        info = f"inflight={len(self.inflight)}, long_lived={len(self._long_lived)}, avg_gap={self._avg_gap}"
+        return f"RequestTracker({info}, finished={self.num_finished}, failed={self.num_failed})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,147 @@
+"""Perceptual (difference) hashing of small PNG images without any imaging dependencies"""
+import struct
+import zlib
+from typing import List, Tuple
+
+__all__ = ["dhash_png", "hamming_distance"]
+
+PNG_SIGNATURE: bytes = b"\x89PNG\r\n\x1a\n"
+
+#: The number of channels for the supported PNG color types (8 bit depth only)
+PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+
+def hamming_distance(hash1: int, hash2: int) -> int:
+    """Returns the number of bits that differ between the two supplied hashes"""
+    return bin(hash1 ^ hash2).count("1")
+
+
+def dhash_png(data: bytes, hash_size: int = 8) -> int:
+    """Computes the difference hash (dHash) of the supplied PNG image.
+
+    The image is reduced to a grayscale image of (hash_size + 1) x hash_size pixels
+    and each bit of the hash indicates if a pixel is brighter than its right neighbor.
+    Visually similar images have hashes that differ in only a few bits.
+
+    Only non-interlaced 8 bit PNGs are supported (what the browser produces) and as every
+    pixel is visited in Python the image is expected to be small.
+
+    :param data: The bytes of the PNG image
+    :param hash_size: The size of the hash, the hash has hash_size * hash_size bits
+    :return: The hash
+    """
+    width, height, gray = _decode_png_grayscale(data)
+    cols = hash_size + 1
+    rows = hash_size
+    cells = _downsample(gray, width, height, cols, rows)
+    value = 0
+    for row in range(rows):
+        offset = row * cols
+        for col in range(hash_size):
+            value = (value << 1) | (cells[offset + col] > cells[offset + col + 1])
+    return value
+
+
+def _downsample(
+    gray: List[int], width: int, height: int, cols: int, rows: int
+) -> List[float]:
+    """Reduces the supplied grayscale image to cols x rows cells by averaging
+    the pixels each cell covers
+    """
+    sums = [0.0] * (cols * rows)
+    counts = [0] * (cols * rows)
+    col_of = [min(x * cols // width, cols - 1) for x in range(width)]
+    for y in range(height):
+        row_offset = min(y * rows // height, rows - 1) * cols
+        line = y * width
+        for x in range(width):
+            cell = row_offset + col_of[x]
+            sums[cell] += gray[line + x]
+            counts[cell] += 1
+    return [total / count if count else 0.0 for total, count in zip(sums, counts)]
+
+
+def _decode_png_grayscale(data: bytes) -> Tuple[int, int, List[int]]:
+    """Decodes the supplied PNG image into a list of grayscale pixel values
+
+    :return: The width and height of the image and its grayscale pixels (row major)
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG image")
+    pos = len(PNG_SIGNATURE)
+    width = height = color_type = -1
+    idat = bytearray()
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        chunk_type = data[pos + 4 : pos + 8]
+        chunk = data[pos + 8 : pos + 8 + length]
+        pos += length + 12
+        if chunk_type == b"IHDR":
+            width, height, bit_depth, color_type, _, _, interlace = struct.unpack(
+                ">IIBBBBB", chunk
+            )
+            if bit_depth != 8 or interlace != 0 or color_type not in PNG_CHANNELS:
+                raise ValueError(
+                    f"Unsupported PNG <bit_depth={bit_depth}, color_type={color_type}, interlace={interlace}>"
+                )
+        elif chunk_type == b"IDAT":
+            idat.extend(chunk)
+        elif chunk_type == b"IEND":
+            break
+    if width <= 0 or height <= 0:
+        raise ValueError("PNG image is missing its header")
+    channels = PNG_CHANNELS[color_type]
+    raw = zlib.decompress(bytes(idat))
+    stride = width * channels
+    gray: List[int] = []
+    prev = bytearray(stride)
+    pos = 0
+    for _ in range(height):
+        filter_type = raw[pos]
+        line = bytearray(raw[pos + 1 : pos + 1 + stride])
+        pos += stride + 1
+        _unfilter(filter_type, line, prev, channels)
+        if channels >= 3:
+            for x in range(0, stride, channels):
+                gray.append(
+                    (299 * line[x] + 587 * line[x + 1] + 114 * line[x + 2]) // 1000
+                )
+        else:
+            gray.extend(line[0::channels])
+        prev = line
+    return width, height, gray
+
+
+def _unfilter(filter_type: int, line: bytearray, prev: bytearray, bpp: int) -> None:
+    """Reverses the PNG filter applied to the supplied scanline, in place"""
+    if filter_type == 0:
+        return
+    length = len(line)
+    if filter_type == 1:
+        for i in range(bpp, length):
+            line[i] = (line[i] + line[i - bpp]) & 0xFF
+    elif filter_type == 2:
+        for i in range(length):
+            line[i] = (line[i] + prev[i]) & 0xFF
+    elif filter_type == 3:
+        for i in range(length):
+            left = line[i - bpp] if i >= bpp else 0
+            line[i] = (line[i] + ((left + prev[i]) >> 1)) & 0xFF
+    elif filter_type == 4:
+        for i in range(length):
+            left = line[i - bpp] if i >= bpp else 0
+            up = prev[i]
+            up_left = prev[i - bpp] if i >= bpp else 0
+            p = left + up - up_left
+            pa = abs(p - left)
+            pb = abs(p - up)
+            pc = abs(p - up_left)
+            if pa <= pb and pa <= pc:
+                predictor = left
+            elif pb <= pc:
+                predictor = up
+            else:
+                predictor = up_left
+            line[i] = (line[i] + predictor) & 0xFF
+    else:
+        raise ValueError(f"Unknown PNG filter type {filter_type}")
@@ -0,0 +1,93 @@
+"""A low overhead statistical (sampling) profiler producing collapsed stacks"""
+import sys
+from collections import Counter
+from threading import get_ident
+from time import monotonic, sleep
+from typing import Counter as CounterT, List, Optional
+
+__all__ = ["SamplingProfiler"]
+
+
+class SamplingProfiler:
+    """Periodically samples the stack of a thread, by default the thread that created the
+    profiler (the event loop's thread), from a separate thread and counts how many times
+    each stack was seen.
+
+    The counts are output in the collapsed stack format (frames separated by ; followed by
+    the count) that flame graph tools (flamegraph.pl, speedscope, inferno) read.
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "counts",
+        "interval",
+        "num_samples",
+        "thread_id",
+    ]
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None) -> None:
+        """Initialize the new SamplingProfiler instance
+
+        :param interval: The number of seconds between samples
+        :param thread_id: Optional id of the thread to be sampled,
+        defaults to the current thread
+        """
+        self.interval: float = interval
+        self.thread_id: int = thread_id if thread_id is not None else get_ident()
+        self.counts: CounterT[str] = Counter()
+        self.num_samples: int = 0
+
+    def run(self, duration: float) -> int:
+        """Samples the thread's stack for the supplied number of seconds.
+        Blocks, must be run in a thread other than the sampled thread.
+
+        :param duration: The number of seconds to sample for
+        :return: The number of samples taken
+        """
+        interval = self.interval
+        thread_id = self.thread_id
+        counts = self.counts
+        current_frames = sys._current_frames
+        end = monotonic() + duration
+        while monotonic() < end:
+            frame = current_frames().get(thread_id)
+            if frame is not None:
+                counts[self._collapse(frame)] += 1
+                self.num_samples += 1
+            del frame
+            sleep(interval)
+        return self.num_samples
+
+    def collapsed(self) -> List[str]:
+        """Returns the sampled stacks in the collapsed stack format, most seen first"""
+        return [f"{stack} {count}" for stack, count in self.counts.most_common()]
+
+    def write(self, path: str) -> None:
+        """Writes the sampled stacks, in the collapsed stack format, to the supplied file
+
+        :param path: The path to the file
+        """
+        with open(path, "w") as out:
+            for line in self.collapsed():
+                out.write(line)
+                out.write("\n")
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(
+                f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})".replace(
+                    ";", ":"
+                )
+            )
+            frame = frame.f_back
+        frames.reverse()
+        return ";".join(frames)
+
+    def __str__(self) -> str:
+        return f"SamplingProfiler(interval={self.interval}, samples={self.num_samples}, stacks={len(self.counts)})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,175 @@
+"""Chunked (streamed) JSON serialization to disk with optional gzip compression"""
+import zlib
+from typing import Any, Dict, List, Optional
+
+import aiofiles
+from ujson import dumps
+
+__all__ = ["ChunkedJSONWriter"]
+
+#: The maximum number of consecutive scalar list items serialized together
+SCALAR_RUN: int = 4096
+
+_NO_VALUE = object()
+
+
+class ChunkedJSONWriter:
+    """Serializes large JSON objects to a file in chunks, optionally gzip compressing them.
+
+    Nested dictionaries and lists are walked, not serialized whole, and their entries are
+    released once serialized. At most one chunk of the serialized form is held in memory
+    alongside the (shrinking) object being serialized.
+
+    Usage:
+      async with ChunkedJSONWriter(path, compress=True) as writer:
+          await writer.write_object(obj)
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_buffer",
+        "_compressor",
+        "_file",
+        "chunk_size",
+        "compress",
+        "path",
+        "raw_bytes",
+        "written_bytes",
+    ]
+
+    def __init__(
+        self, path: str, compress: bool = False, chunk_size: int = 65536
+    ) -> None:
+        """Initialize the new ChunkedJSONWriter instance
+
+        :param path: The path to the file the JSON is written to
+        :param compress: Should the JSON be gzip compressed
+        :param chunk_size: How many bytes of JSON are buffered before being written
+        """
+        self.path: str = path
+        self.compress: bool = compress
+        self.chunk_size: int = chunk_size
+        self.raw_bytes: int = 0
+        self.written_bytes: int = 0
+        self._buffer: bytearray = bytearray()
+        self._compressor: Optional[Any] = (
+            zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        )
+        self._file: Optional[Any] = None
+
+    async def write_object(self, obj: Dict[str, Any]) -> None:
+        """Serializes the supplied dictionary, removing the entries of it and of
+        the dictionaries and lists nested in it as they are serialized
+
+        :param obj: The dictionary to be serialized
+        """
+        await self._write_value(obj)
+
+    async def _write_value(self, root: Any) -> None:
+        """Serializes the supplied value walking the dictionaries and lists nested
+        in it using an explicit stack, so that arbitrarily deep trees (DOM nodes' children)
+        are serialized without recursion, flushing every chunk size bytes.
+
+        Runs of scalar list items are serialized together, up to SCALAR_RUN items at a time.
+
+        :param root: The value to be serialized
+        """
+        buffer = self._buffer
+        chunk_size = self.chunk_size
+        encode = self._encode
+        # each frame is [container, next key index or list index, keys, needs comma]
+        stack: List[List[Any]] = []
+        value = root
+        while 1:
+            if isinstance(value, dict):
+                self._append(b"{")
+                stack.append([value, 0, list(value.keys()), False])
+            elif isinstance(value, list):
+                self._append(b"[")
+                stack.append([value, 0, None, False])
+            else:
+                self._append(encode(value))
+            value = _NO_VALUE
+            while stack and value is _NO_VALUE:
+                frame = stack[-1]
+                container, idx, keys, needs_comma = frame
+                if keys is not None:
+                    if idx == len(keys):
+                        stack.pop()
+                        self._append(b"}")
+                        continue
+                    key = keys[idx]
+                    frame[1] = idx + 1
+                    if needs_comma:
+                        self._append(b",")
+                    self._append(encode(key))
+                    self._append(b":")
+                    value = container.pop(key)
+                else:
+                    num_items = len(container)
+                    if idx == num_items:
+                        stack.pop()
+                        container.clear()
+                        self._append(b"]")
+                        continue
+                    if needs_comma:
+                        self._append(b",")
+                    end = idx
+                    while (
+                        end < num_items
+                        and end - idx < SCALAR_RUN
+                        and not isinstance(container[end], (dict, list))
+                    ):
+                        end += 1
+                    if end > idx:
+                        # ujson gives "[a,b,c]", the brackets are dropped
+                        self._append(encode(container[idx:end])[1:-1])
+                        frame[1] = end
+                    else:
+                        value = container[idx]
+                        container[idx] = None
+                        frame[1] = idx + 1
+                frame[3] = True
+                if len(buffer) >= chunk_size:
+                    await self._flush()
+            if value is _NO_VALUE:
+                break
+        if len(buffer) >= chunk_size:
+            await self._flush()
+
+    def _append(self, data: bytes) -> None:
+        self._buffer.extend(data)
+        self.raw_bytes += len(data)
+
+    async def _flush(self, final: bool = False) -> None:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+            if final:
+                data += self._compressor.flush()
+        if data:
+            self.written_bytes += len(data)
+            await self._file.write(data)
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        return dumps(value, ensure_ascii=False).encode("utf-8")
+
+    async def __aenter__(self) -> "ChunkedJSONWriter":
+        self._file = await aiofiles.open(self.path, "wb")
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        try:
+            if exc_type is None:
+                await self._flush(final=True)
+        finally:
+            await self._file.close()
+            self._file = None
+
+    def __str__(self) -> str:
+        return f"ChunkedJSONWriter(path={self.path}, compress={self.compress}, raw_bytes={self.raw_bytes}, written_bytes={self.written_bytes})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,79 @@
+"""Summaries of latency samples"""
+from collections import deque
+from math import ceil
+from typing import Deque, Dict, List, Union
+
+__all__ = ["LatencyStats"]
+
+Number = Union[int, float]
+
+
+class LatencyStats:
+    """Collects latency samples and summarizes them (count, mean, max and percentiles).
+
+    The count, mean and max are of every sample added, the percentiles are of
+    the most recent samples, up to the configured number of samples.
+    """
+
+    __slots__ = ["__weakref__", "count", "max", "name", "samples", "total"]
+
+    def __init__(self, name: str, max_samples: int = 1024) -> None:
+        """Initialize the new LatencyStats instance
+
+        :param name: The name of what the latency is of
+        :param max_samples: The maximum number of recent samples kept
+        """
+        self.name: str = name
+        self.samples: Deque[float] = deque(maxlen=max(max_samples, 1))
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def add(self, value: Number) -> None:
+        """Adds a sample
+
+        :param value: The latency
+        """
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: Number) -> float:
+        """Returns the supplied percentile (nearest rank) of the recent samples
+
+        :param percent: The percentile, 0 - 100
+        :return: The latency at the percentile or 0 if there are no samples
+        """
+        if not self.samples:
+            return 0.0
+        return self._nearest_rank(sorted(self.samples), percent)
+
+    def summary(self, digits: int = 3) -> Dict[str, Number]:
+        """Returns the summary of the samples
+
+        :param digits: The number of decimal digits the values are rounded to
+        :return: The count, mean, max, p50, p90 and p99
+        """
+        if not self.samples:
+            return dict(count=self.count)
+        ordered = sorted(self.samples)
+        summary: Dict[str, Number] = dict(
+            count=self.count,
+            mean=round(self.total / self.count, digits),
+            max=round(self.max, digits),
+        )
+        for percent in (50, 90, 99):
+            summary[f"p{percent}"] = round(self._nearest_rank(ordered, percent), digits)
+        return summary
+
+    @staticmethod
+    def _nearest_rank(ordered: List[float], percent: Number) -> float:
+        return ordered[max(ceil(percent / 100 * len(ordered)), 1) - 1]
+
+    def __str__(self) -> str:
+        return f"LatencyStats(name={self.name}, summary={self.summary()})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
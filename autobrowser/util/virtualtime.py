@@ -0,0 +1,132 @@
+"""Fast-forwarding of a page's timers using the DevTools virtual time policy"""
+from asyncio import AbstractEventLoop
+from typing import Any, Optional, TYPE_CHECKING, Union
+
+from .helper import Helper
+from .loggers import AutoLogger, create_autologger
+
+if TYPE_CHECKING:
+    from cripy import Client
+
+__all__ = ["VirtualTimeController"]
+
+
+class VirtualTimeController:
+    """Controls the virtual time policy of a tab (Emulation.setVirtualTimePolicy).
+
+    While running, the page's timers (setTimeout, setInterval, requestAnimationFrame)
+    are advanced as fast as possible in chunks of virtual time, but virtual time is
+    paused whenever network fetches are pending so that the content the timers load is
+    still fetched (policy pauseIfNetworkFetchesPending). Once a chunk is used up the next
+    one is granted until the total virtual time budget is used up, at which point the
+    page goes back to the wall clock (policy advance).
+    """
+
+    __slots__ = [
+        "__weakref__",
+        "_listening",
+        "_remaining",
+        "_running",
+        "chunk",
+        "client",
+        "logger",
+        "loop",
+        "max_starvation",
+        "num_grants",
+    ]
+
+    def __init__(
+        self,
+        client: "Client",
+        loop: Optional[AbstractEventLoop] = None,
+        chunk: Union[int, float] = 1000,
+        max_starvation: int = 100,
+    ) -> None:
+        """Initialize the new VirtualTimeController instance
+
+        :param client: The CDP client connected to the tab
+        :param loop: The event loop used by the automation
+        :param chunk: How much virtual time (in milliseconds) is granted at once
+        :param max_starvation: The maximum number of virtual time tasks that can run
+        before real time tasks (e.g. network responses) are allowed to run
+        """
+        self.client: "Client" = client
+        self.loop: AbstractEventLoop = Helper.ensure_loop(loop)
+        self.chunk: Union[int, float] = chunk
+        self.max_starvation: int = max_starvation
+        self.num_grants: int = 0
+        self.logger: AutoLogger = create_autologger(
+            "virtualTime", "VirtualTimeController"
+        )
+        self._remaining: float = 0
+        self._running: bool = False
+        self._listening: bool = False
+
+    @property
+    def running(self) -> bool:
+        """Is virtual time being fast-forwarded"""
+        return self._running
+
+    async def start(self, budget: Union[int, float]) -> None:
+        """Starts fast-forwarding virtual time
+
+        :param budget: The total amount of virtual time (in seconds) to fast-forward
+        """
+        if not self._listening:
+            self.client.Emulation.virtualTimeBudgetExpired(self._on_budget_expired)
+            self._listening = True
+        self._remaining = budget * 1000
+        self._running = True
+        self.num_grants = 0
+        self.logger.debug("start", f"fast-forwarding <budget={budget}>")
+        await self._grant()
+
+    async def stop(self) -> None:
+        """Stops fast-forwarding virtual time, the page's timers follow the wall clock again"""
+        if not self._running:
+            return
+        self._running = False
+        self._remaining = 0
+        try:
+            await self.client.send(
+                "Emulation.setVirtualTimePolicy", {"policy": "advance"}
+            )
+        except Exception as e:
+            self.logger.exception(
+                "stop", "restoring the advance policy failed", exc_info=e
+            )
+            return
+        self.logger.debug("stop", f"stopped <grants={self.num_grants}>")
+
+    async def _grant(self) -> None:
+        """Grants the next chunk of virtual time or stops if the budget is used up"""
+        chunk = min(self.chunk, self._remaining)
+        if chunk <= 0:
+            await self.stop()
+            return
+        self._remaining -= chunk
+        self.num_grants += 1
+        try:
+            await self.client.send(
+                "Emulation.setVirtualTimePolicy",
+                {
+                    "policy": "pauseIfNetworkFetchesPending",
+                    "budget": chunk,
+                    "maxVirtualTimeTaskStarvationCount": self.max_starvation,
+                },
+            )
+        except Exception as e:
+            self.logger.exception(
+                "_grant", "setting the virtual time policy failed", exc_info=e
+            )
+            self._running = False
+
+    def _on_budget_expired(self, *args: Any, **kwargs: Any) -> None:
+        if self._running:
+            self.loop.create_task(self._grant())
+
+    def __str__(self) -> str:
+        return f"VirtualTimeController(running={self._running}, remaining={self._remaining}, grants={self.num_grants})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,31 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+import uvloop
+
+from autobrowser import run_automation
+from autobrowser.supervisor import WorkerSupervisor
+
+try:
+    uvloop.install()
+except Exception:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+logger = logging.getLogger("autobrowser")
+logger.setLevel(logging.DEBUG)
+
+DRIVER_SCRIPT = str(Path(__file__).resolve().parent / "driver.py")
+
+
+async def run_supervisor() -> int:
+    loop = asyncio.get_event_loop()
+    num_workers = int(os.environ.get("NUM_WORKERS") or os.cpu_count() or 1)
+    logger.info(f"run_supervisor: running driver.py in {num_workers} workers")
+    supervisor = WorkerSupervisor(DRIVER_SCRIPT, num_workers, loop=loop)
+    return await supervisor.run()
+
+
+if __name__ == "__main__":
+    run_automation(run_supervisor())
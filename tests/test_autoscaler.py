@@ -0,0 +1,187 @@
+from typing import Dict, List, Tuple
+
+import pytest
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.drivers.autoscaler import QueueAutoscaler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+class FakeTransaction:
+    def __init__(self, results: List[int]) -> None:
+        self.results = results
+
+    def llen(self, key: str) -> None:
+        pass
+
+    def scard(self, key: str) -> None:
+        pass
+
+    async def execute(self) -> List[int]:
+        return self.results
+
+
+class FakeRedis:
+    """Answers the autoscaler's sample with (queued, escalated, pending, seen)"""
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0, 0, 0, 0]
+
+    def multi_exec(self) -> FakeTransaction:
+        return FakeTransaction(list(self.counts))
+
+
+class FakeDispatcher:
+    def __init__(self) -> None:
+        self.dispatched: List[Tuple[str, str]] = []
+
+    def dispatch(self, reqid: str, cmd: str, command) -> None:
+        self.dispatched.append((reqid, cmd))
+
+
+class FakeDriver:
+    def __init__(self, config: AutomationConfig, num_browsers: int) -> None:
+        self.conf = config
+        self.redis = FakeRedis()
+        self.dispatcher = FakeDispatcher()
+        self.browsers: Dict[str, object] = {
+            f"started-{idx}": object() for idx in range(num_browsers)
+        }
+
+
+def make_autoscaler(num_browsers: int = 2, **kwargs) -> QueueAutoscaler:
+    config = dict(
+        autoid="test",
+        autoscale=True,
+        autoscale_min_browsers=1,
+        autoscale_max_browsers=10,
+        autoscale_idle_time=60,
+        autoscale_target_drain_time=600,
+        autoscale_cooldown=60,
+    )
+    config.update(kwargs)
+    driver = FakeDriver(AutomationConfig(**config), num_browsers)
+    return QueueAutoscaler(driver, loop=FakeClock())
+
+
+class TestDesiredBrowsers:
+    def test_enough_browsers_to_drain_the_queue_within_the_target(self):
+        autoscaler = make_autoscaler(2)
+        autoscaler.pages_per_second = 1.0
+        # 0.5 pages per second per browser, 300 pages per browser per drain time
+        assert autoscaler.desired_browsers(1500) == 5
+        assert autoscaler.desired_browsers(100000) == 10
+
+    def test_never_scales_down_while_there_is_work_queued(self):
+        autoscaler = make_autoscaler(4)
+        autoscaler.pages_per_second = 100.0
+        assert autoscaler.desired_browsers(10) == 4
+
+    def test_without_a_measured_rate_something_is_crawling(self):
+        autoscaler = make_autoscaler(0, autoscale_min_browsers=0)
+        assert autoscaler.desired_browsers(10) == 1
+        autoscaler = make_autoscaler(3)
+        assert autoscaler.desired_browsers(10) == 3
+
+    def test_scales_down_once_idle_for_the_idle_time(self):
+        autoscaler = make_autoscaler(3)
+        autoscaler.empty_since = autoscaler.loop.time() - 30
+        assert autoscaler.desired_browsers(0) == 3
+        autoscaler.empty_since = autoscaler.loop.time() - 60
+        assert autoscaler.desired_browsers(0) == 2
+
+    def test_bounded_by_the_minimum(self):
+        autoscaler = make_autoscaler(1, autoscale_min_browsers=1)
+        autoscaler.empty_since = autoscaler.loop.time() - 600
+        assert autoscaler.desired_browsers(0) == 1
+        autoscaler = make_autoscaler(0, autoscale_min_browsers=2)
+        assert autoscaler.desired_browsers(0) == 2
+
+    def test_browsers_being_added_count(self):
+        autoscaler = make_autoscaler(2)
+        autoscaler.num_pending_adds = 3
+        autoscaler.pages_per_second = 5.0
+        assert autoscaler.num_browsers == 5
+        assert autoscaler.desired_browsers(600) == 5
+
+
+class TestSample:
+    @pytest.mark.asyncio
+    async def test_measures_the_crawl_rate(self):
+        autoscaler = make_autoscaler()
+        redis = autoscaler.driver.redis
+        redis.counts = [50, 10, 2, 100]
+        assert await autoscaler.sample() == (60, 38)
+        assert autoscaler.pages_per_second == 0.0
+        autoscaler.loop.now += 10
+        redis.counts = [40, 0, 2, 100]
+        assert await autoscaler.sample() == (40, 58)
+        assert autoscaler.pages_per_second == 2.0
+
+    @pytest.mark.asyncio
+    async def test_tracks_how_long_the_queues_are_empty(self):
+        autoscaler = make_autoscaler()
+        redis = autoscaler.driver.redis
+        redis.counts = [0, 0, 1, 10]
+        await autoscaler.sample()
+        assert autoscaler.empty_since is None
+        redis.counts = [0, 0, 0, 10]
+        await autoscaler.sample()
+        empty_since = autoscaler.empty_since
+        assert empty_since == autoscaler.loop.time()
+        autoscaler.loop.now += 5
+        await autoscaler.sample()
+        assert autoscaler.empty_since == empty_since
+        redis.counts = [1, 0, 0, 11]
+        await autoscaler.sample()
+        assert autoscaler.empty_since is None
+
+
+class TestScale:
+    @pytest.mark.asyncio
+    async def test_adds_browsers_then_cools_down(self):
+        autoscaler = make_autoscaler(1)
+        autoscaler._last_completed = 0
+        autoscaler._last_sample = autoscaler.loop.time()
+        redis = autoscaler.driver.redis
+        redis.counts = [900, 0, 0, 900]
+        autoscaler.loop.now += 1
+        await autoscaler.scale()
+        assert autoscaler.pages_per_second == 0.0
+        # no rate was measured in the interval, so nothing is added
+        assert autoscaler.driver.dispatcher.dispatched == []
+        # 1 page per second, draining 1500 URLs within 600 seconds needs 3 browsers
+        redis.counts = [1500, 0, 0, 1510]
+        autoscaler.loop.now += 10
+        await autoscaler.scale()
+        dispatched = autoscaler.driver.dispatcher.dispatched
+        assert dispatched == [
+            ("autoscaler:1", "scale_up"),
+            ("autoscaler:2", "scale_up"),
+        ]
+        assert autoscaler.num_browsers == 3
+        redis.counts = [2000, 0, 0, 3000]
+        autoscaler.loop.now += 10
+        await autoscaler.scale()
+        assert len(dispatched) == 2
+
+    @pytest.mark.asyncio
+    async def test_drains_only_the_browsers_it_added(self):
+        autoscaler = make_autoscaler(2)
+        driver = autoscaler.driver
+        autoscaler.empty_since = autoscaler.loop.time() - 600
+        await autoscaler.scale()
+        assert driver.dispatcher.dispatched == []
+        driver.browsers["autoscaled-1"] = object()
+        autoscaler.added = ["gone", "autoscaled-1"]
+        autoscaler._last_scaled = 0
+        await autoscaler.scale()
+        assert driver.dispatcher.dispatched == [("autoscaled-1", "scale_down")]
+        assert autoscaler.added == []
@@ -0,0 +1,59 @@
+from asyncio import Event
+
+import pytest
+
+from autobrowser.util import backoff as backoff_module
+from autobrowser.util.backoff import Backoff
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(backoff_module, "random", lambda: 1.0)
+
+
+class TestBackoff:
+    def test_delays_grow_exponentially_up_to_the_maximum(self, event_loop, no_jitter):
+        backoff = Backoff(0.1, 1, 0, loop=event_loop)
+        delays = [round(backoff.next_delay(), 3) for _ in range(6)]
+        assert delays == [0.1, 0.2, 0.4, 0.8, 1, 1]
+        assert backoff.attempts == 6
+
+    def test_jitter_is_at_most_half_of_the_delay(self, event_loop, monkeypatch):
+        monkeypatch.setattr(backoff_module, "random", lambda: 0.0)
+        backoff = Backoff(1, 10, 0, loop=event_loop)
+        assert backoff.next_delay() == 0.5
+        assert backoff.next_delay() == 1
+
+    def test_maximum_is_never_below_the_initial_delay(self, event_loop, no_jitter):
+        backoff = Backoff(2, 1, 0, loop=event_loop)
+        assert backoff.maximum == 2
+        assert backoff.next_delay() == 2
+
+    def test_delay_never_passes_the_deadline(self, event_loop, no_jitter):
+        backoff = Backoff(5, 5, 10, loop=event_loop)
+        backoff.started = event_loop.time() - 9
+        assert not backoff.expired
+        assert backoff.next_delay() <= 1
+
+    def test_no_deadline_never_expires(self, event_loop):
+        backoff = Backoff(1, 1, 0, loop=event_loop)
+        backoff.started = event_loop.time() - 1e6
+        assert not backoff.expired
+
+    @pytest.mark.asyncio
+    async def test_wait_after_the_deadline(self, event_loop):
+        backoff = Backoff(1, 1, 10, loop=event_loop)
+        backoff.started = event_loop.time() - 10
+        assert backoff.expired
+        assert await backoff.wait() is False
+        assert backoff.attempts == 0
+
+    @pytest.mark.asyncio
+    async def test_wait_is_ended_early_by_the_wake_event(self, event_loop):
+        backoff = Backoff(60, 60, 0, loop=event_loop)
+        wake = Event(loop=event_loop)
+        wake.set()
+        start = event_loop.time()
+        assert await backoff.wait(wake) is True
+        assert event_loop.time() - start < 1
+        assert not wake.is_set()
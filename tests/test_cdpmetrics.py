@@ -0,0 +1,148 @@
+from asyncio import sleep
+
+import pytest
+
+from autobrowser.util.cdpmetrics import (
+    CDPCommandMetrics,
+    CDPInstrumentation,
+    CDPMetrics,
+    estimate_payload_size,
+)
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.sent = []
+        self.emitted = []
+
+    async def send(self, method, params=None, *args, **kwargs):
+        self.sent.append((method, params))
+        if method == "Fail.command":
+            raise Exception("failed")
+        if method == "Network.getResponseBody":
+            return {"body": "x" * 100, "base64Encoded": False}
+        return {}
+
+    def emit(self, event, *args, **kwargs) -> bool:
+        self.emitted.append((event, args))
+        return True
+
+
+class TestEstimatePayloadSize:
+    def test_strings_count_their_length(self):
+        assert estimate_payload_size("abcd") == 4
+        assert estimate_payload_size(b"ab") == 2
+
+    def test_scalars_count_one(self):
+        assert estimate_payload_size(10) == 1
+        assert estimate_payload_size(None) == 1
+        assert estimate_payload_size(True) == 1
+
+    def test_dicts_count_their_keys_and_values(self):
+        assert estimate_payload_size({"url": "http://a.com", "n": 1}) == 3 + 12 + 1 + 1
+
+    def test_lists_sum_their_items(self):
+        assert estimate_payload_size(["ab", "cd", 1]) == 5
+
+    def test_containers_below_depth_count_their_items(self):
+        value = {"a": {"b": {"c": "x" * 100, "d": "y"}}}
+        assert estimate_payload_size(value) == 1 + 1 + 2
+        assert estimate_payload_size(value, depth=3) == 1 + 1 + 1 + 100 + 1 + 1
+        assert estimate_payload_size(["x" * 10, "y"], depth=0) == 2
+
+
+class TestCDPCommandMetrics:
+    def test_record_and_summary(self):
+        metrics = CDPCommandMetrics("Page.navigate")
+        metrics.record(0.005, 10, 20, False)
+        metrics.record(0.5, 5, 0, True)
+        metrics.record(10, 0, 0, False)
+        summary = metrics.summary()
+        assert summary["latency"]["count"] == 3
+        assert summary["histogram"] == {"le_0.005": 1, "le_0.5": 1, "gt_5": 1}
+        assert summary["errors"] == 1
+        assert summary["sent"] == 15
+        assert summary["received"] == 20
+
+
+class TestCDPMetrics:
+    def test_commands_are_ordered_by_total_time(self):
+        metrics = CDPMetrics("tab")
+        metrics.record_command("Runtime.evaluate", 0.1, 1, 1, False)
+        metrics.record_command("Page.navigate", 2, 1, 1, False)
+        metrics.record_command("Runtime.evaluate", 0.2, 1, 1, True)
+        metrics.events["Network.requestWillBeSent"] += 2
+        summary = metrics.summary()
+        assert summary["scope"] == "tab"
+        assert list(summary["commands"]) == ["Page.navigate", "Runtime.evaluate"]
+        assert summary["totals"] == dict(
+            commands=3, errors=1, time=2.3, sent=3, received=3, events=2
+        )
+        assert summary["events"] == {"Network.requestWillBeSent": 2}
+
+    def test_reset(self):
+        metrics = CDPMetrics("page")
+        metrics.record_command("Page.navigate", 1, 1, 1, False)
+        metrics.events["Page.loadEventFired"] += 1
+        metrics.reset()
+        assert metrics.summary()["totals"]["commands"] == 0
+        assert metrics.summary()["events"] == {}
+
+
+class TestCDPInstrumentation:
+    @pytest.mark.asyncio
+    async def test_commands_are_recorded_for_the_tab_and_page(self, event_loop):
+        client = FakeClient()
+        instrumentation = CDPInstrumentation(loop=event_loop)
+        instrumentation.instrument(client)
+        result = await client.send("Network.getResponseBody", {"requestId": "1"})
+        assert result["body"] == "x" * 100
+        with pytest.raises(Exception):
+            await client.send("Fail.command")
+        await sleep(0, loop=event_loop)
+        assert client.sent == [
+            ("Network.getResponseBody", {"requestId": "1"}),
+            ("Fail.command", None),
+        ]
+        for metrics in (instrumentation.tab, instrumentation.page):
+            body = metrics.commands["Network.getResponseBody"]
+            assert body.latency.count == 1
+            assert body.bytes_sent == len("requestId") + 1
+            assert body.bytes_received == 4 + 100 + len("base64Encoded") + 1
+            assert metrics.commands["Fail.command"].errors == 1
+
+    @pytest.mark.asyncio
+    async def test_events_are_counted_and_still_emitted(self, event_loop):
+        client = FakeClient()
+        instrumentation = CDPInstrumentation(loop=event_loop)
+        instrumentation.instrument(client)
+        assert client.emit("Page.loadEventFired", {"timestamp": 1})
+        client.emit("Page.loadEventFired", {"timestamp": 2})
+        assert client.emitted == [
+            ("Page.loadEventFired", ({"timestamp": 1},)),
+            ("Page.loadEventFired", ({"timestamp": 2},)),
+        ]
+        assert instrumentation.tab.events["Page.loadEventFired"] == 2
+        assert instrumentation.page.events["Page.loadEventFired"] == 2
+
+    @pytest.mark.asyncio
+    async def test_end_page_starts_a_new_page(self, event_loop):
+        client = FakeClient()
+        instrumentation = CDPInstrumentation(loop=event_loop)
+        instrumentation.instrument(client)
+        await client.send("Page.navigate", {"url": "http://a.com"})
+        client.emit("Page.loadEventFired")
+        await sleep(0, loop=event_loop)
+        summary = instrumentation.end_page()
+        assert summary["scope"] == "page"
+        assert summary["totals"]["commands"] == 1
+        assert summary["totals"]["events"] == 1
+        assert instrumentation.page.summary()["totals"]["commands"] == 0
+        await client.send("Runtime.evaluate", {"expression": "1"})
+        await sleep(0, loop=event_loop)
+        assert list(instrumentation.page.commands) == ["Runtime.evaluate"]
+        assert list(instrumentation.tab.commands) == [
+            "Page.navigate",
+            "Runtime.evaluate",
+        ]
+        assert instrumentation.tab.events["Page.loadEventFired"] == 1
@@ -0,0 +1,126 @@
+from typing import Dict, List, Tuple
+
+import pytest
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.tabs.probe import ContentTypeProbe
+
+PROXY = "http://proxy.test:8080"
+
+
+class FakeContent:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    async def iter_chunked(self, size: int):
+        yield self.body
+
+
+class FakeResponse:
+    def __init__(self, status: int, content_type: str, body: bytes = b"") -> None:
+        self.status = status
+        self.headers = {"Content-Type": content_type} if content_type else {}
+        self.content = FakeContent(body)
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+class FakeSession:
+    """Responds to requests with the (status, content-type) of the method"""
+
+    def __init__(self, responses: Dict[str, Tuple[int, str]]) -> None:
+        self.responses = responses
+        self.requests: List[dict] = []
+
+    def request(self, method: str, url: str, **kwargs) -> FakeResponse:
+        self.requests.append(dict(method=method, url=url, **kwargs))
+        return FakeResponse(*self.responses[method])
+
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        self.requests.append(dict(method="GET", url=url, **kwargs))
+        status, content_type = self.responses["GET"]
+        return FakeResponse(status, content_type, b"%PDF-1.4")
+
+
+def make_probe(session: FakeSession, loop, **kwargs) -> ContentTypeProbe:
+    config = AutomationConfig(
+        autoid="test", content_probe=True, http_proxy_url=PROXY, **kwargs
+    )
+    return ContentTypeProbe(session, config, loop=loop)
+
+
+class TestContentTypeProbe:
+    def test_requires_the_recording_proxy(self):
+        with pytest.raises(ValueError):
+            AutomationConfig(autoid="test", content_probe=True)
+
+    def test_url_pattern(self):
+        url_pattern = ContentTypeProbe.url_pattern
+        assert (
+            url_pattern("https://example.com/posts/2019/12/title.html?q=1")
+            == "example.com/posts/*/*/*.html"
+        )
+        assert url_pattern("https://example.com/about") == "example.com/about"
+        assert url_pattern("https://example.com/a/file.PDF") == "example.com/a/*.pdf"
+
+    def test_only_pages_are_cached_by_pattern(self, event_loop):
+        probe = make_probe(FakeSession({}), event_loop)
+        probe.learn("https://example.com/posts/1.html", "text/html")
+        probe.learn("https://example.com/files/1.pdf#page=2", "application/pdf")
+        assert probe.cached("https://example.com/posts/2.html") == "text/html"
+        assert probe.cached("https://example.com/files/1.pdf") == "application/pdf"
+        assert probe.cached("https://example.com/files/2.pdf") is None
+
+    def test_cache_is_bounded(self, event_loop):
+        probe = make_probe(FakeSession({}), event_loop, content_probe_cache_size=2)
+        probe.learn("https://example.com/1.pdf", "application/pdf")
+        probe.learn("https://example.com/2.pdf", "application/pdf")
+        probe.cached("https://example.com/1.pdf")
+        probe.learn("https://example.com/3.pdf", "application/pdf")
+        assert probe.cached("https://example.com/2.pdf") is None
+        assert probe.cached("https://example.com/1.pdf") == "application/pdf"
+
+    @pytest.mark.asyncio
+    async def test_probes_directly_with_head(self, event_loop):
+        session = FakeSession({"HEAD": (200, "application/pdf")})
+        probe = make_probe(session, event_loop)
+        assert await probe.probe("https://example.com/1.pdf") == "application/pdf"
+        assert await probe.probe("https://example.com/1.pdf") == "application/pdf"
+        assert len(session.requests) == 1
+        assert "proxy" not in session.requests[0]
+        assert probe.num_probed == 1
+        assert probe.num_cache_hits == 1
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_a_ranged_get(self, event_loop):
+        session = FakeSession({"HEAD": (405, ""), "GET": (206, "text/html")})
+        probe = make_probe(session, event_loop)
+        assert await probe.probe("https://example.com/page") == "text/html"
+        assert session.requests[1]["headers"] == {"Range": "bytes=0-0"}
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self, event_loop):
+        session = FakeSession({"HEAD": (404, "text/html")})
+        probe = make_probe(session, event_loop)
+        assert await probe.probe("https://example.com/missing") is None
+        assert probe.cached("https://example.com/missing") is None
+
+    @pytest.mark.asyncio
+    async def test_captures_through_the_proxy(self, event_loop):
+        session = FakeSession({"GET": (200, "application/pdf")})
+        probe = make_probe(session, event_loop, navigation_timeout=30)
+        assert await probe.capture("https://example.com/1.pdf")
+        assert session.requests[0]["proxy"] == PROXY
+        assert session.requests[0]["timeout"].total == 30
+        assert probe.num_captured == 1
+
+    @pytest.mark.asyncio
+    async def test_error_responses_are_not_captured(self, event_loop):
+        session = FakeSession({"GET": (404, "text/html")})
+        probe = make_probe(session, event_loop)
+        assert not await probe.capture("https://example.com/1.pdf")
+        assert probe.num_captured == 0
@@ -0,0 +1,86 @@
+from asyncio import AbstractEventLoop, sleep
+from typing import List
+
+import pytest
+
+from autobrowser.drivers.dispatcher import BrowserCommandDispatcher
+
+
+def make_command(
+    ran: List[str], name: str, delay: float, loop: AbstractEventLoop, fail: bool = False
+):
+    async def command() -> None:
+        await sleep(delay, loop=loop)
+        ran.append(name)
+        if fail:
+            raise Exception(f"{name} failed")
+
+    return command
+
+
+class TestBrowserCommandDispatcher:
+    @pytest.mark.asyncio
+    async def test_commands_for_a_browser_run_in_dispatch_order(self, event_loop):
+        dispatcher = BrowserCommandDispatcher(4, loop=event_loop)
+        ran = []
+        dispatcher.dispatch("a", "start", make_command(ran, "start", 0.05, event_loop))
+        dispatcher.dispatch("a", "stop", make_command(ran, "stop", 0, event_loop))
+        dispatcher.dispatch("a", "start", make_command(ran, "restart", 0, event_loop))
+        await dispatcher.close()
+        assert ran == ["start", "stop", "restart"]
+        assert dispatcher.num_completed == 3
+
+    @pytest.mark.asyncio
+    async def test_commands_for_different_browsers_run_concurrently(self, event_loop):
+        dispatcher = BrowserCommandDispatcher(4, loop=event_loop)
+        ran = []
+        dispatcher.dispatch("a", "start", make_command(ran, "a", 0.05, event_loop))
+        dispatcher.dispatch("b", "start", make_command(ran, "b", 0, event_loop))
+        await dispatcher.close()
+        assert ran == ["b", "a"]
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, event_loop):
+        dispatcher = BrowserCommandDispatcher(1, loop=event_loop)
+        ran = []
+        dispatcher.dispatch("a", "start", make_command(ran, "a", 0.05, event_loop))
+        dispatcher.dispatch("b", "start", make_command(ran, "b", 0, event_loop))
+        await dispatcher.close()
+        assert ran == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_a_failed_command_does_not_block_the_next(self, event_loop):
+        dispatcher = BrowserCommandDispatcher(4, loop=event_loop)
+        ran = []
+        dispatcher.dispatch(
+            "a", "start", make_command(ran, "start", 0, event_loop, fail=True)
+        )
+        dispatcher.dispatch("a", "stop", make_command(ran, "stop", 0, event_loop))
+        await dispatcher.close()
+        assert ran == ["start", "stop"]
+        assert dispatcher.num_failed == 1
+        assert dispatcher.num_pending == 0
+
+    @pytest.mark.asyncio
+    async def test_on_idle_is_called_when_the_last_command_completes(
+        self, event_loop
+    ):
+        idle = []
+        dispatcher = BrowserCommandDispatcher(
+            4, loop=event_loop, on_idle=lambda: idle.append(dispatcher.num_pending)
+        )
+        ran = []
+        dispatcher.dispatch("a", "start", make_command(ran, "a", 0.01, event_loop))
+        dispatcher.dispatch("b", "start", make_command(ran, "b", 0, event_loop))
+        await dispatcher.close()
+        await sleep(0, loop=event_loop)
+        assert idle == [0]
+
+    @pytest.mark.asyncio
+    async def test_closed_dispatcher_ignores_commands(self, event_loop):
+        dispatcher = BrowserCommandDispatcher(4, loop=event_loop)
+        await dispatcher.close()
+        ran = []
+        command = make_command(ran, "a", 0, event_loop)
+        assert dispatcher.dispatch("a", "start", command) is None
+        assert ran == []
@@ -0,0 +1,187 @@
+from collections import defaultdict
+from typing import List
+
+import pytest
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.tabs.crawlerTab import NavigationResult
+from autobrowser.tabs.fetchTab import FetchTab, LinkExtractor
+
+PAGE_URL = "https://example.com/dir/page.html"
+
+PAGE_HTML = """<html><head><base href="https://example.com/base/">
+<script>var a = 1;</script><style>.a {}</style></head>
+<body><p>Some visible text that is long enough to not look script dependent</p>
+<a href="one.html">one</a><a href="/two.html">two</a><a href="one.html">again</a>
+<area href="https://other.com/three"><a href="mailto:me@example.com">mail</a>
+<a href="javascript:void(0)">js</a><a>no href</a></body></html>"""
+
+APP_HTML = """<html><head><script src="/app.js"></script></head>
+<body><div id="root"></div><noscript>You need to enable JavaScript</noscript></body></html>"""
+
+
+class FakeRedis:
+    def __init__(self):
+        self.sets = defaultdict(set)
+        self.lists = defaultdict(list)
+
+    async def sadd(self, key, *members):
+        added = set(members) - self.sets[key]
+        self.sets[key].update(members)
+        return len(added)
+
+    async def rpush(self, key, *values):
+        self.lists[key].extend(values)
+        return len(self.lists[key])
+
+
+class FakeContent:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    async def iter_chunked(self, size: int):
+        for idx in range(0, len(self.body), size):
+            yield self.body[idx : idx + size]
+
+
+class FakeResponse:
+    def __init__(self, url: str, body: bytes, content_type: str, status: int) -> None:
+        self.url = url
+        self.status = status
+        self.content_type = content_type
+        self.charset = "utf-8"
+        self.headers = {}
+        self.content = FakeContent(body)
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+class FakeSession:
+    def __init__(self, body: str, content_type: str = "text/html", status: int = 200):
+        self.body = body.encode("utf-8")
+        self.content_type = content_type
+        self.status = status
+        self.requests: List[dict] = []
+
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        self.requests.append(dict(url=url, **kwargs))
+        return FakeResponse(url, self.body, self.content_type, self.status)
+
+
+class FakeBrowser:
+    def __init__(self, config: AutomationConfig, loop) -> None:
+        self.config = config
+        self.loop = loop
+        self.autoid = config.autoid
+        self.behavior_manager = None
+
+
+def make_fetch_tab(session: FakeSession, loop) -> FetchTab:
+    config = AutomationConfig(
+        autoid="test",
+        reqid="test",
+        tab_type="FetchTab",
+        http_proxy_url="http://proxy.test:8080",
+    )
+    tab = FetchTab(
+        FakeBrowser(config, loop),
+        {"id": "tab", "url": "about:blank"},
+        redis=FakeRedis(),
+        session=session,
+    )
+    tab.frontier.scope.all_links = True
+    tab.frontier.crawl_depth = 2
+    tab.frontier.currently_crawling = {"url": PAGE_URL, "depth": 0}
+    return tab
+
+
+def extract(html: str, url: str = PAGE_URL) -> LinkExtractor:
+    extractor = LinkExtractor(url)
+    extractor.feed(html)
+    extractor.close()
+    return extractor
+
+
+class TestLinkExtractor:
+    def test_extracts_crawlable_links_once_against_the_base(self):
+        assert extract(PAGE_HTML).links == [
+            "https://example.com/base/one.html",
+            "https://example.com/two.html",
+            "https://other.com/three",
+        ]
+
+    def test_links_are_resolved_against_the_page_without_a_base(self):
+        assert extract('<a href="next.html">next</a>').links == [
+            "https://example.com/dir/next.html"
+        ]
+
+    def test_text_of_invisible_elements_is_not_counted(self):
+        extractor = extract(PAGE_HTML)
+        assert extractor.num_scripts == 1
+        assert not extractor.looks_script_dependent(20)
+        assert extractor.looks_script_dependent(1000)
+
+    def test_application_roots_look_script_dependent(self):
+        extractor = extract(APP_HTML)
+        assert extractor.has_app_root
+        assert extractor.text_length == 0
+        assert extractor.looks_script_dependent(0)
+
+    def test_pages_without_scripts_never_look_script_dependent(self):
+        assert not extract('<div id="root"></div>').looks_script_dependent(1000)
+
+    def test_chunked_feeding(self):
+        extractor = LinkExtractor(PAGE_URL)
+        for idx in range(0, len(PAGE_HTML), 7):
+            extractor.feed(PAGE_HTML[idx : idx + 7])
+        extractor.close()
+        assert extractor.links == extract(PAGE_HTML).links
+
+
+class TestFetchTab:
+    def test_requires_the_recording_proxy(self):
+        with pytest.raises(ValueError):
+            AutomationConfig(autoid="test", tab_type="FetchTab")
+
+    @pytest.mark.asyncio
+    async def test_out_links_of_fetched_pages_are_added(self, event_loop):
+        session = FakeSession(PAGE_HTML)
+        tab = make_fetch_tab(session, event_loop)
+        assert await tab.goto(PAGE_URL) == NavigationResult.OK
+        assert session.requests[0]["proxy"] == "http://proxy.test:8080"
+        await tab.run_behavior()
+        keys = tab.frontier.keys
+        assert tab.redis.sets[keys.seen] == {
+            "https://example.com/base/one.html",
+            "https://example.com/two.html",
+            "https://other.com/three",
+        }
+        assert tab.redis.lists[keys.escalated] == []
+
+    @pytest.mark.asyncio
+    async def test_script_dependent_pages_are_escalated(self, event_loop):
+        tab = make_fetch_tab(FakeSession(APP_HTML), event_loop)
+        assert await tab.goto(PAGE_URL) == NavigationResult.OK
+        await tab.run_behavior()
+        keys = tab.frontier.keys
+        assert len(tab.redis.lists[keys.escalated]) == 1
+        assert PAGE_URL in tab.redis.lists[keys.escalated][0]
+        assert tab.redis.lists[keys.queue] == []
+
+    @pytest.mark.asyncio
+    async def test_non_html_responses_are_skipped(self, event_loop):
+        tab = make_fetch_tab(FakeSession("%PDF", "application/pdf"), event_loop)
+        assert await tab.goto(PAGE_URL) == NavigationResult.SKIP_URL
+        await tab.run_behavior()
+        assert tab.redis.lists[tab.frontier.keys.queue] == []
+
+    @pytest.mark.asyncio
+    async def test_error_pages_are_not_parsed(self, event_loop):
+        tab = make_fetch_tab(FakeSession(PAGE_HTML, status=404), event_loop)
+        assert await tab.goto(PAGE_URL) == NavigationResult.SKIP_URL
+        await tab.run_behavior()
+        assert tab.redis.sets[tab.frontier.keys.seen] == set()
@@ -0,0 +1,160 @@
+from asyncio import sleep
+from shutil import rmtree
+import pytest
+
+from autobrowser.automation import (
+    AutomationConfig,
+    BrowserExitInfo,
+    CloseReason,
+    TabClosedInfo,
+)
+from autobrowser.drivers.local import LocalBrowserDiver, LocalChromeProcess
+
+
+class FakeProcess:
+    def __init__(self, loop) -> None:
+        self.returncode = None
+        self._exited = loop.create_future()
+
+    async def wait(self) -> int:
+        return await self._exited
+
+    def kill(self) -> None:
+        if self.returncode is None:
+            self.returncode = -9
+            self._exited.set_result(-9)
+
+
+class FakeFrontier:
+    def __init__(self) -> None:
+        self.requeued = 0
+
+    async def requeue_current(self) -> None:
+        self.requeued += 1
+
+
+class FakeTab:
+    def __init__(self, tab_id: str) -> None:
+        self.tab_id = tab_id
+        self.frontier = FakeFrontier()
+
+
+class FakeBrowser:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def remove_all_listeners(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+async def driver(event_loop) -> LocalBrowserDiver:
+    conf = AutomationConfig(
+        autoid="test", local_browsers=1, local_browser_max_restarts=1
+    )
+    driver = LocalBrowserDiver(conf, loop=event_loop)
+    driver.restarted = []
+
+    async def start_pooled(pooled: LocalChromeProcess) -> None:
+        driver.restarted.append(pooled)
+
+    driver._start_pooled = start_pooled
+    yield driver
+    for pooled in driver.pool:
+        rmtree(pooled.user_data_dir, ignore_errors=True)
+    await driver.session.close()
+
+
+def make_pooled(loop, num_tabs: int = 2) -> LocalChromeProcess:
+    pooled = LocalChromeProcess(0, 9300)
+    pooled.process = FakeProcess(loop)
+    pooled.browser = FakeBrowser()
+    pooled.exited = loop.create_future()
+    pooled.tabs = [FakeTab(f"tab-{idx}") for idx in range(num_tabs)]
+    return pooled
+
+
+def crash_info(
+    driver: LocalBrowserDiver, pooled: LocalChromeProcess
+) -> BrowserExitInfo:
+    return BrowserExitInfo(
+        driver.conf,
+        [
+            TabClosedInfo(tab.tab_id, CloseReason.CONNECTION_CLOSED)
+            for tab in pooled.tabs
+        ],
+    )
+
+
+class TestLocalBrowserPool:
+    @pytest.mark.asyncio
+    async def test_restarts_once_the_browser_exited(self, driver, event_loop):
+        pooled = make_pooled(event_loop)
+        driver.pool = [pooled]
+        browser = pooled.browser
+        supervising = event_loop.create_task(driver._supervise(pooled))
+        pooled.kill()
+        await sleep(0.01, loop=event_loop)
+        # the tabs have not finished closing, nothing is requeued yet
+        assert [tab.frontier.requeued for tab in pooled.tabs] == [0, 0]
+        assert driver.restarted == []
+        driver._on_pooled_browser_exit(pooled, crash_info(driver, pooled))
+        await supervising
+        assert [tab.frontier.requeued for tab in pooled.tabs] == [1, 1]
+        assert browser.closed
+        assert pooled.browser is None
+        assert pooled.restarts == 1
+        assert driver.restarted == [pooled]
+        assert not pooled.finished
+
+    @pytest.mark.asyncio
+    async def test_crashed_tabs_kill_the_process(self, driver, event_loop):
+        pooled = make_pooled(event_loop)
+        driver.pool = [pooled]
+        supervising = event_loop.create_task(driver._supervise(pooled))
+        driver._on_pooled_browser_exit(pooled, crash_info(driver, pooled))
+        assert not pooled.running
+        await supervising
+        assert driver.restarted == [pooled]
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_the_maximum_restarts(self, driver, event_loop):
+        pooled = make_pooled(event_loop)
+        pooled.restarts = 1
+        driver.pool = [pooled]
+        supervising = event_loop.create_task(driver._supervise(pooled))
+        driver._on_pooled_browser_exit(pooled, crash_info(driver, pooled))
+        await supervising
+        assert [tab.frontier.requeued for tab in pooled.tabs] == [1, 1]
+        assert driver.restarted == []
+        assert pooled.finished
+        assert driver.shutdown_condition.shutdown_condition_met
+
+    @pytest.mark.asyncio
+    async def test_browsers_that_finished_crawling_are_not_restarted(
+        self, driver, event_loop
+    ):
+        pooled = make_pooled(event_loop)
+        driver.pool = [pooled, make_pooled(event_loop)]
+        info = BrowserExitInfo(
+            driver.conf,
+            [TabClosedInfo(tab.tab_id, CloseReason.CRAWL_END) for tab in pooled.tabs],
+        )
+        driver._on_pooled_browser_exit(pooled, info)
+        assert pooled.finished
+        assert pooled.running
+        assert not driver.shutdown_condition.shutdown_condition_met
+
+    @pytest.mark.asyncio
+    async def test_no_restarts_when_shutting_down(self, driver, event_loop):
+        pooled = make_pooled(event_loop)
+        driver.pool = [pooled]
+        driver._shutting_down = True
+        supervising = event_loop.create_task(driver._supervise(pooled))
+        pooled.kill()
+        await supervising
+        assert [tab.frontier.requeued for tab in pooled.tabs] == [0, 0]
+        assert driver.restarted == []
@@ -0,0 +1,86 @@
+import time
+from asyncio import sleep
+
+import pytest
+import ujson
+
+from autobrowser.util.looplag import LAG_BUCKETS, LoopLagMonitor
+
+
+class FakeLogger:
+    def __init__(self) -> None:
+        self.infos = []
+        self.warnings = []
+
+    def info(self, method: str, msg: str) -> None:
+        self.infos.append((method, ujson.loads(msg)))
+
+    def warning(self, method: str, msg: str) -> None:
+        self.warnings.append((method, ujson.loads(msg)))
+
+
+def make_monitor(loop, **kwargs) -> LoopLagMonitor:
+    monitor = LoopLagMonitor(loop=loop, **kwargs)
+    monitor.logger = FakeLogger()
+    return monitor
+
+
+class TestLoopLagMonitor:
+    def test_lags_are_bucketed(self, event_loop):
+        monitor = make_monitor(event_loop)
+        for lag in (0, 0.01, 0.02, 0.3, 10):
+            monitor.record(lag)
+        assert len(monitor.buckets) == len(LAG_BUCKETS) + 1
+        # the upper bounds are inclusive
+        assert monitor.buckets == [2, 1, 0, 0, 1, 0, 0, 1]
+        assert monitor.stats.count == 5
+
+    def test_report_logs_the_histogram(self, event_loop):
+        monitor = make_monitor(event_loop)
+        monitor.record(0.001)
+        monitor.record(6)
+        monitor.report()
+        method, report = monitor.logger.infos[-1]
+        assert method == "report"
+        assert report["histogram"]["le_0.01"] == 1
+        assert report["histogram"]["gt_5"] == 1
+        assert report["summary"]["count"] == 2
+        assert report["blocked"] == 0
+
+    @pytest.mark.asyncio
+    async def test_healthy_loop_is_not_reported_blocked(self, event_loop):
+        monitor = make_monitor(event_loop, interval=0.01, threshold=0.2)
+        monitor.start()
+        await sleep(0.1, loop=event_loop)
+        await monitor.stop()
+        assert monitor.stats.count > 0
+        assert monitor.num_blocked == 0
+        assert monitor.logger.warnings == []
+        # the final report is logged on stop
+        assert monitor.logger.infos[-1][0] == "report"
+
+    @pytest.mark.asyncio
+    async def test_blocking_call_is_reported_with_its_stack(self, event_loop):
+        monitor = make_monitor(event_loop, interval=0.01, threshold=0.05)
+        monitor.start()
+        await sleep(0.03, loop=event_loop)
+        time.sleep(0.3)
+        await sleep(0.05, loop=event_loop)
+        await monitor.stop()
+        assert monitor.num_blocked == 1
+        method, blocked = monitor.logger.warnings[0]
+        assert method == "blocked"
+        assert blocked["lag"] >= 0.2
+        assert "test_blocking_call_is_reported_with_its_stack" in blocked["stack"]
+
+    @pytest.mark.asyncio
+    async def test_start_and_stop_are_idempotent(self, event_loop):
+        monitor = make_monitor(event_loop, interval=0.01)
+        monitor.start()
+        task = monitor._task
+        monitor.start()
+        assert monitor._task is task
+        await monitor.stop()
+        await monitor.stop()
+        assert monitor._task is None
+        assert len(monitor.logger.infos) == 1
@@ -0,0 +1,173 @@
+from asyncio import Queue, sleep
+from json import dumps, loads
+from typing import List
+
+import pytest
+from aiohttp import WSMessage, WSMsgType
+from cripy import Client
+
+from autobrowser.errors import CDPError
+from autobrowser.util.multiplexed import MultiplexedConnection
+
+
+class FakeWebSocket:
+    """Records the sent commands and yields the messages the test supplies"""
+
+    def __init__(self, loop) -> None:
+        self.loop = loop
+        self.sent: List[dict] = []
+        self.closed = False
+        self.fail_sends = False
+        self.messages: Queue = Queue(loop=loop)
+
+    async def send_str(self, data: str) -> None:
+        if self.fail_sends:
+            raise ConnectionResetError("connection reset")
+        self.sent.append(loads(data))
+
+    def receive(self, **data) -> None:
+        self.messages.put_nowait(WSMessage(WSMsgType.TEXT, dumps(data), None))
+
+    async def close(self) -> None:
+        self.closed = True
+        self.messages.put_nowait(WSMessage(WSMsgType.CLOSED, None, None))
+
+    def __aiter__(self) -> "FakeWebSocket":
+        return self
+
+    async def __anext__(self) -> WSMessage:
+        return await self.messages.get()
+
+
+class FakeSession:
+    def __init__(self, ws: FakeWebSocket) -> None:
+        self.ws = ws
+
+    async def ws_connect(self, url: str, **kwargs) -> FakeWebSocket:
+        return self.ws
+
+
+@pytest.fixture
+def ws(event_loop) -> FakeWebSocket:
+    return FakeWebSocket(event_loop)
+
+
+@pytest.fixture
+async def connection(ws, event_loop) -> MultiplexedConnection:
+    connection = MultiplexedConnection(
+        "ws://localhost:9222/devtools/browser/1", FakeSession(ws), loop=event_loop
+    )
+    await connection.connect()
+    yield connection
+    await connection.close()
+
+
+async def last_sent(ws: FakeWebSocket, loop) -> dict:
+    while not ws.sent:
+        await sleep(0, loop=loop)
+    return ws.sent.pop()
+
+
+async def attach(connection, ws, loop):
+    attaching = loop.create_task(connection.attach("target-1"))
+    command = await last_sent(ws, loop)
+    ws.receive(id=command["id"], result={"sessionId": "session-1"})
+    return await attaching
+
+
+class TestMultiplexedConnection:
+    @pytest.mark.asyncio
+    async def test_responses_are_routed_by_message_id(
+        self, connection, ws, event_loop
+    ):
+        first = connection.send("Browser.getVersion")
+        second = connection.send("Target.getTargets", {"a": 1})
+        await sleep(0, loop=event_loop)
+        assert [msg["method"] for msg in ws.sent] == [
+            "Browser.getVersion",
+            "Target.getTargets",
+        ]
+        ws.receive(id=ws.sent[1]["id"], result={"targetInfos": []})
+        ws.receive(id=ws.sent[0]["id"], result={"product": "Chrome"})
+        assert await first == {"product": "Chrome"}
+        assert await second == {"targetInfos": []}
+
+    @pytest.mark.asyncio
+    async def test_errors_fail_the_command(self, connection, ws, event_loop):
+        result = connection.send("Page.navigate", {"url": "nope"})
+        command = await last_sent(ws, event_loop)
+        ws.receive(id=command["id"], error={"message": "Invalid URL"})
+        with pytest.raises(CDPError):
+            await result
+
+    @pytest.mark.asyncio
+    async def test_failed_sends_fail_the_command(self, connection, ws, event_loop):
+        ws.fail_sends = True
+        with pytest.raises(CDPError):
+            await connection.send("Browser.getVersion")
+        assert connection._pending == {}
+
+    @pytest.mark.asyncio
+    async def test_sending_when_not_connected(self, event_loop, ws):
+        connection = MultiplexedConnection("ws://x", FakeSession(ws), loop=event_loop)
+        with pytest.raises(CDPError):
+            await connection.send("Browser.getVersion")
+
+    @pytest.mark.asyncio
+    async def test_closing_fails_pending_commands_and_detaches(
+        self, connection, ws, event_loop
+    ):
+        client = await attach(connection, ws, event_loop)
+        disconnected = []
+        client.on(Client.Events.Disconnected, lambda: disconnected.append(True))
+        pending = connection.send("Browser.getVersion")
+        await connection.close()
+        with pytest.raises(CDPError):
+            await pending
+        assert client.closed
+        assert disconnected == [True]
+
+
+class TestSessionClient:
+    @pytest.mark.asyncio
+    async def test_commands_are_sent_to_the_session(self, connection, ws, event_loop):
+        client = await attach(connection, ws, event_loop)
+        navigating = client.Page.navigate("https://example.com", referrer=None)
+        command = await last_sent(ws, event_loop)
+        assert command["method"] == "Page.navigate"
+        assert command["params"] == {"url": "https://example.com"}
+        assert command["sessionId"] == "session-1"
+        ws.receive(id=command["id"], result={"frameId": "1"})
+        assert await navigating == {"frameId": "1"}
+
+    @pytest.mark.asyncio
+    async def test_unmapped_positional_params_are_rejected(
+        self, connection, ws, event_loop
+    ):
+        client = await attach(connection, ws, event_loop)
+        with pytest.raises(TypeError):
+            client.Emulation.setDeviceMetricsOverride(800, 600)
+        with pytest.raises(TypeError):
+            client.Page.navigate("https://example.com", "https://referrer.com")
+
+    @pytest.mark.asyncio
+    async def test_events_are_routed_to_their_session(self, connection, ws, event_loop):
+        client = await attach(connection, ws, event_loop)
+        events = []
+        client.Page.loadEventFired(events.append)
+        ws.receive(method="Page.loadEventFired", params={"t": 1}, sessionId="other")
+        ws.receive(method="Page.loadEventFired", params={"t": 2}, sessionId="session-1")
+        await sleep(0.01, loop=event_loop)
+        assert events == [{"t": 2}]
+
+    @pytest.mark.asyncio
+    async def test_detached_targets_close_their_client(
+        self, connection, ws, event_loop
+    ):
+        client = await attach(connection, ws, event_loop)
+        ws.receive(
+            method="Target.detachedFromTarget", params={"sessionId": "session-1"}
+        )
+        await sleep(0.01, loop=event_loop)
+        assert client.closed
+        assert "session-1" not in connection._sessions
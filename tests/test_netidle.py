@@ -0,0 +1,108 @@
+import pytest
+
+from autobrowser.util.netidle import RequestTracker
+
+
+def request(request_id: str, type_: str = "Document") -> dict:
+    return {"requestId": request_id, "type": type_}
+
+
+@pytest.fixture
+def tracker(event_loop) -> RequestTracker:
+    return RequestTracker(None, loop=event_loop, min_idle_time=0.01)
+
+
+class TestRequestTracker:
+    def test_tracks_inflight_requests(self, tracker):
+        tracker._on_request_will_be_sent(request("1"))
+        tracker._on_request_will_be_sent(request("2"))
+        tracker._on_request_will_be_sent(request("3"))
+        assert tracker.num_inflight() == 3
+        tracker._on_loading_finished(request("1"))
+        tracker._on_loading_failed(request("2"))
+        assert tracker.num_inflight() == 1
+        assert tracker.num_requests == 3
+        assert tracker.num_finished == 1
+        assert tracker.num_failed == 1
+
+    def test_redirects_are_a_single_request(self, tracker):
+        tracker._on_request_will_be_sent(request("1"))
+        tracker._on_request_will_be_sent(request("1"))
+        assert tracker.num_requests == 1
+        assert tracker.num_inflight() == 1
+
+    def test_long_lived_resource_types_are_not_inflight(self, tracker):
+        tracker._on_request_will_be_sent(request("1", "WebSocket"))
+        tracker._on_request_will_be_sent(request("2", "EventSource"))
+        tracker._on_request_will_be_sent(request("3", "Ping"))
+        assert tracker.num_inflight() == 0
+        assert tracker.num_requests == 0
+
+    def test_streaming_responses_are_long_lived(self, tracker):
+        tracker._on_request_will_be_sent(request("1", "XHR"))
+        tracker._on_response_received(
+            {
+                "requestId": "1",
+                "type": "XHR",
+                "response": {"mimeType": "text/event-stream"},
+            }
+        )
+        assert tracker.num_inflight() == 0
+        tracker._on_request_will_be_sent(request("1", "XHR"))
+        assert tracker.num_inflight() == 0
+
+    def test_requests_inflight_too_long_are_long_lived(self, tracker, event_loop):
+        tracker._on_request_will_be_sent(request("1"))
+        tracker._on_request_will_be_sent(request("2"))
+        tracker.inflight["1"] = event_loop.time() - tracker.long_lived_time
+        assert tracker.num_inflight() == 1
+
+    def test_idle_window_adapts_to_the_request_cadence(self, tracker):
+        assert tracker.idle_window(2) == 2
+        tracker._on_request_will_be_sent(request("1"))
+        tracker._on_request_will_be_sent(request("2"))
+        assert tracker.min_idle_time <= tracker.idle_window(2) < 2
+
+    def test_reset_forgets_the_tracked_requests(self, tracker):
+        tracker._on_request_will_be_sent(request("1"))
+        tracker._on_request_will_be_sent(request("2", "WebSocket"))
+        tracker.reset()
+        assert tracker.num_inflight() == 0
+        assert tracker.idle_window(2) == 2
+        tracker._on_request_will_be_sent(request("2"))
+        assert tracker.num_inflight() == 1
+
+    @pytest.mark.asyncio
+    async def test_wait_for_idle(self, tracker):
+        tracker._on_request_will_be_sent(request("1"))
+        tracker._on_request_will_be_sent(request("2"))
+        tracker._on_loading_finished(request("1"))
+        assert await tracker.wait_for_idle(num_inflight=1, idle_time=1, global_wait=5)
+
+    @pytest.mark.asyncio
+    async def test_wait_for_idle_times_out_when_busy(self, tracker):
+        tracker._on_request_will_be_sent(request("1"))
+        tracker._on_request_will_be_sent(request("2"))
+        assert not await tracker.wait_for_idle(
+            num_inflight=0, idle_time=1, global_wait=0.1
+        )
+
+    @pytest.mark.asyncio
+    async def test_wait_for_idle_does_not_poll_for_long_lived_requests(
+        self, tracker, event_loop, monkeypatch
+    ):
+        windows = []
+        idle_window = RequestTracker.idle_window
+
+        def counted_idle_window(self, max_idle_time):
+            windows.append(max_idle_time)
+            return idle_window(self, max_idle_time)
+
+        monkeypatch.setattr(RequestTracker, "idle_window", counted_idle_window)
+        tracker._on_request_will_be_sent(request("1"))
+        tracker._on_request_will_be_sent(request("2"))
+        tracker.inflight["1"] = event_loop.time() - 2 * tracker.long_lived_time
+        assert not await tracker.wait_for_idle(
+            num_inflight=0, idle_time=1, global_wait=0.3
+        )
+        assert len(windows) <= 3
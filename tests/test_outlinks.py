@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+import pytest
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.frontier import RedisFrontier
+from autobrowser.frontier.outlinks import classify_outlinks, encode_rule_specs
+
+OUTLINKS = [
+    "https://example.com/a",
+    "https://example.com/a",
+    "https://example.com/page#section",
+    "https://example.com/page",
+    "https://other.com/b",
+    "https://example.com/b#frag",
+    "https://example.com/c",
+]
+
+
+class FakeRedis:
+    """The subset of the redis commands used by RedisFrontier.add"""
+
+    def __init__(self):
+        self.sets = defaultdict(set)
+        self.lists = defaultdict(list)
+
+    async def sadd(self, key, *members):
+        added = set(members) - self.sets[key]
+        self.sets[key].update(members)
+        return len(added)
+
+    async def rpush(self, key, *values):
+        self.lists[key].extend(values)
+        return len(self.lists[key])
+
+
+@pytest.fixture
+def frontier(event_loop) -> RedisFrontier:
+    frontier = RedisFrontier(
+        FakeRedis(), AutomationConfig(autoid="test", reqid="test"), loop=event_loop
+    )
+    frontier.crawling_new_page("https://example.com/page#top")
+    return frontier
+
+
+async def add_each(frontier: RedisFrontier, depth: int) -> None:
+    for url in OUTLINKS:
+        await frontier.add(url, depth)
+
+
+class TestClassifyOutlinks:
+    @pytest.mark.asyncio
+    async def test_matches_the_frontiers_add(self, frontier):
+        frontier.scope.add_scope_rule({"domain": "example.com"})
+        await add_each(frontier, 2)
+        batch = classify_outlinks(
+            OUTLINKS,
+            2,
+            frontier.scope.current_page,
+            encode_rule_specs(frontier.scope.rule_specs),
+        )
+        redis = frontier.redis
+        keys = frontier.keys
+        assert [info for _, info in batch.candidates] == redis.lists[keys.queue]
+        assert {url for url, _ in batch.candidates} == redis.sets[keys.seen]
+        assert set(batch.inner_page_links) == redis.sets[keys.inner_page_links]
+        assert batch.num_out_of_scope == 1
+        assert batch.num_duplicates == 1
+
+    @pytest.mark.asyncio
+    async def test_matches_the_frontiers_add_for_all_links(self, frontier):
+        frontier.scope.all_links = True
+        await add_each(frontier, 1)
+        batch = classify_outlinks(OUTLINKS, 1, frontier.scope.current_page, None)
+        redis = frontier.redis
+        keys = frontier.keys
+        assert [info for _, info in batch.candidates] == redis.lists[keys.queue]
+        assert set(batch.inner_page_links) == redis.sets[keys.inner_page_links]
+        assert batch.num_out_of_scope == 0
+
+    def test_inner_page_links(self):
+        batch = classify_outlinks(OUTLINKS, 1, "https://example.com/page", None)
+        assert batch.inner_page_links == ["https://example.com/page#section"]
+        assert "https://example.com/page" in dict(batch.candidates)
+
+    def test_no_rules_means_nothing_is_in_scope(self):
+        batch = classify_outlinks(
+            OUTLINKS, 1, "https://example.com/page", encode_rule_specs(None)
+        )
+        assert batch.candidates == []
+        assert batch.num_out_of_scope == len(set(OUTLINKS))
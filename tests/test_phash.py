@@ -0,0 +1,74 @@
+import struct
+import zlib
+from typing import List
+
+import pytest
+
+from autobrowser.util.phash import dhash_png, hamming_distance
+
+
+def make_png(width: int, height: int, pixels: List[int]) -> bytes:
+    """Encodes the supplied grayscale pixels (row major) as an 8 bit grayscale PNG"""
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        crc = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+    raw = b"".join(
+        b"\x00" + bytes(pixels[row * width : (row + 1) * width])
+        for row in range(height)
+    )
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+def gradient(width: int, height: int, descending: bool) -> List[int]:
+    pixels = []
+    for _ in range(height):
+        for x in range(width):
+            value = x * 255 // (width - 1)
+            pixels.append(255 - value if descending else value)
+    return pixels
+
+
+class TestHammingDistance:
+    def test_identical_hashes_have_no_distance(self):
+        assert hamming_distance(0b1011, 0b1011) == 0
+
+    def test_counts_the_differing_bits(self):
+        assert hamming_distance(0b1011, 0b0110) == 3
+        assert hamming_distance(0, (1 << 64) - 1) == 64
+
+
+class TestDHashPNG:
+    def test_identical_images_have_the_same_hash(self):
+        png = make_png(36, 16, gradient(36, 16, descending=True))
+        assert dhash_png(png) == dhash_png(png)
+
+    def test_brighter_left_neighbors_set_every_bit(self):
+        png = make_png(36, 16, gradient(36, 16, descending=True))
+        assert dhash_png(png) == (1 << 64) - 1
+
+    def test_darker_left_neighbors_set_no_bits(self):
+        png = make_png(36, 16, gradient(36, 16, descending=False))
+        assert dhash_png(png) == 0
+
+    def test_similar_images_are_close(self):
+        pixels = gradient(36, 16, descending=True)
+        changed = list(pixels)
+        changed[0] = 0
+        original_hash = dhash_png(make_png(36, 16, pixels))
+        changed_hash = dhash_png(make_png(36, 16, changed))
+        assert hamming_distance(original_hash, changed_hash) <= 2
+
+    def test_hash_size_determines_the_number_of_bits(self):
+        png = make_png(20, 8, gradient(20, 8, descending=True))
+        assert dhash_png(png, hash_size=4) == (1 << 16) - 1
+
+    def test_rejects_data_that_is_not_a_png(self):
+        with pytest.raises(ValueError):
+            dhash_png(b"GIF89a")
@@ -0,0 +1,85 @@
+import gzip
+import json
+from copy import deepcopy
+
+import pytest
+
+from autobrowser.util.serialization import ChunkedJSONWriter
+
+
+def make_dom(depth: int, width: int = 3) -> dict:
+    node = {"nodeName": "#text", "nodeValue": "leaf é / \"quoted\""}
+    for level in range(depth):
+        node = {
+            "nodeName": "DIV",
+            "attributes": ["id", f"level-{level}", "class", "a b"],
+            "children": [node]
+            + [{"nodeName": "BR", "children": []} for _ in range(width)],
+            "backendNodeId": level,
+            "visible": level % 2 == 0,
+            "offset": None,
+        }
+    return {"root": node, "frames": [1, 2.5, "three", None, True, {}, []]}
+
+
+async def write(path: str, obj: dict, **kwargs) -> ChunkedJSONWriter:
+    async with ChunkedJSONWriter(path, **kwargs) as writer:
+        await writer.write_object(obj)
+    return writer
+
+
+class TestChunkedJSONWriter:
+    @pytest.mark.asyncio
+    async def test_writes_the_object_as_json(self, tmp_path):
+        path = str(tmp_path / "dom.json")
+        dom = make_dom(5)
+        writer = await write(path, deepcopy(dom))
+        with open(path, "rb") as iin:
+            data = iin.read()
+        assert json.loads(data.decode("utf-8")) == dom
+        assert writer.raw_bytes == writer.written_bytes == len(data)
+
+    @pytest.mark.asyncio
+    async def test_gzip_compresses_the_json(self, tmp_path):
+        path = str(tmp_path / "dom.json.gz")
+        dom = make_dom(20)
+        writer = await write(path, deepcopy(dom), compress=True, chunk_size=128)
+        with gzip.open(path, "rb") as iin:
+            data = iin.read()
+        assert json.loads(data.decode("utf-8")) == dom
+        assert writer.raw_bytes == len(data)
+        assert writer.written_bytes < writer.raw_bytes
+
+    @pytest.mark.asyncio
+    async def test_small_chunks(self, tmp_path):
+        path = str(tmp_path / "dom.json")
+        dom = make_dom(10)
+        await write(path, deepcopy(dom), chunk_size=1)
+        with open(path, "rb") as iin:
+            assert json.loads(iin.read().decode("utf-8")) == dom
+
+    @pytest.mark.asyncio
+    async def test_deep_trees_do_not_recurse(self, tmp_path):
+        path = str(tmp_path / "dom.json")
+        dom = make_dom(5000, width=0)
+        await write(path, dom)
+        with open(path, "rb") as iin:
+            data = iin.read()
+        assert data.startswith(b'{"root":{"nodeName":"DIV"')
+        assert data.count(b'"nodeName":"DIV"') == 5000
+
+    @pytest.mark.asyncio
+    async def test_the_object_is_released_as_it_is_written(self, tmp_path):
+        dom = make_dom(3)
+        children = dom["root"]["children"]
+        await write(str(tmp_path / "dom.json"), dom)
+        assert dom == {}
+        assert children == []
+
+    @pytest.mark.asyncio
+    async def test_long_scalar_lists(self, tmp_path):
+        path = str(tmp_path / "dom.json")
+        obj = {"ids": list(range(10000)), "mixed": [1, {"a": 1}, 2, [3], "x"]}
+        await write(path, deepcopy(obj), chunk_size=256)
+        with open(path, "rb") as iin:
+            assert json.loads(iin.read().decode("utf-8")) == obj
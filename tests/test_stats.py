@@ -0,0 +1,42 @@
+from autobrowser.util.stats import LatencyStats
+
+
+class TestLatencyStats:
+    def test_percentiles_use_the_nearest_rank(self):
+        stats = LatencyStats("test")
+        for value in range(1, 101):
+            stats.add(value)
+        assert stats.percentile(50) == 50
+        assert stats.percentile(90) == 90
+        assert stats.percentile(99) == 99
+        assert stats.percentile(100) == 100
+        assert stats.percentile(0) == 1
+
+    def test_percentiles_of_unordered_samples(self):
+        stats = LatencyStats("test")
+        for value in (5, 1, 4, 2, 3):
+            stats.add(value)
+        assert stats.percentile(50) == 3
+        assert stats.percentile(90) == 5
+
+    def test_no_samples(self):
+        stats = LatencyStats("test")
+        assert stats.percentile(50) == 0.0
+        assert stats.summary() == dict(count=0)
+
+    def test_summary(self):
+        stats = LatencyStats("test")
+        for value in (0.1, 0.2, 0.3, 0.4):
+            stats.add(value)
+        assert stats.summary() == dict(
+            count=4, mean=0.25, max=0.4, p50=0.2, p90=0.4, p99=0.4
+        )
+
+    def test_percentiles_are_of_the_most_recent_samples(self):
+        stats = LatencyStats("test", max_samples=3)
+        for value in (100, 1, 2, 3):
+            stats.add(value)
+        assert stats.percentile(100) == 3
+        assert stats.count == 4
+        assert stats.max == 100
+        assert stats.summary()["mean"] == 26.5
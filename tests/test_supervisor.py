@@ -0,0 +1,91 @@
+import pytest
+
+from autobrowser.supervisor import (
+    WorkerSupervisor,
+    chrome_opts_for_worker,
+    tabs_for_worker,
+)
+
+
+@pytest.fixture
+def clean_env(monkeypatch):
+    for name in ("BROWSER_HOST", "NUM_TABS", "CHROME_OPTS", "LOCAL_BROWSERS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.delenv("LOCAL_BROWSER_BASE_PORT", raising=False)
+    return monkeypatch
+
+
+class TestTabsForWorker:
+    @pytest.mark.parametrize("num_tabs,num_workers", [(1, 1), (7, 3), (8, 4), (2, 5)])
+    def test_every_tab_is_run_by_one_worker(self, num_tabs, num_workers):
+        tabs = [
+            tabs_for_worker(num_tabs, num_workers, idx) for idx in range(num_workers)
+        ]
+        assert sum(tabs) == num_tabs
+        assert max(tabs) - min(tabs) <= 1
+
+    def test_first_workers_run_the_remainder(self):
+        assert [tabs_for_worker(7, 3, idx) for idx in range(3)] == [3, 2, 2]
+
+
+class TestChromeOptsForWorker:
+    def test_offsets_the_port_and_user_data_dir(self):
+        chrome_opts = {
+            "exe": "chrome",
+            "args": [
+                "--headless",
+                "--remote-debugging-port=9300",
+                "--user-data-dir=/tmp/c",
+            ],
+            "launch": True,
+        }
+        worker_opts = chrome_opts_for_worker(chrome_opts, 2)
+        assert worker_opts["args"] == [
+            "--headless",
+            "--remote-debugging-port=9302",
+            "--user-data-dir=/tmp/c-2",
+        ]
+        assert worker_opts["connect"]["port"] == 9302
+        assert chrome_opts["args"][1] == "--remote-debugging-port=9300"
+
+    def test_first_worker_keeps_its_options(self):
+        chrome_opts = {
+            "exe": "chrome",
+            "args": ["--remote-debugging-port=9222", "--user-data-dir=/tmp/c"],
+            "connect": {"host": "localhost", "port": 9222},
+            "launch": True,
+        }
+        assert chrome_opts_for_worker(chrome_opts, 0) == chrome_opts
+
+
+class TestWorkerSupervisor:
+    def test_worker_env_divides_the_tabs_of_a_shared_browser(
+        self, event_loop, clean_env
+    ):
+        clean_env.setenv("BROWSER_HOST", "browser")
+        clean_env.setenv("NUM_TABS", "5")
+        supervisor = WorkerSupervisor("driver.py", 2, loop=event_loop)
+        assert supervisor.worker_env(0)["NUM_TABS"] == "3"
+        assert supervisor.worker_env(1)["NUM_TABS"] == "2"
+        assert supervisor.worker_env(1)["WORKER_INDEX"] == "1"
+        assert supervisor.worker_env(1)["NUM_WORKERS"] == "2"
+
+    def test_worker_env_offsets_the_local_browser_pool(self, event_loop, clean_env):
+        clean_env.setenv("CHROME_OPTS", '{"exe": "chrome", "args": []}')
+        clean_env.setenv("LOCAL_BROWSERS", "3")
+        clean_env.setenv("LOCAL_BROWSER_BASE_PORT", "9300")
+        supervisor = WorkerSupervisor("driver.py", 2, loop=event_loop)
+        assert supervisor.worker_env(0)["LOCAL_BROWSER_BASE_PORT"] == "9300"
+        assert supervisor.worker_env(1)["LOCAL_BROWSER_BASE_PORT"] == "9303"
+
+    def test_a_connected_local_browser_has_one_worker(self, event_loop, clean_env):
+        clean_env.setenv("CHROME_OPTS", '{"exe": "chrome", "args": []}')
+        assert WorkerSupervisor("driver.py", 4, loop=event_loop).num_workers == 1
+
+    def test_exit_code_is_the_highest_exit_code(self, event_loop, clean_env):
+        supervisor = WorkerSupervisor("driver.py", 3, loop=event_loop)
+        assert supervisor.determine_exit_code() == 0
+        supervisor.exit_codes = [0, 0, 2]
+        assert supervisor.determine_exit_code() == 2
+        supervisor.shutdown_from_signal = True
+        assert supervisor.determine_exit_code() == 1
@@ -0,0 +1,148 @@
+import os
+from asyncio import sleep
+from typing import List
+
+import pytest
+from aiohttp import ClientResponseError, RequestInfo
+from yarl import URL
+
+from autobrowser.automation import AutomationConfig
+from autobrowser.uploads import queue as queue_module
+from autobrowser.uploads.queue import UploadQueue
+
+UPLOAD_URL = "http://uploads.test/artifact"
+
+
+class FakeResponse:
+    def __init__(self, status: int) -> None:
+        self.status = status
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise ClientResponseError(
+                RequestInfo(URL(UPLOAD_URL), "PUT", {}), (), status=self.status
+            )
+
+
+class FakeRequest:
+    def __init__(self, response: FakeResponse) -> None:
+        self.response = response
+
+    async def __aenter__(self) -> FakeResponse:
+        return self.response
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+class FakeSession:
+    """Records the uploaded bodies and responds with the supplied statuses, then 200s"""
+
+    def __init__(self, statuses: List[int] = None) -> None:
+        self.statuses = list(statuses or [])
+        self.bodies: List[bytes] = []
+
+    def put(self, url, params=None, data=None, headers=None) -> FakeRequest:
+        self.bodies.append(data if isinstance(data, bytes) else data.read())
+        status = self.statuses.pop(0) if self.statuses else 200
+        return FakeRequest(FakeResponse(status))
+
+
+@pytest.fixture
+def delays(monkeypatch) -> List[float]:
+    recorded = []
+
+    async def no_sleep(delay, loop=None):
+        recorded.append(delay)
+
+    monkeypatch.setattr(queue_module, "sleep", no_sleep)
+    monkeypatch.setattr(queue_module, "random", lambda: 0.5)
+    return recorded
+
+
+def make_queue(session: FakeSession, loop, **kwargs) -> UploadQueue:
+    config = dict(
+        upload_concurrency=1,
+        upload_max_memory=10,
+        upload_max_spill=20,
+        upload_max_retries=3,
+        upload_retry_backoff=1,
+    )
+    config.update(kwargs)
+    return UploadQueue(session, AutomationConfig(**config), loop=loop)
+
+
+class TestUploadQueue:
+    @pytest.mark.asyncio
+    async def test_bodies_are_held_in_memory_up_to_the_limit(self, event_loop):
+        uploads = make_queue(FakeSession(), event_loop)
+        await uploads.put(UPLOAD_URL, {}, b"12345", "text/plain")
+        await uploads.put(UPLOAD_URL, {}, b"12345", "text/plain")
+        assert uploads._memory == 10
+        assert uploads._spilled == 0
+        await uploads.put(UPLOAD_URL, {}, b"123", "text/plain")
+        assert uploads._memory == 10
+        assert uploads._spilled == 3
+        assert uploads.pending == 3
+
+    @pytest.mark.asyncio
+    async def test_spilled_bodies_are_uploaded_and_removed(self, event_loop):
+        session = FakeSession()
+        uploads = make_queue(session, event_loop)
+        await uploads.put(UPLOAD_URL, {}, b"1234567890", "text/plain")
+        await uploads.put(UPLOAD_URL, {}, b"spilled", "text/plain")
+        spill_dir = uploads._spill_dir
+        assert len(os.listdir(spill_dir)) == 1
+        uploads.start()
+        await uploads.close()
+        assert session.bodies == [b"1234567890", b"spilled"]
+        assert uploads.num_uploaded == 2
+        assert uploads._memory == 0 and uploads._spilled == 0
+        assert not os.path.exists(spill_dir)
+
+    @pytest.mark.asyncio
+    async def test_put_waits_once_memory_and_spill_are_full(self, event_loop):
+        uploads = make_queue(FakeSession(), event_loop, upload_max_spill=0)
+        await uploads.put(UPLOAD_URL, {}, b"1234567890", "text/plain")
+        waiting = event_loop.create_task(
+            uploads.put(UPLOAD_URL, {}, b"12345", "text/plain")
+        )
+        await sleep(0.01, loop=event_loop)
+        assert not waiting.done()
+        uploads.start()
+        await waiting
+        await uploads.close()
+        assert uploads.num_uploaded == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_uploads_are_retried_with_backoff(self, event_loop, delays):
+        session = FakeSession([500, 429])
+        uploads = make_queue(session, event_loop)
+        await uploads.put(UPLOAD_URL, {}, b"body", "text/plain")
+        uploads.start()
+        await uploads.close()
+        assert delays == [1, 2]
+        assert len(session.bodies) == 3
+        assert uploads.num_uploaded == 1
+        assert uploads.num_failed == 0
+
+    @pytest.mark.asyncio
+    async def test_retries_are_bounded(self, event_loop, delays):
+        session = FakeSession([500, 500, 500])
+        uploads = make_queue(session, event_loop, upload_max_retries=2)
+        await uploads.put(UPLOAD_URL, {}, b"body", "text/plain")
+        uploads.start()
+        await uploads.close()
+        assert len(session.bodies) == 3
+        assert uploads.num_failed == 1
+        assert uploads._memory == 0
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self, event_loop, delays):
+        session = FakeSession([404])
+        uploads = make_queue(session, event_loop)
+        await uploads.put(UPLOAD_URL, {}, b"body", "text/plain")
+        uploads.start()
+        await uploads.close()
+        assert delays == []
+        assert uploads.num_failed == 1